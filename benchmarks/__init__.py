@@ -0,0 +1 @@
+"""Benchmarks for the transcription API (run as `python -m benchmarks.<name>`)."""
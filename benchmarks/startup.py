@@ -0,0 +1,108 @@
+"""Server cold-start benchmark.
+
+Measures, in fresh interpreters, what an autoscaled container pays
+before it can serve traffic:
+
+    python -m benchmarks.startup --runs 5 --output startup.json
+
+- import: `import src.api_server`
+- startup: application startup (lifespan) until the first /health answer
+- first_agent: the first /agent request, which builds the agent
+- second_agent: a later /agent request, with the agent already built
+
+The agent warm-up is disabled in the measured processes so its cost
+shows up in `first_agent` instead of overlapping the other phases. Each
+run uses an empty temporary history. Results are printed as JSON
+(median, min and max seconds per phase, plus every run).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in the child interpreter; prints one JSON line with its timings
+_CHILD = """
+import json, time
+start = time.perf_counter()
+import src.api_server as api_server
+timings = {"import": time.perf_counter() - start}
+
+from fastapi.testclient import TestClient
+start = time.perf_counter()
+with TestClient(api_server.app) as client:
+    client.get("/health").raise_for_status()
+    timings["startup"] = time.perf_counter() - start
+    for phase in ("first_agent", "second_agent"):
+        start = time.perf_counter()
+        client.post("/agent", data={"message": "dame el historial"}).raise_for_status()
+        timings[phase] = time.perf_counter() - start
+timings["agent"] = api_server.agent_status["state"]
+print(json.dumps(timings))
+"""
+
+PHASES = ("import", "startup", "first_agent", "second_agent")
+
+
+def measure_once() -> dict:
+    """Timings of one cold start, in a new interpreter with an empty history."""
+    with tempfile.TemporaryDirectory(prefix="startup-bench-") as data_dir:
+        env = {
+            **os.environ,
+            "AGENT_WARMUP": "false",
+            "UPLOAD_DIR": str(Path(data_dir) / "uploads"),
+            "CSV_PATH": str(Path(data_dir) / "history.csv"),
+            "HISTORY_DB_PATH": str(Path(data_dir) / "history.db"),
+            "TRANSCRIPTION_CACHE_ENABLED": "false",
+            "AGENT_DECISION_CACHE_ENABLED": "false",
+        }
+        result = subprocess.run(
+            [sys.executable, "-c", _CHILD], cwd=ROOT, env=env,
+            capture_output=True, text=True, check=True
+        )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(runs: list) -> dict:
+    return {
+        phase: {
+            "median": round(statistics.median(r[phase] for r in runs), 4),
+            "min": round(min(r[phase] for r in runs), 4),
+            "max": round(max(r[phase] for r in runs), 4)
+        }
+        for phase in PHASES
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.startup",
+        description="Measure API server import, startup and first-request latency."
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to measure (default: 5)")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    runs = [measure_once() for _ in range(max(1, args.runs))]
+    report = {
+        "benchmark": "startup",
+        "python": sys.version.split()[0],
+        "runs": len(runs),
+        "agent": runs[-1]["agent"],
+        "seconds": summarize(runs),
+        "samples": runs
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding='utf-8')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,492 @@
+"""Benchmark suite for the API server, the history store and agent routing.
+
+Every scenario runs against a local Deepgram stub (tests/deepgram_stub.py)
+and a fake LLM, so no API keys or network access are needed and runs are
+comparable between machines and versions:
+
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --sizes 10000 --backends sqlite --compare bench.json
+
+For each history backend and size (default: csv and sqlite with 10k, 100k
+and 1M rows) a fresh interpreter fills an empty history with synthetic
+transcriptions and measures:
+
+- populate: bulk load of the synthetic history (rows per second)
+- save: single saves (`save_to_csv`) one after another and from several
+  threads, on top of the existing history
+- history: /history latency for common, rare and prefix searches, the
+  newest page, a filtered page and cursor pagination
+- stats: /stats latency
+- download: /download of the whole history, plain and gzip
+- upload: concurrent /upload throughput of WAV files (Deepgram stub with
+  a fixed delay)
+- agent: /agent latency on the fast path and through the (fake) LLM
+
+Requests go through the ASGI app in-process (httpx.ASGITransport), with
+the server's lifespan, middlewares and thread pool, but without a
+network stack. Latencies are in milliseconds (p50, p95, max, mean over
+`--requests` calls, plus the first `cold` call). Results are printed as
+JSON; with `--compare` the run is checked against an earlier result and
+the command exits with status 1 if a metric got worse than
+`--max-regression` times its previous value.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, Iterator, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_BACKENDS = ("csv", "sqlite")
+
+# Synthetic history: frequent words make up most of the text, a rare word
+# appears in about 1 row in 1000
+COMMON_WORDS = (
+    "cliente reunión equipo proyecto entrega semana informe revisar cambios pruebas "
+    "datos servidor llamada correo tarea plazo pedido factura soporte incidencia "
+    "producto precio contrato ventas objetivo resultado pendiente mañana viernes lunes"
+).split()
+FILLER_WORDS = (
+    "el la los las de del que en un una para con por se lo al como más pero sus "
+    "hay muy ya también sobre todo este esta hemos vamos tenemos hacer bien"
+).split()
+RARE_WORD = "auditoría"
+TEAMS = ("ventas", "soporte", "reunion", "formacion")
+MODELS = ("deepgram-nova-2", "deepgram-nova-2", "deepgram-nova-2", "whisper-base")
+HISTORY_START = datetime(2024, 1, 1)
+
+HISTORY_QUERIES = {
+    "search_common": {"search": "cliente"},
+    "search_rare": {"search": RARE_WORD},
+    "search_prefix": {"search": "presup"},
+    "recent_page": {"limit": 50},
+    "filtered_page": {
+        "order": "recent", "limit": 50, "filename_prefix": "soporte_",
+        "start": "2024-06-01", "end": "2024-06-30"
+    },
+    "filtered_search": {"order": "recent", "search": RARE_WORD, "start": "2024-03-01"}
+}
+AGENT_MESSAGES = {
+    "fast_path": "dame las últimas 5 transcripciones del historial",
+    "llm": "¿Qué se dijo sobre el cliente la semana pasada?"
+}
+
+# Rows handed to append_many at a time while populating
+_POPULATE_BATCH = 50_000
+_PAGES = 20
+
+
+def synthetic_records(size: int, seed: int = 7) -> Iterator[Dict]:
+    """`size` history records, oldest first, spread over one year."""
+    rng = random.Random(seed)
+    step = timedelta(days=365) / max(size, 1)
+    words = COMMON_WORDS + FILLER_WORDS * 2 + ["presupuesto"]
+    for i in range(size):
+        text = rng.choices(words, k=rng.randint(20, 40))
+        if rng.random() < 0.001:
+            text[rng.randrange(len(text))] = RARE_WORD
+        yield {
+            "timestamp": (HISTORY_START + step * i).strftime("%Y-%m-%d %H:%M:%S"),
+            "filename": f"{rng.choice(TEAMS)}_{i:07d}.mp3",
+            "duration_seconds": round(rng.uniform(5, 900), 2),
+            "model": rng.choice(MODELS),
+            "transcription_text": " ".join(text).capitalize() + "."
+        }
+
+
+def latency_summary(seconds: List[float]) -> Dict:
+    """p50, p95, max and mean of the samples, in milliseconds."""
+    ms = sorted(s * 1000 for s in seconds)
+    if not ms:
+        return {"n": 0}
+    return {
+        "n": len(ms),
+        "p50_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))], 3),
+        "max_ms": round(ms[-1], 3),
+        "mean_ms": round(statistics.fmean(ms), 3)
+    }
+
+
+class FakeLLM:
+    """Stands in for the Groq model: answers every message with one
+    query_history call after `delay` seconds."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.response = SimpleNamespace(
+            tool_calls=[{"name": "query_history", "args": {"search": "cliente", "limit": 5}}],
+            content=""
+        )
+
+    def invoke(self, messages):
+        time.sleep(self.delay)
+        return self.response
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.delay)
+        return self.response
+
+
+def _populate(store, size: int) -> Dict:
+    start = time.perf_counter()
+    records = synthetic_records(size)
+    written = 0
+    while written < size:
+        batch = [next(records) for _ in range(min(_POPULATE_BATCH, size - written))]
+        written += store.append_many(batch)
+    seconds = time.perf_counter() - start
+    return {"rows": written, "seconds": round(seconds, 3), "rows_per_second": round(written / seconds, 1)}
+
+
+def _save_throughput(api_server, saves: int, threads: int) -> Dict:
+    """Single saves on top of the populated history."""
+    def save(i):
+        start = time.perf_counter()
+        api_server.save_to_csv(f"bench_save_{i}.mp3", "texto de la transcripción guardada", 12.5)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    sequential = [save(i) for i in range(saves)]
+    sequential_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        concurrent = list(pool.map(save, range(saves, 2 * saves)))
+    concurrent_seconds = time.perf_counter() - start
+    return {
+        "sequential": {"per_second": round(saves / sequential_seconds, 1), **latency_summary(sequential)},
+        "concurrent": {
+            "threads": threads,
+            "per_second": round(saves / concurrent_seconds, 1),
+            **latency_summary(concurrent)
+        }
+    }
+
+
+async def _timed(request) -> float:
+    start = time.perf_counter()
+    response = await request()
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def _latency(request, runs: int) -> Dict:
+    """First call (`cold_ms`) and `runs` more, one after another."""
+    cold = await _timed(request)
+    return {"cold_ms": round(cold * 1000, 3), **latency_summary([await _timed(request) for _ in range(runs)])}
+
+
+async def _history(client, runs: int) -> Dict:
+    results = {}
+    for name, params in HISTORY_QUERIES.items():
+        results[name] = await _latency(lambda: client.get("/history", params=params), runs)
+
+    # Newest first, following next_cursor page after page
+    pages, cursor = [], None
+    for _ in range(_PAGES):
+        start = time.perf_counter()
+        response = await client.get("/history", params={"limit": 50, **({"cursor": cursor} if cursor else {})})
+        response.raise_for_status()
+        pages.append(time.perf_counter() - start)
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            break
+    results["paginate"] = latency_summary(pages)
+    return results
+
+
+async def _download(client, runs: int, encoding: str) -> Dict:
+    seconds, size = [], 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        async with client.stream("GET", "/download", headers={"Accept-Encoding": encoding}) as response:
+            response.raise_for_status()
+            size = 0
+            async for chunk in response.aiter_raw():
+                size += len(chunk)
+        seconds.append(time.perf_counter() - start)
+    return {"bytes": size, **latency_summary(seconds)}
+
+
+def wav_bytes(size_kb: int, rate: int = 16000) -> bytes:
+    """A silent 16-bit mono WAV of about `size_kb` KB.
+
+    Real audio matters: the server probes the file's duration before
+    transcribing it, and random bytes make the decoder scan the whole
+    file for a frame header.
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(bytes(size_kb * 1024))
+    return buffer.getvalue()
+
+
+async def _uploads(client, count: int, concurrency: int, size_kb: int) -> Dict:
+    """`count` uploads, at most `concurrency` in flight at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+    body = wav_bytes(size_kb)
+
+    async def upload(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/upload", files={"file": (f"bench_upload_{i}.wav", body)})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(upload(i) for i in range(count)))
+    seconds = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "per_second": round(len(latencies) / seconds, 1),
+        "errors": errors,
+        **latency_summary(latencies)
+    }
+
+
+async def _agent(client, runs: int) -> Dict:
+    results = {}
+    for route, message in AGENT_MESSAGES.items():
+        async def ask():
+            response = await client.post("/agent", data={"message": message, "details": "true"})
+            if response.is_success and response.json().get("route") != route:
+                raise RuntimeError(f"'{message}' took the {response.json().get('route')} route, not {route}")
+            return response
+        results[route] = await _latency(ask, runs)
+    return results
+
+
+async def _serve(api_server, config: Dict) -> Dict:
+    import httpx
+
+    app = api_server.app
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            runs = config["requests"]
+            return {
+                "history": await _history(client, runs),
+                "stats": await _latency(lambda: client.get("/stats"), runs),
+                "download": {
+                    "csv": await _download(client, config["download_runs"], "identity"),
+                    "csv_gzip": await _download(client, config["download_runs"], "gzip")
+                },
+                "upload": await _uploads(client, config["uploads"], config["concurrency"], config["upload_kb"]),
+                "agent": await _agent(client, runs)
+            }
+
+
+def _peak_memory_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_scenario(config: Dict) -> Dict:
+    """Runs every measurement for one backend and size (in this process).
+
+    The environment must already point the server at an empty data
+    directory: the server reads its configuration when imported.
+    """
+    from tests.deepgram_stub import DeepgramStub
+
+    with DeepgramStub(delay=config["deepgram_delay"], transcript=lambda body, params: "texto del stub") as stub:
+        os.environ["DEEPGRAM_API_URL"] = stub.url
+
+        import src.api_server as api_server
+        from src.agent import IntelligentAgent
+        from src.tools.history import QueryHistoryTool, SaveTranscriptionTool
+        from src.tools.transcriber import TranscribeAudioTool
+
+        store = api_server.history_store
+        tools = [TranscribeAudioTool(), SaveTranscriptionTool(store=store), QueryHistoryTool(store=store)]
+        api_server.agent = IntelligentAgent(FakeLLM(config["llm_delay"]), tools)
+
+        result = {
+            "backend": config["backend"],
+            "size": config["size"],
+            "populate": _populate(store, config["size"]),
+            "save": _save_throughput(api_server, config["saves"], config["concurrency"])
+        }
+        result.update(asyncio.run(_serve(api_server, config)))
+    result["peak_memory_mb"] = _peak_memory_mb()
+    return result
+
+
+def measure(config: Dict) -> Dict:
+    """Runs one scenario in a new interpreter with an empty history."""
+    with tempfile.TemporaryDirectory(prefix="bench-") as data_dir:
+        env = {
+            **os.environ,
+            "HISTORY_BACKEND": config["backend"],
+            "UPLOAD_DIR": str(Path(data_dir) / "uploads"),
+            "TRANSCRIPTIONS_DIR": str(Path(data_dir) / "transcriptions"),
+            "CSV_PATH": str(Path(data_dir) / "history.csv"),
+            "HISTORY_DB_PATH": str(Path(data_dir) / "history.db"),
+            "DEEPGRAM_API_KEY": "benchmark",
+            "DEEPGRAM_MAX_RETRIES": "0",
+            # An empty key keeps .env from enabling the real Groq agent
+            "GROQ_API_KEY": "",
+            "AGENT_WARMUP": "false",
+            "TRANSCRIPTION_CACHE_ENABLED": "false",
+            "AGENT_DECISION_CACHE_ENABLED": "false",
+            "TRACE_EXPORT": ""
+        }
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.suite", "--scenario", json.dumps(config)],
+            cwd=ROOT, env=env, capture_output=True, text=True
+        )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"{config['backend']}/{config['size']} failed:\n{result.stderr.strip()[-2000:]}"
+        )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _metrics(result: Dict, prefix: str = "") -> Iterator:
+    """(name, value, lower_is_better) of every comparable number in a result."""
+    for key, value in result.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from _metrics(value, name)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            if key.endswith("_ms") or key == "seconds":
+                yield name, value, True
+            elif key.endswith("per_second"):
+                yield name, value, False
+
+
+def compare(report: Dict, baseline: Dict, max_regression: float) -> List[Dict]:
+    """Metrics of `report` that are more than `max_regression` times worse
+    than in `baseline` (same backend and size)."""
+    previous = {(r["backend"], r["size"]): dict((n, v) for n, v, _ in _metrics(r)) for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        before = previous.get((result["backend"], result["size"]))
+        if before is None:
+            continue
+        for name, value, lower_is_better in _metrics(result):
+            old = before.get(name)
+            if not old or not value:
+                continue
+            ratio = value / old if lower_is_better else old / value
+            if ratio > max_regression:
+                regressions.append({
+                    "backend": result["backend"], "size": result["size"], "metric": name,
+                    "before": old, "after": value, "ratio": round(ratio, 2)
+                })
+    return regressions
+
+
+def _revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.suite",
+        description="Benchmark history saves and queries, /stats, /download, /upload and agent routing."
+    )
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="History sizes, comma separated (default: 10000,100000,1000000)")
+    parser.add_argument("--backends", default=",".join(DEFAULT_BACKENDS),
+                        help="History backends, comma separated (default: csv,sqlite)")
+    parser.add_argument("--requests", type=int, default=50, help="Timed calls per endpoint (default: 50)")
+    parser.add_argument("--saves", type=int, default=200, help="Saves per save benchmark (default: 200)")
+    parser.add_argument("--uploads", type=int, default=100, help="Uploads in the upload benchmark (default: 100)")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Concurrent uploads and saving threads (default: 16)")
+    parser.add_argument("--upload-kb", type=int, default=256, help="Size of each uploaded file (default: 256)")
+    parser.add_argument("--download-runs", type=int, default=3, help="Downloads per format (default: 3)")
+    parser.add_argument("--deepgram-delay", type=float, default=0.2,
+                        help="Seconds the Deepgram stub takes per transcription (default: 0.2)")
+    parser.add_argument("--llm-delay", type=float, default=0.05,
+                        help="Seconds the fake LLM takes per call (default: 0.05)")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--compare", help="Earlier results (JSON) to check this run against")
+    parser.add_argument("--max-regression", type=float, default=1.25,
+                        help="With --compare, fail if a metric is this many times worse (default: 1.25)")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.scenario:
+        # Child process started by measure()
+        print(json.dumps(run_scenario(json.loads(args.scenario))))
+        return 0
+
+    # Read the baseline first: a bad path shouldn't cost a whole run
+    baseline = json.loads(Path(args.compare).read_text(encoding='utf-8')) if args.compare else None
+    settings = {
+        "requests": args.requests,
+        "saves": args.saves,
+        "uploads": args.uploads,
+        "concurrency": args.concurrency,
+        "upload_kb": args.upload_kb,
+        "download_runs": args.download_runs,
+        "deepgram_delay": args.deepgram_delay,
+        "llm_delay": args.llm_delay
+    }
+    results = []
+    for backend in args.backends.split(","):
+        for size in args.sizes.split(","):
+            config = {"backend": backend.strip(), "size": int(size), **settings}
+            print(f"▶ {config['backend']} / {config['size']} rows", file=sys.stderr)
+            results.append(measure(config))
+
+    report = {
+        "benchmark": "suite",
+        "revision": _revision(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "settings": settings,
+        "results": results
+    }
+    status = 0
+    if baseline is not None:
+        report["comparison"] = {
+            "baseline_revision": baseline.get("revision"),
+            "max_regression": args.max_regression,
+            "regressions": compare(report, baseline, args.max_regression)
+        }
+        status = 1 if report["comparison"]["regressions"] else 0
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(json.dumps(report, indent=2))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
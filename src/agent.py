@@ -9,12 +9,31 @@ Author: Your Name
 Project: Master in Generative AI - Deliverable
 """
 
+import asyncio
+import contextvars
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, ToolMessage
 from langchain_groq import ChatGroq
 
+from .concurrency import run_blocking
+from .decision_cache import (
+    DecisionCache,
+    abstract_decision,
+    decision_from_response,
+    get_decision_cache,
+    normalize_message,
+    restore_decision,
+    tool_schema_version
+)
+from .intent import IntentClassifier, RoutingStats
+from .metrics import observe_stage, track_stage
+from .tracing import span
 from .tools.transcriber import TranscribeAudioTool
 from .tools.history import (
     SaveTranscriptionTool,
@@ -38,8 +57,341 @@ def load_configuration():
     return api_key
 
 
-def create_agent():
-    """Creates and configures the transcription agent."""
+SYSTEM_PROMPT = (
+    "Eres un asistente experto en transcripción de audio. Analiza el mensaje "
+    "del usuario y usa la herramienta más apropiada según su intención."
+)
+
+# LLM rounds per request: 1 runs the tool calls of the first answer; more
+# send the tool results back so the LLM can chain further calls
+AGENT_MAX_STEPS = int(os.getenv("AGENT_MAX_STEPS", 1))
+
+# Tool calls of the same step run in parallel in this pool
+AGENT_TOOL_THREADS = int(os.getenv("AGENT_TOOL_THREADS", 4))
+
+# A call to the key tool needs the output of these tools: when the LLM
+# asks for both in one step, the call goes back to the LLM to be made
+# again with that output
+TOOL_DEPENDENCIES = {
+    "save_transcription": {"transcribe_audio"}
+}
+
+_tool_executor = ThreadPoolExecutor(max_workers=AGENT_TOOL_THREADS, thread_name_prefix="agent-tool")
+
+
+class IntelligentAgent:
+    """Routes each user message to the right tools.
+
+    Obvious requests are recognized by the local intent classifier (see
+    `intent.py`) and run without calling the LLM; the rest go to the LLM,
+    which picks the tools through native function calling. LLM decisions
+    are reused for repeated messages when a `decision_cache` is given.
+
+    The tool calls the LLM returns run in parallel. With `max_steps` > 1
+    the results go back to the LLM, which may call more tools, up to
+    `max_steps` rounds. Calls that need the output of another call of
+    the same step (TOOL_DEPENDENCIES) don't run with arguments the LLM
+    made up: they go back to the LLM with the results, which gets one
+    extra round for them if the step was the last one.
+
+    `invoke` blocks; `ainvoke` is its async counterpart for the API
+    server: it awaits the LLM and the tools' `_arun`, so concurrent
+    requests overlap on one event loop instead of holding a thread each.
+    """
+
+    def __init__(
+        self,
+        llm_with_tools,
+        tools,
+        classifier: Optional[IntentClassifier] = None,
+        decision_cache: Optional[DecisionCache] = None,
+        max_steps: int = AGENT_MAX_STEPS
+    ):
+        self.llm_with_tools = llm_with_tools
+        self.tools = {tool.name: tool for tool in tools}
+        self.classifier = classifier if classifier is not None else IntentClassifier()
+        self.decision_cache = decision_cache
+        self.max_steps = max(1, max_steps)
+        self.routing = RoutingStats()
+        # Cached decisions are only valid for the same tools, prompt and model
+        model_name = getattr(getattr(llm_with_tools, "bound", None), "model_name", "")
+        self.schema_version = tool_schema_version(tools, SYSTEM_PROMPT, str(model_name))
+
+    def invoke(self, messages):
+        """Process user message and execute the appropriate tools.
+
+        Returns {"messages": [{"content": ...}], "route": "fast_path" | "llm",
+        "tool_runs": [{"tool", "args", "status", "latency_ms"}, ...]}.
+        """
+        try:
+            user_message = messages["messages"][0]["content"]
+
+            # Fast path: confident local classification, no LLM round-trip
+            fast_call = self._fast_path_call(user_message)
+            if fast_call is not None:
+                return self._result("fast_path", self._execute_tool_calls([fast_call]))
+
+            # LLM decides which tools to use based on tool descriptions
+            decision = self._decide(user_message)
+            conversation = self._conversation(user_message)
+            runs, step, steps = [], 0, self.max_steps
+            while decision["tool_calls"]:
+                step += 1
+                ready, waiting = self._split_dependent(decision["tool_calls"])
+                if waiting and step == steps == self.max_steps:
+                    # One extra round, so the LLM can make them with the real outputs
+                    steps += 1
+                step_runs = self._execute_tool_calls(ready)
+                runs.extend(step_runs)
+                if step == steps:
+                    runs.extend(self._skipped_runs(waiting))
+                    decision = {"tool_calls": [], "content": ""}
+                    break
+                # Send the results back and let the LLM continue
+                conversation.extend(self._tool_messages(step, ready, step_runs))
+                decision = decision_from_response(self._llm(conversation))
+
+            # Tool outputs, plus the LLM's direct response if it gave one
+            return self._result("llm", runs, decision["content"])
+
+        except Exception as e:
+            return {"messages": [{"content": f"Error al procesar tu solicitud: {str(e)}"}]}
+
+    async def ainvoke(self, messages):
+        """Async version of `invoke`, with the same result."""
+        try:
+            user_message = messages["messages"][0]["content"]
+
+            fast_call = self._fast_path_call(user_message)
+            if fast_call is not None:
+                return self._result("fast_path", await self._aexecute_tool_calls([fast_call]))
+
+            decision = await self._adecide(user_message)
+            conversation = self._conversation(user_message)
+            runs, step, steps = [], 0, self.max_steps
+            while decision["tool_calls"]:
+                step += 1
+                ready, waiting = self._split_dependent(decision["tool_calls"])
+                if waiting and step == steps == self.max_steps:
+                    steps += 1
+                step_runs = await self._aexecute_tool_calls(ready)
+                runs.extend(step_runs)
+                if step == steps:
+                    runs.extend(self._skipped_runs(waiting))
+                    decision = {"tool_calls": [], "content": ""}
+                    break
+                conversation.extend(self._tool_messages(step, ready, step_runs))
+                decision = decision_from_response(await self._allm(conversation))
+
+            return self._result("llm", runs, decision["content"])
+
+        except Exception as e:
+            return {"messages": [{"content": f"Error al procesar tu solicitud: {str(e)}"}]}
+
+    def _fast_path_call(self, user_message: str) -> Optional[Dict]:
+        """Tool call for a confidently classified message, or None; counts the route."""
+        with span("agent.classify"):
+            intent = self.classifier.classify(user_message)
+        if intent is not None and intent.tool in self.tools:
+            self.routing.record(fast_path=True, tool=intent.tool)
+            return {"name": intent.tool, "args": intent.args}
+        self.routing.record(fast_path=False)
+        return None
+
+    @staticmethod
+    def _conversation(user_message: str) -> List:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_message}
+        ]
+
+    def _llm(self, conversation: List):
+        with track_stage("llm_invoke"):
+            return self.llm_with_tools.invoke(conversation)
+
+    async def _allm(self, conversation: List):
+        """Awaits the LLM; clients without `ainvoke` run in the blocking pool."""
+        with track_stage("llm_invoke"):
+            if hasattr(self.llm_with_tools, "ainvoke"):
+                return await self.llm_with_tools.ainvoke(conversation)
+            return await run_blocking(self.llm_with_tools.invoke, conversation)
+
+    def _run_tool(self, tool_call: Dict) -> Dict:
+        """Runs one tool call, timing it. Errors are reported, not raised."""
+        name, args = tool_call["name"], tool_call.get("args") or {}
+        start = time.perf_counter()
+        status, error = "ok", None
+        if name not in self.tools:
+            output, status = f"Error: Herramienta {name} no encontrada.", "error"
+        else:
+            try:
+                with span(f"tool:{name}"):
+                    output = str(self.tools[name]._run(**args))
+            except Exception as e:
+                output, status, error = f"Error en {name}: {str(e)}", "error", e
+        return self._tool_run(name, args, status, start, output, error)
+
+    async def _arun_tool(self, tool_call: Dict) -> Dict:
+        """Async `_run_tool`: awaits the tool's `_arun`, or runs `_run` in the pool."""
+        name, args = tool_call["name"], tool_call.get("args") or {}
+        start = time.perf_counter()
+        status, error = "ok", None
+        if name not in self.tools:
+            output, status = f"Error: Herramienta {name} no encontrada.", "error"
+        else:
+            tool = self.tools[name]
+            try:
+                with span(f"tool:{name}"):
+                    if hasattr(tool, "_arun"):
+                        output = str(await tool._arun(**args))
+                    else:
+                        output = str(await run_blocking(tool._run, **args))
+            except Exception as e:
+                output, status, error = f"Error en {name}: {str(e)}", "error", e
+        return self._tool_run(name, args, status, start, output, error)
+
+    def _tool_run(
+        self,
+        name: str,
+        args: Dict,
+        status: str,
+        start: float,
+        output: str,
+        error: Optional[Exception] = None
+    ) -> Dict:
+        """Result entry of a tool run; its latency also goes to the metrics."""
+        latency = time.perf_counter() - start
+        # Names the LLM made up share one series
+        observe_stage(f"tool:{name if name in self.tools else 'unknown'}", latency, error)
+        return {
+            "tool": name,
+            "args": args,
+            "status": status,
+            "latency_ms": round(latency * 1000, 2),
+            "output": output
+        }
+
+    @staticmethod
+    def _split_dependent(tool_calls: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Splits a step's calls into those that run now and those that need
+        the output of another call of the step (see TOOL_DEPENDENCIES)."""
+        called = {call["name"] for call in tool_calls}
+        ready, waiting = [], []
+        for call in tool_calls:
+            needs = TOOL_DEPENDENCIES.get(call["name"], set()) - {call["name"]}
+            (waiting if needs & called else ready).append(call)
+        if not ready:
+            # A cycle can't be ordered: run everything
+            return tool_calls, []
+        return ready, waiting
+
+    @staticmethod
+    def _skipped_runs(tool_calls: List[Dict]) -> List[Dict]:
+        """Result entries for dependent calls left without a round to run in."""
+        return [
+            {
+                "tool": call["name"],
+                "args": call.get("args") or {},
+                "status": "skipped",
+                "latency_ms": 0.0,
+                "output": f"Omitida: {call['name']} necesita el resultado de "
+                          f"{', '.join(sorted(TOOL_DEPENDENCIES[call['name']]))}."
+            }
+            for call in tool_calls
+        ]
+
+    def _execute_tool_calls(self, tool_calls: List[Dict]) -> List[Dict]:
+        """Runs the tool calls in parallel; results keep the order of `tool_calls`."""
+        if len(tool_calls) == 1:
+            return [self._run_tool(tool_calls[0])]
+        futures = [
+            _tool_executor.submit(contextvars.copy_context().run, self._run_tool, call)
+            for call in tool_calls
+        ]
+        return [future.result() for future in futures]
+
+    async def _aexecute_tool_calls(self, tool_calls: List[Dict]) -> List[Dict]:
+        """Async `_execute_tool_calls`: the calls are gathered."""
+        return list(await asyncio.gather(*(self._arun_tool(call) for call in tool_calls)))
+
+    @staticmethod
+    def _tool_messages(step: int, tool_calls: List[Dict], runs: List[Dict]) -> List:
+        """Assistant tool-call message plus one tool message per result."""
+        ids = [f"call_{step}_{i}" for i in range(len(tool_calls))]
+        assistant = AIMessage(content="", tool_calls=[
+            {"name": call["name"], "args": call.get("args") or {}, "id": call_id}
+            for call, call_id in zip(tool_calls, ids)
+        ])
+        return [assistant] + [
+            ToolMessage(content=run["output"], tool_call_id=call_id)
+            for run, call_id in zip(runs, ids)
+        ]
+
+    @staticmethod
+    def _result(route: str, runs: List[Dict], content: str = "") -> Dict:
+        outputs = [run["output"] for run in runs]
+        if content:
+            outputs.append(content)
+        return {
+            "messages": [{"content": "\n\n".join(outputs)}],
+            "route": route,
+            "tool_runs": [
+                {key: run[key] for key in ("tool", "args", "status", "latency_ms")}
+                for run in runs
+            ]
+        }
+
+    def _decide(self, user_message):
+        """The LLM's decision (tool calls and content), cached when possible."""
+        key = uploaded = None
+        if self.decision_cache is not None:
+            normalized, uploaded = normalize_message(user_message)
+            key = self.decision_cache.make_key(normalized, self.schema_version)
+            cached = self.decision_cache.get(key)
+            if cached is not None:
+                return restore_decision(cached, uploaded)
+
+        decision = decision_from_response(self._llm(self._conversation(user_message)))
+
+        if key is not None:
+            abstracted = abstract_decision(decision, uploaded)
+            if abstracted is not None:
+                self.decision_cache.put(key, abstracted)
+        return decision
+
+    async def _adecide(self, user_message):
+        """Async `_decide`; the cache (possibly SQLite) is read and written in the pool."""
+        key = uploaded = None
+        if self.decision_cache is not None:
+            normalized, uploaded = normalize_message(user_message)
+            key = self.decision_cache.make_key(normalized, self.schema_version)
+            cached = await run_blocking(self.decision_cache.get, key)
+            if cached is not None:
+                return restore_decision(cached, uploaded)
+
+        decision = decision_from_response(await self._allm(self._conversation(user_message)))
+
+        if key is not None:
+            abstracted = abstract_decision(decision, uploaded)
+            if abstracted is not None:
+                await run_blocking(self.decision_cache.put, key, abstracted)
+        return decision
+
+    def stats(self):
+        """Routing counters: requests, fast-path hits and hit rate."""
+        return {
+            **self.routing.to_dict(),
+            "intent_threshold": self.classifier.threshold,
+            "decision_cache": self.decision_cache.stats() if self.decision_cache is not None else None
+        }
+
+
+def create_agent(history_store=None):
+    """Creates and configures the transcription agent.
+
+    The history tools use `history_store`, or the process-wide store
+    (see `storage.get_history_store`) when it is not given.
+    """
 
     # Load API key
     api_key = load_configuration()
@@ -55,51 +407,15 @@ def create_agent():
     # Initialize tools
     tools = [
         TranscribeAudioTool(),
-        SaveTranscriptionTool(),
-        QueryHistoryTool()
+        SaveTranscriptionTool(store=history_store),
+        QueryHistoryTool(store=history_store)
     ]
 
     # Bind tools to LLM - the LLM will automatically decide which tool to use
     llm_with_tools = llm.bind_tools(tools)
 
     # Create intelligent agent using native function calling
-    class IntelligentAgent:
-        def __init__(self, llm_with_tools, tools):
-            self.llm_with_tools = llm_with_tools
-            self.tools = {tool.name: tool for tool in tools}
-
-        def invoke(self, messages):
-            """Process user message and execute appropriate tool."""
-            try:
-                user_message = messages["messages"][0]["content"]
-
-                # LLM decides which tool to use based on tool descriptions
-                response = self.llm_with_tools.invoke([
-                    {"role": "system", "content": "Eres un asistente experto en transcripción de audio. Analiza el mensaje del usuario y usa la herramienta más apropiada según su intención."},
-                    {"role": "user", "content": user_message}
-                ])
-
-                # Check if LLM wants to use a tool
-                if hasattr(response, 'tool_calls') and response.tool_calls:
-                    tool_call = response.tool_calls[0]
-                    tool_name = tool_call['name']
-                    tool_args = tool_call['args']
-
-                    # Execute the selected tool
-                    if tool_name in self.tools:
-                        tool = self.tools[tool_name]
-                        result = tool._run(**tool_args)
-                        return {"messages": [{"content": str(result)}]}
-                    else:
-                        return {"messages": [{"content": f"Error: Herramienta {tool_name} no encontrada."}]}
-
-                # If no tool call, return the LLM's direct response
-                return {"messages": [{"content": response.content}]}
-
-            except Exception as e:
-                return {"messages": [{"content": f"Error al procesar tu solicitud: {str(e)}"}]}
-
-    return IntelligentAgent(llm_with_tools, tools)
+    return IntelligentAgent(llm_with_tools, tools, decision_cache=get_decision_cache())
 
 
 def main():
@@ -4,39 +4,75 @@ API REST Server for Audio Transcription
 
 FastAPI server that provides endpoints for:
 - Upload and transcribe audio files
+- Transcribe live audio over a WebSocket
 - Query transcription history
 - Download transcriptions as CSV
 
 Author: AI Transcription System
 """
 
+import asyncio
 import os
-import io
-import csv
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, List
 
-import pandas as pd
-import requests
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Response, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request, Response, Form, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.websockets import WebSocketDisconnect, WebSocketState
 from pydantic import BaseModel
 
 from dotenv import load_dotenv
 
-# Import agent
-from src.agent import create_agent
+from src.concurrency import iterate_blocking, run_blocking
+from src.batch import BATCH_CONCURRENCY, history_records, transcribe_batch
+from src.chunking import should_chunk, transcribe_chunked
+from src.jobs import JobQueue, QueueFullError
+from src.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware, record_cache, track_stage
+from src.tracing import TracingMiddleware, current_timings
+from src.deepgram_client import CircuitOpenError, DeepgramError, close_async_client, get_async_client
+from src.streaming import DeepgramStream, forward_audio
+from src.storage import (
+    create_history_store,
+    create_snapshot,
+    gzip_chunks,
+    iter_csv_chunks,
+    set_history_store,
+    snapshot_available
+)
+from src.transcription_cache import get_transcription_cache, transcribe_cached
+from src.uploads import UploadSizeLimitMiddleware, save_upload, upload_destination
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts the job workers and the agent warm-up; releases the workers
+    and the Deepgram pool on shutdown."""
+    global agent_warmup
+    await job_queue.start()
+    if AGENT_WARMUP:
+        agent_warmup = asyncio.create_task(run_blocking(load_agent))
+    yield
+    if agent_warmup is not None:
+        # A build in progress can't be interrupted; let it finish
+        await asyncio.gather(agent_warmup, return_exceptions=True)
+    await job_queue.stop()
+    await close_async_client()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Audio Transcription API",
     description="API for transcribing audio files using Deepgram",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -48,37 +84,86 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized request bodies while they arrive (MAX_UPLOAD_MB)
+app.add_middleware(UploadSizeLimitMiddleware)
+
+# Request counts, latencies and in-flight gauges per route for /metrics
+app.add_middleware(MetricsMiddleware, router=app.router)
+
+# Per-stage timings for requests with the debug header, span export (TRACE_EXPORT)
+app.add_middleware(TracingMiddleware)
+
 # Configuration from .env file
 UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "/app/data/audio/uploads"))
 TRANSCRIPTIONS_DIR = Path(os.getenv("TRANSCRIPTIONS_DIR", "/app/data/transcriptions"))
 CSV_PATH = Path(os.getenv("CSV_PATH", "/app/data/transcriptions/output/history.csv"))
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "csv")  # csv | sqlite
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH")  # sqlite only, defaults to CSV_PATH with .db
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
+# Build the agent in the background as soon as the server starts ('false': on the first /agent call)
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "true").lower() not in ("0", "false", "no")
 
 # Ensure directories exist
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 CSV_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-# Initialize agent
-try:
-    agent = create_agent()
-    print("✅ Agent initialized successfully")
-except Exception as e:
-    print(f"⚠️ Warning: Could not initialize agent: {e}")
-    agent = None
-
-# Initialize CSV if it doesn't exist
-def initialize_csv():
-    if not CSV_PATH.exists():
-        df = pd.DataFrame(columns=[
-            'timestamp',
-            'filename',
-            'duration_seconds',
-            'model',
-            'transcription_text'
-        ])
-        df.to_csv(CSV_PATH, index=False, encoding='utf-8')
-
-initialize_csv()
+# Initialize history store (creates the CSV/database if it doesn't exist).
+# It is the process-wide store, so the agent's tools write to the same history
+history_store = create_history_store(HISTORY_BACKEND, CSV_PATH, HISTORY_DB_PATH)
+set_history_store(history_store)
+
+# Parquet snapshot of the history for /download?format=parquet (needs pyarrow),
+# created on first use so pyarrow isn't imported at startup
+history_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def get_history_snapshot():
+    """The history's Parquet snapshot, or None without pyarrow."""
+    global history_snapshot
+    with _snapshot_lock:
+        if history_snapshot is None and snapshot_available():
+            history_snapshot = create_snapshot(history_store)
+        return history_snapshot
+
+# The agent (LangChain, the Groq client and the tools) takes most of the
+# startup time, so it is not built at import: the warm-up task started
+# by `lifespan` builds it in the background, or the first /agent call
+# does. /health answers meanwhile; /ready reports when it is done.
+AGENT_NOT_LOADED = object()
+agent = AGENT_NOT_LOADED
+agent_warmup: Optional[asyncio.Task] = None
+agent_status = {"state": "not_loaded", "error": None, "load_seconds": None}
+_agent_lock = threading.Lock()
+
+def load_agent():
+    """Builds the agent once (blocking); None if it can't be initialized."""
+    global agent
+    with _agent_lock:
+        if agent is not AGENT_NOT_LOADED:
+            return agent
+        agent_status["state"] = "loading"
+        start_time = time.perf_counter()
+        try:
+            from src.agent import create_agent
+            agent = create_agent(history_store)
+            agent_status["state"] = "ready"
+            print("✅ Agent initialized successfully")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not initialize agent: {e}")
+            agent = None
+            agent_status.update(state="unavailable", error=str(e))
+        agent_status["load_seconds"] = round(time.perf_counter() - start_time, 3)
+        return agent
+
+async def get_agent():
+    """The agent, building it first if needed (None if unavailable)."""
+    if agent is AGENT_NOT_LOADED:
+        return await run_blocking(load_agent)
+    return agent
+
+def loaded_agent():
+    """The agent if it has been built, without triggering the build."""
+    return None if agent is AGENT_NOT_LOADED else agent
 
 # Pydantic models
 class AgentRequest(BaseModel):
@@ -101,76 +186,163 @@ class TranscriptionResponse(BaseModel):
     transcription: Optional[str] = None
     duration: Optional[float] = None
     timestamp: Optional[str] = None
+    cached: bool = False  # True when served from the transcription cache
+    timings: Optional[dict] = None  # Per-stage breakdown, only with the debug header
+
+class BatchItemResult(BaseModel):
+    filename: str
+    success: bool
+    transcription: Optional[str] = None
+    duration: Optional[float] = None
+    cached: bool = False
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    success: bool  # True when every file was transcribed
+    total: int
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
+    timings: Optional[dict] = None  # Per-stage breakdown, only with the debug header
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str  # queued | processing | completed | failed
+    filename: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[TranscriptionResponse] = None
+    error: Optional[str] = None
 
 class HistoryItem(BaseModel):
+    id: Optional[int] = None
     timestamp: str
     filename: str
     duration_seconds: Optional[float] = None
     model: str
     transcription_text: str
+    score: Optional[float] = None  # Relevance, only for ranked searches
 
 class HistoryResponse(BaseModel):
     success: bool
     total_count: int
     transcriptions: List[HistoryItem]
+    next_cursor: Optional[str] = None  # Pass as `cursor` to get the next page
 
 # Helper functions
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows a gzip response."""
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            q = params.replace(" ", "").lower()
+            if not q.startswith("q="):
+                return True
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
 def save_to_csv(filename: str, transcription: str, duration: float, model: str = "deepgram-nova-2") -> str:
     """Save transcription to CSV history."""
     try:
-        df = pd.read_csv(CSV_PATH, encoding='utf-8')
-        
-        new_row = {
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'filename': filename,
-            'duration_seconds': duration,
-            'model': model,
-            'transcription_text': transcription
-        }
-        
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        df.to_csv(CSV_PATH, index=False, encoding='utf-8')
-        
-        return str(len(df))
+        with track_stage("save_to_csv"):
+            record = history_store.save(filename, transcription, duration, model)
+        return str(record['id'])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving to CSV: {str(e)}")
 
-def transcribe_audio(audio_file_path: Path, language: str = "es") -> tuple[str, float]:
-    """Transcribe audio file using Deepgram API."""
+async def transcribe_audio(
+    audio_file_path: Path,
+    language: str = "es",
+    chunked: Optional[bool] = None
+) -> tuple[str, float]:
+    """Transcribe audio file using Deepgram API (without blocking the event loop).
+
+    Long recordings (or any, with chunked=True) are transcribed in
+    parallel segments; see src/chunking.py.
+    """
     if not DEEPGRAM_API_KEY:
         raise HTTPException(status_code=500, detail="DEEPGRAM_API_KEY not configured")
     
-    headers = {
-        "Authorization": f"Token {DEEPGRAM_API_KEY}",
-        "Content-Type": "audio/*"
-    }
-    
-    start_time = datetime.now()
-    
-    with open(audio_file_path, 'rb') as f:
-        response = requests.post(
-            f"https://api.deepgram.com/v1/listen?model=nova-2&language={language}",
-            headers=headers,
-            data=f
-        )
-    
-    end_time = datetime.now()
-    duration = (end_time - start_time).total_seconds()
+    start_time = time.perf_counter()
+    client = get_async_client()
+
+    async def transcribe_segment(segment_path: Path) -> str:
+        transcription, _ = await client.transcribe_file(segment_path, "nova-2", language)
+        return transcription
     
-    if response.status_code != 200:
-        raise HTTPException(
-            status_code=500, 
-            detail=f"Deepgram API error: {response.status_code} - {response.text}"
-        )
+    try:
+        with track_stage("transcribe_audio"):
+            if await run_blocking(should_chunk, audio_file_path, chunked):
+                transcription, _ = await transcribe_chunked(audio_file_path, transcribe_segment)
+            else:
+                transcription = await transcribe_segment(audio_file_path)
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except DeepgramError as e:
+        raise HTTPException(status_code=500, detail=str(e))
     
-    result = response.json()
-    transcription = result.get('results', {}).get('channels', [{}])[0].get('alternatives', [{}])[0].get('transcript', '').strip()
+    duration = time.perf_counter() - start_time
     
     if not transcription:
         raise HTTPException(status_code=500, detail="No transcription received from API")
     
     return transcription, duration
 
+async def transcribe_with_cache(
+    audio_file_path: Path,
+    language: str = "es",
+    content_hash: Optional[str] = None,
+    chunked: Optional[bool] = None
+) -> tuple[str, float, bool]:
+    """Transcribe audio, reusing a cached transcript for identical audio.
+
+    Returns (transcription, duration, cached). On a cache hit `duration`
+    is the lookup time instead of the Deepgram round-trip.
+    """
+    async def transcribe(path: Path) -> str:
+        return (await transcribe_audio(path, language, chunked))[0]
+
+    return await transcribe_cached(audio_file_path, language, transcribe, content_hash)
+
+VALID_AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.ogg', '.flac', '.mp4'}
+
+def validate_audio_file(file: UploadFile) -> None:
+    """Raise 400 if the upload has no name or an unsupported extension."""
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+    
+    file_ext = Path(file.filename).suffix.lower()
+    if file_ext not in VALID_AUDIO_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file extension. Supported: {', '.join(VALID_AUDIO_EXTENSIONS)}"
+        )
+
+async def process_transcription_job(job) -> dict:
+    """Job worker: transcribe the stored upload and save it to history like /upload."""
+    payload = job.payload
+    file_path = Path(payload["file_path"])
+    transcription, duration, cached = await transcribe_with_cache(
+        file_path, payload["language"], payload["content_hash"]
+    )
+    await run_blocking(save_to_csv, payload["filename"], transcription, duration)
+    return TranscriptionResponse(
+        success=True,
+        message="File transcribed successfully" + (" (cached)" if cached else ""),
+        filename=payload["filename"],
+        transcription=transcription,
+        duration=duration,
+        timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        cached=cached
+    ).model_dump()
+
+# Background transcription jobs (JOB_WORKERS concurrent workers)
+job_queue = JobQueue(process_transcription_job)
+
 # API Endpoints
 @app.get("/", status_code=200)
 async def root():
@@ -181,27 +353,73 @@ async def root():
         "endpoints": {
             "agent": "/agent - Intelligent endpoint that decides what action to take based on your message",
             "upload": "/upload - Legacy direct transcription endpoint",
+            "upload_batch": "/upload/batch - Transcribe many files concurrently in one request",
+            "jobs": "/jobs - Queue a transcription and poll /jobs/{job_id} for the result",
+            "stream": "/stream - WebSocket for live transcription (interim and final results)",
             "history": "/history - Direct history query",
             "download": "/download - Download CSV history",
-            "health": "/health - Health check"
+            "health": "/health - Liveness check",
+            "metrics": "/metrics - Prometheus metrics",
+            "ready": "/ready - Readiness check (503 while starting up)"
         }
     }
 
 @app.get("/health", status_code=200)
 async def health_check():
-    """Health check endpoint."""
+    """Liveness check: answers as soon as the process serves requests."""
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "api_key_configured": bool(DEEPGRAM_API_KEY)
     }
 
+@app.get("/ready", status_code=200)
+async def readiness_check(response: Response):
+    """Readiness check: 503 until the agent warm-up has finished.
+
+    An agent that could not be initialized (e.g. no GROQ_API_KEY) does
+    not make the server unready: /agent falls back to keyword routing.
+    """
+    starting = agent_warmup is not None and not agent_warmup.done()
+    if starting:
+        response.status_code = 503
+    return {
+        "status": "starting" if starting else "ready",
+        "agent": agent_status["state"],
+        "agent_error": agent_status["error"],
+        "agent_load_seconds": agent_status["load_seconds"]
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms, errors by type,
+    HTTP requests in flight and cache hit ratios (see src/metrics.py)."""
+    cache = get_transcription_cache()
+    if cache is not None:
+        record_cache("transcription", await run_blocking(cache.stats))
+    agent = loaded_agent()
+    if agent is not None:
+        routing = agent.stats()
+        record_cache("decision", routing["decision_cache"])
+        record_cache("agent_fast_path", {
+            "hits": routing["fast_path"],
+            "misses": routing["llm"],
+            "hit_ratio": routing["fast_path_hit_rate"]
+        })
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 @app.post("/agent")
 async def agent_process(
     message: str = Form(...),
-    file: Optional[UploadFile] = File(None)
+    file: Optional[UploadFile] = File(None),
+    details: bool = Form(False)
 ):
-    """Intelligent agent that decides what action to take based on the message content using function calling."""
+    """Intelligent agent that decides what action to take based on the message content using function calling.
+
+    Returns the agent's answer as text. With `details=true` it returns
+    JSON with the answer, the route taken (fast_path or llm) and every
+    tool run with its latency.
+    """
 
     saved_file_path = None
 
@@ -218,23 +436,21 @@ async def agent_process(
             if file_ext not in valid_extensions:
                 return f"Error: Extensión de archivo no válida. Formatos soportados: {', '.join(valid_extensions)}"
 
-            # Save uploaded file
-            file_path = UPLOAD_DIR / file.filename
-            content = await file.read()
-
-            with open(file_path, "wb") as f:
-                f.write(content)
+            # Save uploaded file (streamed to disk in chunks)
+            file_path = upload_destination(UPLOAD_DIR, file.filename)
+            await save_upload(file, file_path)
 
             saved_file_path = str(file_path)
 
             # Add file info to message
             full_message = f"{message}. Archivo subido: {saved_file_path}"
 
-        # Use intelligent agent if available
+        # Use intelligent agent if available (built on first use)
+        agent = await get_agent()
         if agent is not None:
             try:
-                # Invoke agent with message
-                result = agent.invoke({
+                # Invoke agent with message (async LLM and tools, requests overlap)
+                result = await agent.ainvoke({
                     "messages": [{"role": "user", "content": full_message}]
                 })
 
@@ -244,6 +460,16 @@ async def agent_process(
                 else:
                     response_text = str(result)
 
+                if details:
+                    detail = {
+                        "response": response_text,
+                        "route": result.get("route"),
+                        "tool_runs": result.get("tool_runs", [])
+                    }
+                    timings = current_timings()
+                    if timings is not None:
+                        detail["timings"] = timings
+                    return detail
                 return response_text
 
             except Exception as agent_error:
@@ -256,13 +482,12 @@ async def agent_process(
 
         if any(word in message_lower for word in ["historial", "historico", "history", "consultar", "buscar"]):
             try:
-                df = pd.read_csv(CSV_PATH, encoding='utf-8')
-                if len(df) == 0:
+                recent = await run_blocking(history_store.latest, 5)
+                if len(recent) == 0:
                     response_text = "No hay transcripciones en el historial aún."
                 else:
-                    recent = df.sort_values('timestamp', ascending=False).head(5)
                     response_text = "Historial de transcripciones recientes:\n\n"
-                    for _, row in recent.iterrows():
+                    for row in recent:
                         response_text += f"📄 {row['filename']}\n"
                         response_text += f"📅 {row['timestamp']}\n"
                         response_text += f"📝 {row['transcription_text'][:100]}...\n\n"
@@ -271,9 +496,9 @@ async def agent_process(
 
         elif "transcrib" in message_lower and saved_file_path:
             try:
-                transcription, duration = transcribe_audio(Path(saved_file_path), "es")
-                save_to_csv(Path(saved_file_path).name, transcription, duration)
-                response_text = f"Transcripción completada:\n\nArchivo: {Path(saved_file_path).name}\nDuración: {duration:.2f} segundos\n\nTranscripción:\n{transcription}"
+                transcription, duration, _ = await transcribe_with_cache(Path(saved_file_path), "es")
+                await run_blocking(save_to_csv, Path(file.filename).name, transcription, duration)
+                response_text = f"Transcripción completada:\n\nArchivo: {Path(file.filename).name}\nDuración: {duration:.2f} segundos\n\nTranscripción:\n{transcription}"
             except Exception as e:
                 response_text = f"Error al transcribir el archivo: {str(e)}"
 
@@ -282,6 +507,8 @@ async def agent_process(
 
         return response_text
 
+    except HTTPException:
+        raise
     except Exception as e:
         # Clean up uploaded file on error
         if saved_file_path and Path(saved_file_path).exists():
@@ -291,44 +518,36 @@ async def agent_process(
 @app.post("/upload", response_model=TranscriptionResponse)
 async def upload_and_transcribe(
     file: UploadFile = File(...),
-    language: str = Query(default="es", description="Language code (es, en, etc.)")
+    language: str = Query(default="es", description="Language code (es, en, etc.)"),
+    chunked: Optional[bool] = Query(
+        None, description="Transcribe in parallel segments (default: only long recordings)"
+    )
 ):
     """Legacy endpoint for direct audio upload and transcription."""
     
     # Validate file
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No file provided")
-    
-    valid_extensions = {'.mp3', '.wav', '.m4a', '.ogg', '.flac', '.mp4'}
-    file_ext = Path(file.filename).suffix.lower()
-    
-    if file_ext not in valid_extensions:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid file extension. Supported: {', '.join(valid_extensions)}"
-        )
+    validate_audio_file(file)
     
     try:
-        # Save uploaded file
-        file_path = UPLOAD_DIR / file.filename
-        content = await file.read()
+        # Save uploaded file (streamed to disk in chunks, hashed on the way)
+        file_path = upload_destination(UPLOAD_DIR, file.filename)
+        _, content_hash = await save_upload(file, file_path)
         
-        with open(file_path, "wb") as f:
-            f.write(content)
-        
-        # Transcribe
-        transcription, duration = transcribe_audio(file_path, language)
+        # Transcribe (or reuse the transcript of identical audio)
+        transcription, duration, cached = await transcribe_with_cache(file_path, language, content_hash, chunked)
         
         # Save to history
-        total_count = save_to_csv(file.filename, transcription, duration)
+        total_count = await run_blocking(save_to_csv, file.filename, transcription, duration)
         
         return TranscriptionResponse(
             success=True,
-            message="File transcribed successfully",
+            message="File transcribed successfully" + (" (cached)" if cached else ""),
             filename=file.filename,
             transcription=transcription,
             duration=duration,
-            timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            cached=cached,
+            timings=current_timings()
         )
         
     except HTTPException:
@@ -336,102 +555,321 @@ async def upload_and_transcribe(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+@app.post("/upload/batch", response_model=BatchResponse)
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    language: str = Query(default="es", description="Language code (es, en, etc.)"),
+    concurrency: int = Query(
+        default=BATCH_CONCURRENCY, ge=1, le=64,
+        description="Maximum concurrent Deepgram calls"
+    )
+):
+    """Transcribe many files in one request.
+
+    Files are transcribed concurrently (bounded by `concurrency`) and all
+    successful transcriptions are saved to history in a single write.
+    Failures are reported per file without aborting the batch.
+    """
+    items = []
+    for file in files:
+        item = {"filename": file.filename or ""}
+        try:
+            validate_audio_file(file)
+            # Unique name so files with the same name in one batch don't collide
+            file_path = upload_destination(UPLOAD_DIR, file.filename)
+            _, item["content_hash"] = await save_upload(file, file_path)
+            item["path"] = str(file_path)
+        except HTTPException as e:
+            item["error"] = e.detail
+        items.append(item)
+    
+    async def transcribe(path: Path, content_hash: Optional[str]):
+        return await transcribe_with_cache(path, language, content_hash)
+    
+    results = await transcribe_batch(items, transcribe, concurrency)
+    
+    # One write for the whole batch
+    records = history_records(results)
+    if records:
+        try:
+            with track_stage("save_to_csv"):
+                await run_blocking(history_store.append_many, records)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error saving to CSV: {str(e)}")
+    
+    succeeded = len(records)
+    return BatchResponse(
+        success=succeeded == len(results),
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=[BatchItemResult(**result) for result in results],
+        timings=current_timings()
+    )
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_transcription_job(
+    file: UploadFile = File(...),
+    language: str = Query(default="es", description="Language code (es, en, etc.)")
+):
+    """Store the upload and queue its transcription; poll GET /jobs/{job_id} for the result."""
+    validate_audio_file(file)
+    
+    # Unique name so queued jobs with the same filename don't overwrite each other
+    file_path = upload_destination(UPLOAD_DIR, file.filename)
+    _, content_hash = await save_upload(file, file_path)
+    
+    try:
+        job = await job_queue.submit({
+            "file_path": str(file_path),
+            "filename": file.filename,
+            "language": language,
+            "content_hash": content_hash
+        })
+    except QueueFullError as e:
+        file_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return JobResponse(**job.to_dict())
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_transcription_job(job_id: str):
+    """Status of a transcription job and, once completed, its result."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return JobResponse(**job.to_dict())
+
+@app.websocket("/stream")
+async def stream_transcription(
+    websocket: WebSocket,
+    language: str = Query(default="es", description="Language code (es, en, etc.)"),
+    model: str = Query(default="nova-2", description="Deepgram model"),
+    encoding: Optional[str] = Query(None, description="Raw audio encoding (e.g. linear16); omit for containerized audio"),
+    sample_rate: Optional[int] = Query(None, ge=1, description="Sample rate of raw audio"),
+    filename: Optional[str] = Query(None, description="Name saved in history (default: stream_<date>)"),
+    save: bool = Query(True, description="Save the final transcript to history")
+):
+    """Live transcription over a WebSocket.
+
+    The client sends audio as binary messages while it is captured and
+    `{"type": "stop"}` when it is done (closing the connection also ends
+    the audio). The server forwards the audio to Deepgram's streaming
+    API as it arrives and answers with JSON messages:
+
+    - `{"type": "ready"}`: connected to Deepgram, audio can be sent
+    - `{"type": "interim", "text", "start", "duration"}`: provisional text
+      of the phrase being spoken (replaced by later results)
+    - `{"type": "final", ...}`: settled text of a stretch of audio
+    - `{"type": "completed", "transcription", "id", "duration", "audio_seconds"}`:
+      the whole transcript, once saved to history
+    - `{"type": "error", "detail"}`: the session failed; the connection is closed
+
+    The transcript is saved even if the client disconnects before the end.
+    """
+    await websocket.accept()
+
+    async def send(message: dict) -> None:
+        if websocket.client_state != WebSocketState.CONNECTED:
+            return
+        try:
+            await websocket.send_json(message)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+
+    async def fail(detail: str) -> None:
+        await send({"type": "error", "detail": detail})
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close(code=1011)
+
+    if not DEEPGRAM_API_KEY:
+        await fail("DEEPGRAM_API_KEY not configured")
+        return
+
+    start_time = time.perf_counter()
+    try:
+        with track_stage("transcribe_stream"):
+            async with DeepgramStream(model, language, encoding, sample_rate) as stream:
+                await send({"type": "ready"})
+                forwarding = asyncio.create_task(forward_audio(websocket, stream))
+                try:
+                    # Each result goes to the client as soon as Deepgram sends it
+                    async for result in stream:
+                        await send(result.to_dict())
+                finally:
+                    forwarding.cancel()
+                    await asyncio.gather(forwarding, return_exceptions=True)
+    except DeepgramError as e:
+        await fail(str(e))
+        return
+    duration = time.perf_counter() - start_time
+
+    transcription = stream.transcript
+    record_id = None
+    if save and transcription:
+        name = filename or f"stream_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        try:
+            record_id = await run_blocking(save_to_csv, name, transcription, duration, f"deepgram-{model}")
+        except HTTPException as e:
+            await fail(e.detail)
+            return
+
+    await send({
+        "type": "completed",
+        "transcription": transcription,
+        "id": record_id,
+        "duration": round(duration, 3),
+        "audio_seconds": round(stream.audio_seconds, 3)
+    })
+    if websocket.client_state == WebSocketState.CONNECTED:
+        await websocket.close()
+
 @app.get("/history", response_model=HistoryResponse)
 async def get_history(
     search: Optional[str] = Query(None, description="Search term in transcriptions"),
-    limit: int = Query(10, ge=1, le=100, description="Maximum number of results")
+    filename: Optional[str] = Query(None, description="Only transcriptions of this file"),
+    limit: int = Query(10, ge=1, le=1000, description="Maximum number of results"),
+    order: str = Query(
+        "relevance",
+        pattern="^(relevance|recent)$",
+        description="Order of search results: relevance (ranked) or recent"
+    ),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    start: Optional[str] = Query(None, description="From this date/datetime (inclusive)"),
+    end: Optional[str] = Query(None, description="Until this date/datetime (inclusive)"),
+    model: Optional[str] = Query(None, description="Only transcriptions made with this model"),
+    filename_prefix: Optional[str] = Query(None, description="Only files whose name starts with this")
 ):
-    """Get transcription history."""
+    """Get transcription history.
+
+    Without a search (or with order=recent) results are newest first and
+    paginated: pass the returned `next_cursor` as `cursor` to get the
+    next page.
+    """
+    next_cursor = None
     try:
-        df = pd.read_csv(CSV_PATH, encoding='utf-8')
-        
-        if len(df) == 0:
-            return HistoryResponse(success=True, total_count=0, transcriptions=[])
-        
-        # Filter by search term if provided
-        if search:
-            mask = df['transcription_text'].str.contains(search, case=False, na=False)
-            df = df[mask]
-        
-        # Sort by timestamp (newest first) and limit
-        df = df.sort_values('timestamp', ascending=False).head(limit)
-        
-        transcriptions = []
-        for _, row in df.iterrows():
-            transcriptions.append(HistoryItem(
-                timestamp=row['timestamp'],
-                filename=row['filename'],
-                duration_seconds=row['duration_seconds'] if pd.notna(row['duration_seconds']) else None,
-                model=row['model'],
-                transcription_text=row['transcription_text']
-            ))
-        
-        return HistoryResponse(
-            success=True,
-            total_count=len(transcriptions),
-            transcriptions=transcriptions
-        )
-        
+        if search and order == "relevance" and not (cursor or start or end or model or filename_prefix):
+            # Ranked full-text search (accent-insensitive, prefix matching)
+            rows = await run_blocking(history_store.search, search, limit, filename)
+        else:
+            # Keyset page, newest first, filtered on the server
+            rows, next_cursor = await run_blocking(
+                history_store.page, limit, cursor, start, end, model,
+                filename_prefix, search, filename
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading history: {str(e)}")
+    
+    transcriptions = [
+        HistoryItem(
+            id=row.get('id'),
+            timestamp=row['timestamp'],
+            filename=row['filename'],
+            duration_seconds=row['duration_seconds'],
+            model=row['model'],
+            transcription_text=row['transcription_text'],
+            score=row.get('score')
+        )
+        for row in rows
+    ]
+    return HistoryResponse(
+        success=True,
+        total_count=len(transcriptions),
+        transcriptions=transcriptions,
+        next_cursor=next_cursor
+    )
 
 @app.get("/download")
-async def download_csv():
-    """Download transcription history as CSV file."""
+async def download_csv(
+    request: Request,
+    start: Optional[str] = Query(None, description="From this date/datetime (inclusive)"),
+    end: Optional[str] = Query(None, description="Until this date/datetime (inclusive)"),
+    format: str = Query("csv", pattern="^(csv|parquet)$", description="csv or parquet")
+):
+    """Download transcription history as CSV file.
+
+    Rows are streamed from the history store in chunks, so memory use
+    does not grow with the history. The response is gzip-compressed
+    when the client accepts it.
+
+    `format=parquet` returns a Parquet file instead, written from the
+    columnar snapshot (see storage/columnar.py); it needs pyarrow.
+    """
+    if format == "parquet" and await run_blocking(get_history_snapshot) is None:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow (pip install pyarrow)")
     try:
-        df = pd.read_csv(CSV_PATH, encoding='utf-8')
-        
-        if len(df) == 0:
+        if await run_blocking(history_store.count) == 0:
             raise HTTPException(status_code=404, detail="No transcriptions found")
-        
-        # Create CSV in memory
-        output = io.StringIO()
-        df.to_csv(output, index=False, encoding='utf-8')
-        output.seek(0)
-        
-        # Create response
-        response = Response(
-            content=output.getvalue(),
-            media_type="text/csv",
-            headers={
-                "Content-Disposition": f"attachment; filename=transcriptions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            }
-        )
-        
-        return response
-        
+        if format == "parquet":
+            return await parquet_download(start, end)
+        records = await run_blocking(history_store.export, start, end)
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating CSV: {str(e)}")
+    
+    chunks = iter_csv_chunks(records)
+    headers = {
+        "Content-Disposition": f"attachment; filename=transcriptions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        "Vary": "Accept-Encoding"
+    }
+    if accepts_gzip(request.headers.get("accept-encoding", "")):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(iterate_blocking(chunks), media_type="text/csv; charset=utf-8", headers=headers)
+
+async def parquet_download(start: Optional[str], end: Optional[str]) -> FileResponse:
+    """Writes the Parquet export to a temporary file, deleted once sent."""
+    fd, export_path = tempfile.mkstemp(prefix="transcriptions_", suffix=".parquet")
+    os.close(fd)
+    try:
+        await run_blocking(get_history_snapshot().export, export_path, start, end)
+    except BaseException:
+        os.unlink(export_path)
+        raise
+    return FileResponse(
+        export_path,
+        media_type="application/vnd.apache.parquet",
+        filename=f"transcriptions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet",
+        background=BackgroundTask(os.unlink, export_path)
+    )
 
 @app.get("/stats")
-async def get_stats():
-    """Get transcription statistics."""
+async def get_stats(
+    days: int = Query(30, ge=0, le=3660, description="Days included in the per-day breakdown")
+):
+    """Get transcription statistics.
+
+    Served from aggregates the history store keeps up to date on every
+    save, so the cost does not depend on the size of the history.
+    """
     try:
-        df = pd.read_csv(CSV_PATH, encoding='utf-8')
+        summary = await run_blocking(history_store.summary, 5)
         
-        if len(df) == 0:
-            return {
-                "total_transcriptions": 0,
-                "total_duration_seconds": 0,
-                "average_duration_seconds": 0,
-                "most_used_model": None,
-                "recent_files": []
-            }
+        cache = get_transcription_cache()
+        cache_stats = await run_blocking(cache.stats) if cache is not None else None
         
-        total_transcriptions = len(df)
-        total_duration = df['duration_seconds'].sum()
-        avg_duration = df['duration_seconds'].mean()
-        most_used_model = df['model'].mode().iloc[0] if not df['model'].mode().empty else None
-        recent_files = df.sort_values('timestamp', ascending=False).head(5)['filename'].tolist()
+        total_transcriptions = summary['count']
+        timed_transcriptions = summary['timed_count']
+        model_counts = summary['model_counts']
+        avg_duration = summary['total_duration'] / timed_transcriptions if timed_transcriptions else 0
+        by_day = dict(list(summary['by_day'].items())[-days:]) if days else {}
         
         return {
             "total_transcriptions": total_transcriptions,
-            "total_duration_seconds": round(total_duration, 2),
+            "total_duration_seconds": round(summary['total_duration'], 2),
             "average_duration_seconds": round(avg_duration, 2),
-            "most_used_model": most_used_model,
-            "recent_files": recent_files
+            "most_used_model": max(model_counts, key=model_counts.get) if model_counts else None,
+            "recent_files": summary['recent_files'],
+            "by_model": summary['by_model'],
+            "by_day": by_day,
+            "transcription_cache": cache_stats,
+            "agent_routing": loaded_agent().stats() if loaded_agent() is not None else None
         }
         
     except Exception as e:
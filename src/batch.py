@@ -0,0 +1,170 @@
+"""Batch transcription of many audio files.
+
+Used by the `/upload/batch` endpoint and by the command line:
+
+    python -m src.batch data/audio/uploads --language es --concurrency 8
+
+Deepgram calls run concurrently, bounded by a semaphore, and all
+successful transcriptions are written to the history in a single
+append. A failing file is reported in its own result and never aborts
+the rest of the batch.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Concurrent Deepgram calls per batch
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.ogg', '.flac', '.mp4'}
+
+TranscribeFn = Callable[[Path, Optional[str]], Awaitable[Tuple[str, float, bool]]]
+
+
+async def transcribe_batch(
+    items: List[Dict],
+    transcribe: TranscribeFn,
+    concurrency: int = BATCH_CONCURRENCY
+) -> List[Dict]:
+    """Transcribes every item concurrently, at most `concurrency` at a time.
+
+    Each item is a dict with 'filename' and 'path' (and optionally
+    'content_hash' and 'error' for files rejected before transcription).
+    `transcribe(path, content_hash)` returns (transcription, duration, cached).
+
+    Returns one result per item, in the same order.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(item: Dict) -> Dict:
+        result = {
+            "filename": item["filename"],
+            "success": False,
+            "transcription": None,
+            "duration": None,
+            "cached": False,
+            "error": item.get("error")
+        }
+        if result["error"]:
+            return result
+        async with semaphore:
+            try:
+                transcription, duration, cached = await transcribe(Path(item["path"]), item.get("content_hash"))
+            except Exception as e:
+                result["error"] = str(getattr(e, "detail", None) or e)
+                return result
+        result.update(success=True, transcription=transcription, duration=duration, cached=cached)
+        return result
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+def history_records(results: List[Dict], model: str = "deepgram-nova-2") -> List[Dict]:
+    """History rows for the successful results of a batch."""
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return [
+        {
+            'timestamp': timestamp,
+            'filename': result["filename"],
+            'duration_seconds': result["duration"],
+            'model': model,
+            'transcription_text': result["transcription"]
+        }
+        for result in results if result["success"]
+    ]
+
+
+def collect_audio_files(paths: List[str]) -> List[Path]:
+    """Expands directories into their audio files (sorted), keeps files as given."""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.iterdir() if p.suffix.lower() in AUDIO_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+
+async def _run_cli(files: List[Path], language: str, concurrency: int) -> Tuple[List[Dict], int]:
+    from .deepgram_client import close_async_client, get_async_client
+    from .storage import create_history_store
+    from .transcription_cache import transcribe_cached
+
+    async def transcribe_file(path: Path) -> str:
+        transcription, _ = await get_async_client().transcribe_file(path, "nova-2", language)
+        if not transcription:
+            raise ValueError("No transcription received from API")
+        return transcription
+
+    async def transcribe(path: Path, content_hash: Optional[str]) -> Tuple[str, float, bool]:
+        return await transcribe_cached(path, language, transcribe_file, content_hash)
+
+    items = []
+    for path in files:
+        item = {"filename": path.name, "path": str(path)}
+        if not path.is_file():
+            item["error"] = "File not found"
+        elif path.suffix.lower() not in AUDIO_EXTENSIONS:
+            item["error"] = f"Invalid file extension. Supported: {', '.join(sorted(AUDIO_EXTENSIONS))}"
+        items.append(item)
+
+    try:
+        results = await transcribe_batch(items, transcribe, concurrency)
+    finally:
+        await close_async_client()
+
+    store = create_history_store()
+    saved = store.append_many(history_records(results))
+    store.close()
+    return results, saved
+
+
+def main(argv=None):
+    """Command line entry point: transcribe files/folders and save them to history."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        prog="python -m src.batch",
+        description="Transcribe many audio files concurrently and save them to the history."
+    )
+    parser.add_argument("paths", nargs="+", help="Audio files or folders with audio files")
+    parser.add_argument("--language", default="es", help="Language code (default: es)")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=BATCH_CONCURRENCY,
+        help=f"Concurrent Deepgram calls (default: $BATCH_CONCURRENCY or {BATCH_CONCURRENCY})"
+    )
+    parser.add_argument("--output", help="Write the per-file results to this JSON file")
+    args = parser.parse_args(argv)
+
+    files = collect_audio_files(args.paths)
+    if not files:
+        print("No audio files found.")
+        return 1
+
+    print(f"Transcribing {len(files)} files (concurrency: {args.concurrency})...")
+    results, saved = asyncio.run(_run_cli(files, args.language, args.concurrency))
+
+    for result in results:
+        status = "OK " if result["success"] else "ERR"
+        detail = f"{result['duration']:.2f}s" if result["success"] else result["error"]
+        print(f"  [{status}] {result['filename']}: {detail}")
+    failed = sum(1 for r in results if not r["success"])
+    print(f"\n{len(results) - failed} transcribed, {failed} failed, {saved} saved to history")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    return 0 if failed == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""Chunked transcription of long recordings.
+
+A multi-hour file sent to Deepgram in one request is one long serial
+call that has to start over after any failure. In chunked mode the
+audio is split into segments of about CHUNK_SECONDS, cut at the
+quietest point near each boundary so words are rarely split, and every
+segment extends CHUNK_OVERLAP_SECONDS past its cut. Segments are
+encoded to FLAC one at a time as they are needed, transcribed
+concurrently (each request with the client's own retries) and the
+transcripts are joined in order, dropping the words repeated in the
+overlaps.
+
+Files are read with soundfile (WAV, FLAC, OGG, MP3), imported along
+with numpy the first time a file is inspected. Formats it cannot read,
+such as m4a, are always transcribed in a single request.
+
+Configuration (environment variables):
+- CHUNK_MIN_SECONDS: recordings longer than this are chunked automatically (default: 900)
+- CHUNK_SECONDS: target segment length (default: 300)
+- CHUNK_OVERLAP_SECONDS: audio repeated at the start of the next segment (default: 3)
+- CHUNK_SILENCE_SEARCH_SECONDS: how far from the target to look for silence (default: 15)
+- CHUNK_CONCURRENCY: segments transcribed at once (default: 4)
+"""
+
+import asyncio
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional, Tuple, Union
+
+from .concurrency import run_blocking
+from .storage.search import tokenize
+
+# numpy and soundfile, imported by _load_audio_modules()
+np = sf = None
+
+CHUNK_MIN_SECONDS = float(os.getenv("CHUNK_MIN_SECONDS", 900))
+CHUNK_SECONDS = float(os.getenv("CHUNK_SECONDS", 300))
+CHUNK_OVERLAP_SECONDS = float(os.getenv("CHUNK_OVERLAP_SECONDS", 3))
+CHUNK_SILENCE_SEARCH_SECONDS = float(os.getenv("CHUNK_SILENCE_SEARCH_SECONDS", 15))
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", 4))
+
+# Energy is measured on frames of this length, smoothed over _SMOOTH_FRAMES
+_FRAME_SECONDS = 0.02
+_SMOOTH_FRAMES = 5
+
+# Frames copied per read/write when extracting a segment
+_COPY_FRAMES = 256 * 1024
+
+# Overlap matching: longest run of words compared, shortest run accepted,
+# and words at the cut that may be garbled (half a word) on either side
+_MAX_OVERLAP_WORDS = 60
+_MIN_OVERLAP_WORDS = 2
+_OVERLAP_SLACK_WORDS = 2
+
+Segment = Tuple[float, float]
+
+
+def _load_audio_modules() -> bool:
+    global np, sf
+    if sf is None:
+        try:
+            import numpy
+            import soundfile
+        except (ImportError, OSError):  # OSError: libsndfile missing
+            return False
+        np, sf = numpy, soundfile
+    return True
+
+
+def audio_duration(path: Union[str, Path]) -> Optional[float]:
+    """Length in seconds, or None if the file can't be read as audio here."""
+    if not _load_audio_modules():
+        return None
+    try:
+        info = sf.info(str(path))
+    except Exception:
+        return None
+    return info.frames / info.samplerate if info.samplerate else None
+
+
+def should_chunk(
+    path: Union[str, Path],
+    chunked: Optional[bool] = None,
+    min_seconds: float = CHUNK_MIN_SECONDS
+) -> bool:
+    """Whether to transcribe `path` in segments.
+
+    `chunked` forces the mode (True/False); None decides by duration.
+    Files that can't be decoded are never chunked.
+    """
+    if chunked is False:
+        return False
+    duration = audio_duration(path)
+    if duration is None:
+        return False
+    return bool(chunked) or duration > min_seconds
+
+
+def _quietest_point(f, low: float, high: float) -> float:
+    """Time (seconds) of the quietest moment of [low, high] in an open SoundFile."""
+    rate = f.samplerate
+    f.seek(int(low * rate))
+    data = f.read(int((high - low) * rate), dtype='float32', always_2d=True)
+    frame = max(1, int(_FRAME_SECONDS * rate))
+    frames = len(data) // frame
+    if frames == 0:
+        return (low + high) / 2
+    energy = np.sqrt(np.mean(data[:frames * frame].reshape(frames, -1) ** 2, axis=1))
+    smooth = np.convolve(energy, np.ones(_SMOOTH_FRAMES) / _SMOOTH_FRAMES, mode='same')
+    return low + (int(np.argmin(smooth)) + 0.5) * frame / rate
+
+
+def plan_segments(
+    path: Union[str, Path],
+    chunk_seconds: float = CHUNK_SECONDS,
+    overlap_seconds: float = CHUNK_OVERLAP_SECONDS,
+    search_seconds: float = CHUNK_SILENCE_SEARCH_SECONDS
+) -> List[Segment]:
+    """(start, end) seconds of each segment, in order.
+
+    Cuts are placed at the quietest point within `search_seconds` of
+    every `chunk_seconds`; only those windows are decoded. Each segment
+    but the last runs `overlap_seconds` past its cut. A remainder
+    shorter than a quarter chunk is kept in the last segment.
+    """
+    _load_audio_modules()
+    with sf.SoundFile(str(path)) as f:
+        total = f.frames / f.samplerate
+        cuts = [0.0]
+        while total - cuts[-1] > chunk_seconds * 1.25:
+            target = cuts[-1] + chunk_seconds
+            low = max(cuts[-1] + chunk_seconds / 2, target - search_seconds)
+            high = min(total, target + search_seconds)
+            cuts.append(_quietest_point(f, low, high))
+    cuts.append(total)
+    return [
+        (start, min(total, end + overlap_seconds) if i < len(cuts) - 2 else total)
+        for i, (start, end) in enumerate(zip(cuts, cuts[1:]))
+    ]
+
+
+def write_segment(path: Union[str, Path], segment: Segment, destination: Union[str, Path]) -> Path:
+    """Copies the audio of `segment` to a FLAC file, a block at a time."""
+    _load_audio_modules()
+    start, end = segment
+    with sf.SoundFile(str(path)) as source:
+        rate = source.samplerate
+        source.seek(int(start * rate))
+        remaining = int(end * rate) - int(start * rate)
+        with sf.SoundFile(str(destination), 'w', samplerate=rate, channels=source.channels,
+                          format='FLAC', subtype='PCM_16') as target:
+            while remaining > 0:
+                block = source.read(min(_COPY_FRAMES, remaining), dtype='float32', always_2d=True)
+                if not len(block):
+                    break
+                target.write(block)
+                remaining -= len(block)
+    return Path(destination)
+
+
+def _overlap(previous: List[str], following: List[str]) -> Tuple[int, int]:
+    """Words to drop from the end of `previous` and the start of `following`
+    so the text they both transcribed appears once (0, 0 if none found)."""
+    tail = ["".join(tokenize(word)) for word in previous[-(_MAX_OVERLAP_WORDS + _OVERLAP_SLACK_WORDS):]]
+    head = ["".join(tokenize(word)) for word in following[:_MAX_OVERLAP_WORDS + _OVERLAP_SLACK_WORDS]]
+    best = (0, 0, 0)
+    for trim in range(_OVERLAP_SLACK_WORDS + 1):
+        candidate_tail = tail[:len(tail) - trim]
+        for skip in range(_OVERLAP_SLACK_WORDS + 1):
+            candidate_head = head[skip:]
+            for size in range(min(len(candidate_tail), len(candidate_head)), best[0], -1):
+                if candidate_tail[-size:] == candidate_head[:size] and any(candidate_head[:size]):
+                    best = (size, trim, skip + size)
+                    break
+    if best[0] < _MIN_OVERLAP_WORDS:
+        return 0, 0
+    return best[1], best[2]
+
+
+def stitch_transcripts(transcripts: List[str]) -> str:
+    """Joins segment transcripts in order, de-duplicating their overlaps."""
+    words: List[str] = []
+    for transcript in transcripts:
+        following = transcript.split()
+        if not following:
+            continue
+        trim, skip = _overlap(words, following)
+        if trim:
+            del words[-trim:]
+        words.extend(following[skip:])
+    return " ".join(words)
+
+
+async def transcribe_chunked(
+    path: Union[str, Path],
+    transcribe: Callable[[Path], Awaitable[str]],
+    concurrency: int = CHUNK_CONCURRENCY,
+    chunk_seconds: float = CHUNK_SECONDS,
+    overlap_seconds: float = CHUNK_OVERLAP_SECONDS
+) -> Tuple[str, int]:
+    """Transcribes `path` segment by segment with `transcribe(segment_path)`.
+
+    At most `concurrency` segments are on disk and in flight at once. If
+    a segment fails the others are cancelled and the error is raised.
+    Returns (stitched_transcript, segment_count).
+    """
+    segments = await run_blocking(plan_segments, path, chunk_seconds, overlap_seconds)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    with tempfile.TemporaryDirectory(prefix="chunks-") as workdir:
+        async def run(index: int, segment: Segment) -> str:
+            async with semaphore:
+                segment_path = await run_blocking(
+                    write_segment, path, segment, Path(workdir) / f"segment_{index:05d}.flac"
+                )
+                try:
+                    return await transcribe(segment_path)
+                finally:
+                    segment_path.unlink(missing_ok=True)
+
+        tasks = [asyncio.ensure_future(run(i, segment)) for i, segment in enumerate(segments)]
+        try:
+            transcripts = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    return stitch_transcripts(transcripts), len(segments)
+
+
+def transcribe_chunked_sync(
+    path: Union[str, Path],
+    transcribe: Callable[[Path], str],
+    concurrency: int = CHUNK_CONCURRENCY,
+    chunk_seconds: float = CHUNK_SECONDS,
+    overlap_seconds: float = CHUNK_OVERLAP_SECONDS
+) -> Tuple[str, int]:
+    """Blocking `transcribe_chunked`, with segments in a thread pool."""
+    segments = plan_segments(path, chunk_seconds, overlap_seconds)
+
+    with tempfile.TemporaryDirectory(prefix="chunks-") as workdir:
+        def run(item: Tuple[int, Segment]) -> str:
+            index, segment = item
+            segment_path = write_segment(path, segment, Path(workdir) / f"segment_{index:05d}.flac")
+            try:
+                return transcribe(segment_path)
+            finally:
+                segment_path.unlink(missing_ok=True)
+
+        pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="chunk")
+        futures = [pool.submit(run, item) for item in enumerate(segments)]
+        try:
+            transcripts = [future.result() for future in futures]
+        except BaseException:
+            # After a failure, segments not started yet are dropped
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            pool.shutdown(wait=True)
+    return stitch_transcripts(transcripts), len(segments)
@@ -0,0 +1,52 @@
+"""Bounded thread pool for blocking work called from async endpoints.
+
+History I/O and other synchronous calls are offloaded here so they never
+run on the event loop. The pool size caps how many of them run at once
+(BLOCKING_IO_THREADS, default 16); extra calls wait in the queue.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+BLOCKING_IO_THREADS = int(os.getenv("BLOCKING_IO_THREADS", 16))
+
+_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_IO_THREADS,
+    thread_name_prefix="blocking-io"
+)
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs `func(*args, **kwargs)` in the bounded pool and awaits the result.
+
+    Context variables of the caller are visible inside `func`.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, context.run, call)
+
+
+async def iterate_blocking(iterator: Iterator[T]) -> AsyncIterator[T]:
+    """Pulls items from a blocking iterator in the pool, one at a time.
+
+    Used to stream responses from synchronous generators; the generator
+    is closed if the consumer stops early (e.g. client disconnect).
+    """
+    done = object()
+    try:
+        while True:
+            item = await run_blocking(next, iterator, done)
+            if item is done:
+                break
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
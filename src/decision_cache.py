@@ -0,0 +1,237 @@
+"""Cache of the LLM's tool-call decisions for the agent.
+
+Many `/agent` messages are repeated verbatim or nearly so. The decision
+the LLM made for a message (which tools to call with which arguments,
+or its direct answer) is cached under the normalized message text plus
+a version of the bound tool schemas, so a repeated request skips the
+LLM round-trip. Changing a tool, its arguments or the prompt changes
+the version and naturally invalidates old entries.
+
+The path of an uploaded file (`Archivo subido: ...`) is not part of the
+key: it is replaced by a placeholder in the key and in the cached
+arguments, and the current upload's path is put back on a hit.
+
+Entries live in an in-memory LRU with a TTL and, optionally, in a
+SQLite file so they survive restarts.
+
+Configuration (environment variables):
+- AGENT_DECISION_CACHE_ENABLED: 'false' disables the cache (default: true)
+- AGENT_DECISION_CACHE_SIZE: maximum number of entries (default: 1000)
+- AGENT_DECISION_CACHE_TTL_SECONDS: entry lifetime (default: 1 day)
+- AGENT_DECISION_CACHE_PATH: SQLite file to persist entries (default: memory only)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+from .intent import split_uploaded_file
+from .storage.search import tokenize
+
+UPLOAD_PLACEHOLDER = "{uploaded_file}"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decision_cache (
+    key TEXT PRIMARY KEY,
+    decision TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_decision_cache_last_used ON decision_cache (last_used_at);
+"""
+
+
+def normalize_message(message: str) -> Tuple[str, Optional[str]]:
+    """Key text for a message and the uploaded file path it carries (or None).
+
+    Only the words count: case, accents, spacing and punctuation are ignored.
+    """
+    text, uploaded = split_uploaded_file(message)
+    text = " ".join(tokenize(text))
+    if uploaded:
+        text = f"{text} [{UPLOAD_PLACEHOLDER}]"
+    return text, uploaded
+
+
+def tool_schema_version(tools: Iterable[Any], *extra: str) -> str:
+    """Short hash of the tools' names, descriptions and argument schemas.
+
+    `extra` strings (system prompt, model name...) are hashed too.
+    """
+    schema = [
+        {
+            "name": tool.name,
+            "description": getattr(tool, "description", ""),
+            "args": getattr(tool, "args", {})
+        }
+        for tool in sorted(tools, key=lambda t: t.name)
+    ]
+    payload = json.dumps([schema, list(extra)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _replace_in_args(value: Any, old: str, new: str) -> Any:
+    if isinstance(value, str):
+        return value.replace(old, new)
+    if isinstance(value, dict):
+        return {k: _replace_in_args(v, old, new) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_replace_in_args(v, old, new) for v in value]
+    return value
+
+
+def abstract_decision(decision: Dict, uploaded: Optional[str]) -> Optional[Dict]:
+    """Replaces the uploaded path in a decision's arguments by the placeholder.
+
+    Returns None when the decision can't be reused for other uploads
+    (it refers to the file without using its full path).
+    """
+    if not uploaded:
+        return decision
+    abstracted = _replace_in_args(decision, uploaded, UPLOAD_PLACEHOLDER)
+    if Path(uploaded).name in json.dumps(abstracted, ensure_ascii=False):
+        return None
+    return abstracted
+
+
+def restore_decision(decision: Dict, uploaded: Optional[str]) -> Dict:
+    """Puts the current upload's path back into a cached decision."""
+    return _replace_in_args(decision, UPLOAD_PLACEHOLDER, uploaded or "")
+
+
+class DecisionCache:
+    """LRU cache with TTL of agent decisions, optionally persisted to SQLite."""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 24 * 3600,
+        db_path: Optional[Union[str, Path]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path:
+            path = Path(db_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            with self._conn:
+                self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def make_key(normalized_message: str, schema_version: str) -> str:
+        return hashlib.sha256(f"{schema_version}\n{normalized_message}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Returns the cached decision, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._conn is not None:
+                entry = self._load(key)
+            if entry is None or now - entry[0] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._trim()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "UPDATE decision_cache SET last_used_at = ? WHERE key = ?", (now, key)
+                    )
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, decision: Dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (now, decision)
+            self._entries.move_to_end(key)
+            self._trim()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO decision_cache (key, decision, created_at, last_used_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        (key, json.dumps(decision, ensure_ascii=False), now, now)
+                    )
+                    self._evict_persisted(now)
+
+    def _load(self, key: str) -> Optional[Tuple[float, Dict]]:
+        row = self._conn.execute(
+            "SELECT created_at, decision FROM decision_cache WHERE key = ?", (key,)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def _trim(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _evict_persisted(self, now: float) -> None:
+        """Drops expired entries, then the least recently used over the limit."""
+        self._conn.execute("DELETE FROM decision_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM decision_cache WHERE key IN ("
+            "SELECT key FROM decision_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def stats(self) -> Dict:
+        """Hit/miss counters of this process and entries held in memory."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "persistent": self._conn is not None
+            }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+
+def decision_from_response(response) -> Dict:
+    """Cacheable form of an LLM response: tool calls (name, args) and content."""
+    return {
+        "tool_calls": [
+            {"name": call["name"], "args": call.get("args", {})}
+            for call in (getattr(response, "tool_calls", None) or [])
+        ],
+        "content": getattr(response, "content", "") or ""
+    }
+
+
+_cache: Optional[DecisionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_decision_cache() -> Optional[DecisionCache]:
+    """Returns the process-wide cache configured from the environment,
+    or None if it is disabled."""
+    global _cache
+    if os.getenv("AGENT_DECISION_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = DecisionCache(
+                max_entries=int(os.getenv("AGENT_DECISION_CACHE_SIZE", 1000)),
+                ttl_seconds=float(os.getenv("AGENT_DECISION_CACHE_TTL_SECONDS", 24 * 3600)),
+                db_path=os.getenv("AGENT_DECISION_CACHE_PATH") or None
+            )
+        return _cache
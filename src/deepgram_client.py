@@ -0,0 +1,403 @@
+"""Client for the Deepgram pre-recorded transcription API (/v1/listen).
+
+Both the API server and TranscribeAudioTool talk to Deepgram through
+this module:
+
+- `DeepgramClient` (sync, requests.Session) and `AsyncDeepgramClient`
+  (httpx) keep pooled keep-alive connections instead of opening a new
+  TLS connection per transcription.
+- Requests have connect/read timeouts and are retried with jittered
+  exponential backoff on 429 and 5xx responses and on network errors
+  (honouring Retry-After).
+- A circuit breaker shared by both clients stops calling Deepgram after
+  repeated failures and lets a trial request through after a cool-down.
+
+Audio is streamed from disk in chunks instead of being loaded into memory.
+
+Configuration (environment variables):
+- DEEPGRAM_API_KEY: API key (required)
+- DEEPGRAM_API_URL: base URL (default: https://api.deepgram.com)
+- DEEPGRAM_TIMEOUT_SECONDS: read timeout for a transcription (default: 300)
+- DEEPGRAM_CONNECT_TIMEOUT_SECONDS: connect timeout (default: 10)
+- DEEPGRAM_MAX_CONNECTIONS: connection pool size (default: 50)
+- DEEPGRAM_MAX_RETRIES: retries after the first attempt (default: 3)
+- DEEPGRAM_RETRY_BASE_SECONDS: base backoff delay (default: 0.5)
+- DEEPGRAM_RETRY_MAX_SECONDS: maximum backoff delay (default: 10)
+- DEEPGRAM_BREAKER_THRESHOLD: consecutive failures that open the circuit (default: 5)
+- DEEPGRAM_BREAKER_RESET_SECONDS: time before a trial request (default: 30)
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from .concurrency import run_blocking
+
+DEFAULT_API_URL = "https://api.deepgram.com"
+
+# Bytes read from disk per chunk while streaming audio to Deepgram
+_STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+# Responses worth retrying: rate limiting and server-side errors
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class DeepgramError(Exception):
+    """Deepgram request failed or returned an unusable response."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(DeepgramError):
+    """Deepgram is failing repeatedly; calls are rejected until the cool-down ends."""
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter."""
+
+    def __init__(
+        self,
+        max_retries: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None
+    ):
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("DEEPGRAM_MAX_RETRIES", 3))
+        self.base_delay = base_delay if base_delay is not None else float(os.getenv("DEEPGRAM_RETRY_BASE_SECONDS", 0.5))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv("DEEPGRAM_RETRY_MAX_SECONDS", 10))
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before retry number `attempt` (1-based)."""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures;
+    open -> half-open (one trial call) after `reset_timeout` seconds."""
+
+    def __init__(self, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.failure_threshold = failure_threshold or int(os.getenv("DEEPGRAM_BREAKER_THRESHOLD", 5))
+        self.reset_timeout = reset_timeout if reset_timeout is not None else float(os.getenv("DEEPGRAM_BREAKER_RESET_SECONDS", 30))
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def before_call(self) -> None:
+        """Raises CircuitOpenError if calls are currently rejected."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if remaining > 0 or self._trial_in_flight:
+                raise CircuitOpenError(
+                    f"Deepgram circuit open after {self._failures} consecutive failures; "
+                    f"retry in {max(remaining, 0):.0f}s"
+                )
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """Lets another trial through after one that ended without an outcome."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Wraps one call to Deepgram and records how it ended.
+
+        Non-retryable API errors count as successes (the request was
+        wrong, Deepgram answered); any other error is a failure. A
+        cancelled call records nothing but frees the half-open trial.
+        """
+        self.before_call()
+        try:
+            yield
+        except DeepgramError as e:
+            if e.status_code is not None and e.status_code not in RETRYABLE_STATUS_CODES:
+                self.record_success()
+            else:
+                self.record_failure()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.release_trial()
+            raise
+        self.record_success()
+
+
+_default_breaker: Optional[CircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Circuit breaker shared by every default client of the process."""
+    global _default_breaker
+    with _breaker_lock:
+        if _default_breaker is None:
+            _default_breaker = CircuitBreaker()
+        return _default_breaker
+
+
+def extract_transcript(result: Dict) -> str:
+    """Returns the transcript of the first channel/alternative of a response."""
+    try:
+        return result.get('results', {}).get('channels', [{}])[0].get('alternatives', [{}])[0].get('transcript', '').strip()
+    except (IndexError, AttributeError) as e:
+        raise DeepgramError("Error parsing Deepgram API response") from e
+
+
+def _listen_params(model: str, language: Optional[str]) -> Dict[str, str]:
+    return {"model": model, "language": language or "auto"}
+
+
+def _request_headers(api_key: str, audio_path: Path) -> Dict[str, str]:
+    return {
+        "Authorization": f"Token {api_key}",
+        "Content-Type": "audio/*",
+        "Content-Length": str(audio_path.stat().st_size)
+    }
+
+
+def _api_error(status_code: int, text: str) -> DeepgramError:
+    return DeepgramError(f"Deepgram API error: {status_code} - {text}", status_code)
+
+
+class _BaseDeepgramClient:
+    """Configuration shared by the sync and async clients."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None
+    ):
+        self.api_key = api_key if api_key is not None else os.getenv("DEEPGRAM_API_KEY")
+        self.base_url = (base_url or os.getenv("DEEPGRAM_API_URL", DEFAULT_API_URL)).rstrip('/')
+        self.timeout = timeout or float(os.getenv("DEEPGRAM_TIMEOUT_SECONDS", 300))
+        self.connect_timeout = connect_timeout or float(os.getenv("DEEPGRAM_CONNECT_TIMEOUT_SECONDS", 10))
+        self.max_connections = max_connections or int(os.getenv("DEEPGRAM_MAX_CONNECTIONS", 50))
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or get_circuit_breaker()
+
+    def _check_ready(self, audio_path: Path) -> None:
+        """Fails fast on missing configuration/files."""
+        if not self.api_key:
+            raise DeepgramError("DEEPGRAM_API_KEY not configured")
+        if not audio_path.is_file():
+            raise DeepgramError(f"Audio file not found: {audio_path}")
+
+
+class DeepgramClient(_BaseDeepgramClient):
+    """Synchronous Deepgram client on a pooled requests.Session."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def transcribe_file(
+        self,
+        audio_path: Union[str, Path],
+        model: str = "nova-2",
+        language: Optional[str] = None
+    ) -> Tuple[str, Dict]:
+        """Transcribes an audio file. Returns (transcript, raw_response)."""
+        audio_path = Path(audio_path)
+        self._check_ready(audio_path)
+        with self.circuit_breaker.guard():
+            return self._post(audio_path, model, language)
+
+    def _post(self, audio_path: Path, model: str, language: Optional[str]) -> Tuple[str, Dict]:
+        """The request, retried per the retry policy."""
+        attempt = 0
+        while True:
+            attempt += 1
+            retry_after = None
+            try:
+                with open(audio_path, 'rb') as audio_file:
+                    response = self._session.post(
+                        f"{self.base_url}/v1/listen",
+                        params=_listen_params(model, language),
+                        headers=_request_headers(self.api_key, audio_path),
+                        data=audio_file,
+                        timeout=(self.connect_timeout, self.timeout)
+                    )
+            except requests.RequestException as e:
+                error = DeepgramError(f"Deepgram request failed: {e}")
+            else:
+                if response.status_code == 200:
+                    result = response.json()
+                    return extract_transcript(result), result
+                error = _api_error(response.status_code, response.text)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    raise error
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt > self.retry_policy.max_retries:
+                raise error
+            time.sleep(self.retry_policy.delay(attempt, retry_after))
+
+    def close(self):
+        self._session.close()
+
+
+async def _iter_file(path: Path):
+    """Reads a file in chunks without blocking the event loop."""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = await run_blocking(f.read, _STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+class AsyncDeepgramClient(_BaseDeepgramClient):
+    """Async Deepgram client on a shared httpx connection pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            )
+        )
+
+    async def transcribe_file(
+        self,
+        audio_path: Union[str, Path],
+        model: str = "nova-2",
+        language: Optional[str] = None
+    ) -> Tuple[str, Dict]:
+        """Transcribes an audio file. Returns (transcript, raw_response)."""
+        audio_path = Path(audio_path)
+        self._check_ready(audio_path)
+        with self.circuit_breaker.guard():
+            return await self._post(audio_path, model, language)
+
+    async def _post(self, audio_path: Path, model: str, language: Optional[str]) -> Tuple[str, Dict]:
+        """The request, retried per the retry policy."""
+        attempt = 0
+        while True:
+            attempt += 1
+            retry_after = None
+            try:
+                response = await self._client.post(
+                    "/v1/listen",
+                    params=_listen_params(model, language),
+                    headers=_request_headers(self.api_key, audio_path),
+                    content=_iter_file(audio_path)
+                )
+            except httpx.HTTPError as e:
+                error = DeepgramError(f"Deepgram request failed: {e}")
+            else:
+                if response.status_code == 200:
+                    result = response.json()
+                    return extract_transcript(result), result
+                error = _api_error(response.status_code, response.text)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    raise error
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt > self.retry_policy.max_retries:
+                raise error
+            await asyncio.sleep(self.retry_policy.delay(attempt, retry_after))
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_sync_client: Optional[DeepgramClient] = None
+_sync_client_lock = threading.Lock()
+
+
+def get_client() -> DeepgramClient:
+    """Returns the process-wide synchronous client (thread-safe)."""
+    global _sync_client
+    with _sync_client_lock:
+        if _sync_client is None:
+            _sync_client = DeepgramClient()
+        return _sync_client
+
+
+def reset_clients() -> None:
+    """Drops the shared clients so the next call picks up new settings."""
+    global _sync_client, _default_breaker
+    with _sync_client_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+        _sync_client = None
+    with _breaker_lock:
+        _default_breaker = None
+    _async_clients.clear()
+
+
+_async_clients: Dict[int, Tuple[asyncio.AbstractEventLoop, AsyncDeepgramClient]] = {}
+
+
+def get_async_client() -> AsyncDeepgramClient:
+    """Returns the shared async client of the running event loop.
+
+    httpx pools are bound to the loop that created them, so each loop
+    (normally just the server's) gets its own client.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(id(loop))
+    if entry is None or entry[0] is not loop:
+        entry = _async_clients[id(loop)] = (loop, AsyncDeepgramClient())
+    return entry[1]
+
+
+async def close_async_client():
+    """Closes the shared client of the running event loop, if any."""
+    entry = _async_clients.pop(id(asyncio.get_running_loop()), None)
+    if entry is not None:
+        await entry[1].aclose()
@@ -0,0 +1,220 @@
+"""Local intent classifier for the agent's fast path.
+
+Obvious requests ("dame el historial", "transcribe este audio" with an
+attached file...) are recognized with keyword and regex rules and sent
+straight to the matching tool, skipping the LLM round-trip. Anything
+the rules are not confident about goes to the LLM as before.
+
+Configuration (environment variables):
+- AGENT_INTENT_THRESHOLD: minimum confidence to skip the LLM, from 0 to 1
+  (default: 0.8). A value above 1 disables the fast path.
+"""
+
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from .storage.search import normalize_text
+
+DEFAULT_INTENT_THRESHOLD = float(os.getenv("AGENT_INTENT_THRESHOLD", 0.8))
+
+TRANSCRIBE_TOOL = "transcribe_audio"
+QUERY_HISTORY_TOOL = "query_history"
+
+# Keywords are matched on normalized text (lower-case, no accents)
+_TRANSCRIBE_WORDS = (
+    "transcrib", "pasa a texto", "pasalo a texto", "convierte a texto",
+    "convert to text", "speech to text"
+)
+_HISTORY_WORDS = (
+    "historial", "historico", "history", "transcripciones anteriores",
+    "transcripciones guardadas", "ultimas transcripciones", "cuantas transcripciones",
+    "mis transcripciones", "previous transcriptions", "past transcriptions",
+    "how many transcriptions", "my transcriptions"
+)
+# Requests that need more than one tool or a free-form answer
+_COMPLEX_WORDS = ("guard", "save", "resum", "summar", "tradu", "translat", "compar", "analiz", "analy")
+
+_UPLOAD_RE = re.compile(r"Archivo subido:\s*(?P<path>\S.*?)\s*$")
+_AUDIO_PATH_RE = re.compile(r"(?P<path>[\w./\\:~-]+\.(?:mp3|wav|m4a|ogg|flac|mp4))\b", re.IGNORECASE)
+
+_SEARCH_RE = re.compile(
+    r"(?:\b(?:busca|buscar|buscame|encuentra|search|find)\b(?:\s+(?:for|transcripciones|transcriptions))?"
+    r"(?:\s+(?:que\s+(?:contengan|mencionen|hablen\s+de)|sobre|de|con(?:\s+la\s+palabra)?|about|for|with))?"
+    r"|\b(?:que\s+(?:contengan|mencionen|hablen\s+de)|containing|mentioning|sobre|about)\b)"
+    r"\s+[\"'«]?(?P<term>[^\"'»?!.,]+)"
+)
+_SEARCH_TAIL_RE = re.compile(
+    r"\s+(?:en|in)\s+(?:el\s+|mi\s+|mis\s+|the\s+|my\s+)?(?:historial|history|transcripciones|transcriptions)\b.*$"
+)
+_ARTICLE_RE = re.compile(r"^(?:el|la|los|las|un|una|the|a)\s+")
+_LIMIT_RE = re.compile(
+    r"\b(?:ultim[oa]s|last|top|primer[oa]s|first|muestrame|show)\s+(?P<a>\d{1,4})\b"
+    r"|\b(?P<b>\d{1,4})\s+(?:ultim[oa]s|transcripciones|resultados|results|transcriptions|entries)\b"
+)
+_LANGUAGES = {
+    "espanol": "es", "castellano": "es", "spanish": "es",
+    "ingles": "en", "english": "en",
+    "frances": "fr", "french": "fr",
+    "aleman": "de", "german": "de",
+    "italiano": "it", "italian": "it",
+    "portugues": "pt", "portuguese": "pt"
+}
+_LANGUAGE_RE = re.compile(r"\b(?:en|in|idioma|language)\s+(?P<lang>" + "|".join(_LANGUAGES) + r")\b")
+_MODEL_RE = re.compile(r"\bmodel[oa]?\s+(?P<model>nova-2|nova|base|enhanced)\b")
+
+
+@dataclass
+class Intent:
+    """A classified request: the tool to call, its arguments and the confidence."""
+
+    tool: str
+    args: Dict = field(default_factory=dict)
+    confidence: float = 0.0
+
+
+def split_uploaded_file(message: str) -> Tuple[str, Optional[str]]:
+    """Separates the `Archivo subido: <path>` suffix added by /agent.
+
+    Returns (message_without_it, path), path being None without upload.
+    """
+    upload = _UPLOAD_RE.search(message)
+    if not upload:
+        return message, None
+    return message[:upload.start()].rstrip(" ."), upload.group("path")
+
+
+def _extract_path(message: str) -> Optional[str]:
+    _, uploaded = split_uploaded_file(message)
+    if uploaded:
+        return uploaded
+    match = _AUDIO_PATH_RE.search(message)
+    return match.group("path") if match else None
+
+
+def _extract_search(text: str) -> Optional[str]:
+    match = _SEARCH_RE.search(text)
+    if not match:
+        return None
+    term = _SEARCH_TAIL_RE.sub("", match.group("term")).strip()
+    term = _ARTICLE_RE.sub("", term)
+    return term or None
+
+
+def _extract_limit(text: str) -> Optional[int]:
+    match = _LIMIT_RE.search(text)
+    if not match:
+        return None
+    return max(1, int(match.group("a") or match.group("b")))
+
+
+class IntentClassifier:
+    """Rule-based classifier with an optional lightweight model.
+
+    `model`, if given, is called as model(message) -> (tool_name, confidence)
+    for messages the rules cannot place; it only picks the tool, the
+    arguments are still extracted by the rules.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        model: Optional[Callable[[str], Tuple[Optional[str], float]]] = None
+    ):
+        self.threshold = DEFAULT_INTENT_THRESHOLD if threshold is None else threshold
+        self.model = model
+
+    def score(self, message: str) -> Optional[Intent]:
+        """Best intent for `message` with its confidence, or None."""
+        # The path is taken from the original message (case matters)
+        path = _extract_path(message)
+        text = normalize_text(split_uploaded_file(message)[0])
+
+        wants_transcription = any(word in text for word in _TRANSCRIBE_WORDS)
+        wants_history = any(word in text for word in _HISTORY_WORDS)
+        search = _extract_search(text)
+
+        candidates = []
+        if wants_transcription or path:
+            args = {"audio_file": path} if path else {}
+            language = _LANGUAGE_RE.search(text)
+            if language:
+                args["language"] = _LANGUAGES[language.group("lang")]
+            model = _MODEL_RE.search(text)
+            if model:
+                args["model"] = model.group("model")
+            if path and not Path(path).exists():
+                confidence = 0.5  # Probably a bare name the LLM has to resolve
+            elif wants_transcription and path:
+                confidence = 0.95
+            elif path:
+                confidence = 0.6  # A file without saying what to do with it
+            else:
+                confidence = 0.4  # Transcribe, but which file?
+            candidates.append(Intent(TRANSCRIBE_TOOL, args, confidence))
+
+        if wants_history or search:
+            args = {}
+            if search:
+                args["search"] = search
+            limit = _extract_limit(text)
+            if limit:
+                args["limit"] = limit
+            confidence = 0.9 if wants_history else 0.7
+            candidates.append(Intent(QUERY_HISTORY_TOOL, args, confidence))
+
+        if not candidates and self.model is not None:
+            tool, confidence = self.model(message)
+            if tool == TRANSCRIBE_TOOL and path:
+                candidates.append(Intent(tool, {"audio_file": path}, confidence))
+            elif tool == QUERY_HISTORY_TOOL:
+                candidates.append(Intent(tool, {}, confidence))
+
+        if not candidates:
+            return None
+        best = max(candidates, key=lambda intent: intent.confidence)
+        if len(candidates) > 1:
+            # Mixed signals: let the LLM decide (or call both tools)
+            best.confidence -= 0.3
+        if any(word in text for word in _COMPLEX_WORDS):
+            best.confidence = min(best.confidence, 0.5)
+        return best
+
+    def classify(self, message: str) -> Optional[Intent]:
+        """The intent to run without the LLM, or None when not confident enough."""
+        intent = self.score(message)
+        if intent is None or intent.confidence < self.threshold:
+            return None
+        return intent
+
+
+class RoutingStats:
+    """Thread-safe counters of how agent requests were routed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.fast_path = 0
+        self.llm = 0
+        self.by_tool: Dict[str, int] = {}
+
+    def record(self, fast_path: bool, tool: Optional[str] = None) -> None:
+        with self._lock:
+            if fast_path:
+                self.fast_path += 1
+                self.by_tool[tool] = self.by_tool.get(tool, 0) + 1
+            else:
+                self.llm += 1
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            total = self.fast_path + self.llm
+            return {
+                "requests": total,
+                "fast_path": self.fast_path,
+                "llm": self.llm,
+                "fast_path_hit_rate": round(self.fast_path / total, 4) if total else 0.0,
+                "fast_path_by_tool": dict(self.by_tool)
+            }
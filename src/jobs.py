@@ -0,0 +1,141 @@
+"""In-process queue for asynchronous transcription jobs.
+
+`POST /jobs` stores the upload and enqueues a job; a pool of worker
+tasks runs the jobs with bounded concurrency and clients poll
+`GET /jobs/{id}` for the status and result. Jobs live in the memory of
+the server process (finished jobs are kept up to a retention limit), so
+with several uvicorn workers a job must be polled on the same process.
+
+Configuration (environment variables):
+- JOB_WORKERS: jobs processed concurrently (default: 4)
+- JOB_QUEUE_MAX: maximum queued jobs before new ones are rejected (default: 1000)
+- JOB_RETENTION: finished jobs kept for polling (default: 1000)
+"""
+
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+QUEUED = "queued"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """The job queue reached JOB_QUEUE_MAX."""
+
+
+class Job:
+    """A unit of work with its status, payload and outcome."""
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.status = QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.payload.get("filename"),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class JobQueue:
+    """Runs jobs through `handler` with `workers` concurrent worker tasks.
+
+    Workers are started on the running event loop the first time a job
+    is submitted (or by `start()` from the application lifespan).
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Job], Awaitable[Dict[str, Any]]],
+        workers: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        retention: Optional[int] = None
+    ):
+        self.handler = handler
+        self.workers = workers or int(os.getenv("JOB_WORKERS", 4))
+        self.max_queued = max_queued or int(os.getenv("JOB_QUEUE_MAX", 1000))
+        self.retention = retention or int(os.getenv("JOB_RETENTION", 1000))
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> None:
+        """Starts the worker tasks on the running loop (idempotent)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancels the worker tasks. Queued jobs are not processed."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    async def submit(self, payload: Dict[str, Any]) -> Job:
+        """Enqueues a job and returns it immediately."""
+        await self.start()
+        job = Job(payload)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)")
+        self._jobs[job.id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of known jobs per status."""
+        counts = {QUEUED: 0, PROCESSING: 0, COMPLETED: 0, FAILED: 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return counts
+
+    def _prune(self) -> None:
+        """Forgets the oldest finished jobs beyond the retention limit."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in (COMPLETED, FAILED)]
+        for job_id in finished[:max(0, len(finished) - self.retention)]:
+            del self._jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = PROCESSING
+            job.started_at = datetime.now().isoformat()
+            try:
+                job.result = await self.handler(job)
+                job.status = COMPLETED
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.error = getattr(e, "detail", None) or str(e)
+                job.status = FAILED
+            finally:
+                job.finished_at = datetime.now().isoformat()
+                self._queue.task_done()
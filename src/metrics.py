@@ -0,0 +1,309 @@
+"""Prometheus metrics for the API server (exposed at /metrics).
+
+Per-stage latency histograms (upload write, Deepgram transcription,
+history save, LLM decision, every tool run), errors by stage and
+exception type, HTTP request counts, latencies and in-flight gauges, and
+cache hit ratios. Everything lives in memory in this process: recording
+a sample is a dict lookup and a few additions under a lock, cheap
+enough to keep on in production, and /metrics renders the Prometheus
+text format on demand. With several workers, each one reports its own
+numbers (scrape them individually or aggregate in Prometheus).
+
+No client library is needed; the exposition format is written here.
+"""
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+
+from .tracing import span
+
+# Upper bounds (seconds) of the latency buckets: from local disk writes
+# to multi-minute transcriptions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def advance_to(self, total: float, **labels) -> None:
+        """Raises the count to `total`, a running count kept elsewhere
+        (e.g. a cache's hits); a lower `total` leaves it unchanged."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = max(self._values.get(key, 0.0), total)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(v)}" for key, v in values]
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels) -> Iterator[None]:
+        """Counts the block as in progress while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values per label set, in fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self, **labels) -> Optional[Dict]:
+        """Cumulative bucket counts, sum and count of one label set (None if unobserved)."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if series is None:
+                return None
+            counts, total = list(series[0]), series[1]
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            running += count
+            cumulative[bound] = running
+        return {"buckets": cumulative, "sum": total, "count": running}
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, list(s[0]), s[1]) for key, s in self._series.items())
+        lines = []
+        for key, counts, total in series:
+            running = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                running += count
+                labels = _labels(self.label_names + ("le",), key + (_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {running}")
+            labels = _labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {running}")
+        return lines
+
+
+class Registry:
+    """Named metrics, rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "transcription_stage_duration_seconds",
+    "Time spent in each stage of a request (upload_write, transcribe_audio, save_to_csv, llm_invoke, tool:<name>)",
+    ("stage",)
+)
+STAGE_IN_PROGRESS = REGISTRY.gauge(
+    "transcription_stage_in_progress", "Operations currently running in each stage", ("stage",)
+)
+ERRORS = REGISTRY.counter(
+    "transcription_errors_total", "Errors by stage and exception type", ("stage", "type")
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by method, route and status code", ("method", "route", "status")
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route", ("method", "route")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "HTTP requests being served, by route", ("route",)
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "cache_lookups_total", "Cache lookups since the process started, by cache and result", ("cache", "result")
+)
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "cache_hit_ratio", "Hit ratio of each cache since the process started", ("cache",)
+)
+
+
+def record_error(stage: str, error: BaseException) -> None:
+    ERRORS.inc(stage=stage, type=type(error).__name__)
+
+
+def observe_stage(stage: str, seconds: float, error: Optional[BaseException] = None) -> None:
+    """Records a stage timed by the caller (and its error, if any)."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if error is not None:
+        record_error(stage, error)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """Times the block as `stage`, counts it in progress and records its errors.
+
+    Works around blocking code and around `await`s alike. Inside a traced
+    request the block is also a span (see tracing.py).
+    """
+    STAGE_IN_PROGRESS.inc(stage=stage)
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    except Exception as e:
+        record_error(stage, e)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+        STAGE_IN_PROGRESS.dec(stage=stage)
+
+
+def record_cache(cache: str, stats: Optional[Dict]) -> None:
+    """Publishes a cache's `stats()` (hits, misses, hit_ratio)."""
+    if stats is None:
+        return
+    CACHE_LOOKUPS.advance_to(stats.get("hits", 0), cache=cache, result="hit")
+    CACHE_LOOKUPS.advance_to(stats.get("misses", 0), cache=cache, result="miss")
+    CACHE_HIT_RATIO.set(stats.get("hit_ratio", 0.0), cache=cache)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting and timing HTTP requests per route.
+
+    Requests are labelled with the route template (`/jobs/{job_id}`),
+    found by matching `router`'s routes, so label values stay bounded;
+    paths that match no route are reported as "unmatched".
+    """
+
+    def __init__(self, app, router):
+        self.app = app
+        self.router = router
+
+    def _route(self, scope) -> str:
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "unmatched")
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route(scope)
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def recording_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            with HTTP_IN_FLIGHT.track(route=route):
+                await self.app(scope, receive, recording_send)
+        finally:
+            HTTP_SECONDS.observe(time.perf_counter() - start, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status["code"]))
@@ -0,0 +1,26 @@
+"""Transcription history storage backends."""
+
+from .base import HISTORY_COLUMNS, HistoryStore, make_record, read_csv_records
+from .csv_store import CsvHistoryStore
+from .sqlite_store import SqliteHistoryStore
+from .factory import HISTORY_BACKENDS, create_history_store, get_history_store, set_history_store
+from .export import gzip_chunks, iter_csv_chunks
+from .columnar import ParquetSnapshot, create_snapshot, snapshot_available
+
+__all__ = [
+    'HISTORY_COLUMNS',
+    'HistoryStore',
+    'CsvHistoryStore',
+    'SqliteHistoryStore',
+    'HISTORY_BACKENDS',
+    'create_history_store',
+    'get_history_store',
+    'set_history_store',
+    'make_record',
+    'read_csv_records',
+    'iter_csv_chunks',
+    'gzip_chunks',
+    'ParquetSnapshot',
+    'create_snapshot',
+    'snapshot_available'
+]
@@ -0,0 +1,95 @@
+"""Command line utilities for the history store: python -m src.storage"""
+
+import argparse
+import os
+import sys
+
+from .columnar import create_snapshot, snapshot_available
+from .factory import DEFAULT_CSV_PATH, HISTORY_BACKENDS, create_history_store
+
+
+def main(argv=None):
+    """Parses the command line and runs the requested maintenance command."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.storage",
+        description="Maintenance commands for the transcription history store."
+    )
+    parser.add_argument(
+        "--csv-path",
+        default=os.getenv("CSV_PATH", DEFAULT_CSV_PATH),
+        help="History CSV used by the store (default: $CSV_PATH)"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=HISTORY_BACKENDS,
+        default=os.getenv("HISTORY_BACKEND", "csv"),
+        help="History backend (default: $HISTORY_BACKEND or csv)"
+    )
+    parser.add_argument(
+        "--db-path",
+        default=os.getenv("HISTORY_DB_PATH"),
+        help="SQLite database for the sqlite backend (default: $HISTORY_DB_PATH)"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser(
+        "import-csv",
+        help="Append every row of an existing history CSV to the store"
+    )
+    import_parser.add_argument("source", help="CSV file with the history columns")
+
+    subparsers.add_parser("count", help="Print the number of stored transcriptions")
+
+    subparsers.add_parser(
+        "rebuild-stats",
+        help="Recompute the statistics served by /stats from the stored rows"
+    )
+
+    snapshot_parser = subparsers.add_parser(
+        "snapshot",
+        help="Bring the Parquet snapshot up to date (requires pyarrow)"
+    )
+    snapshot_parser.add_argument(
+        "--path",
+        help="Snapshot directory (default: $HISTORY_SNAPSHOT_DIR or the history path with .parquet)"
+    )
+
+    subparsers.add_parser(
+        "migrate",
+        help="Create the SQLite database and import CSV_PATH into it (runs once)"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "snapshot" and not snapshot_available():
+        print("The snapshot command requires pyarrow: pip install pyarrow")
+        return 1
+    if args.command == "migrate":
+        args.backend = "sqlite"
+    store = create_history_store(args.backend, args.csv_path, args.db_path)
+
+    if args.command == "import-csv":
+        imported = store.import_csv(args.source)
+        print(f"Imported {imported} transcriptions from {args.source}")
+    elif args.command == "migrate":
+        migrated_from = store.get_meta('csv_migrated_from')
+        print(f"SQLite history at {store.path} ({store.count()} transcriptions, migrated from {migrated_from})")
+    elif args.command == "count":
+        print(store.count())
+    elif args.command == "rebuild-stats":
+        summary = store.rebuild_stats()
+        print(
+            f"Rebuilt statistics: {summary['count']} transcriptions, "
+            f"{len(summary['by_model'])} models, {len(summary['by_day'])} days"
+        )
+    elif args.command == "snapshot":
+        snapshot = create_snapshot(store, args.path)
+        added = snapshot.refresh()
+        print(f"Snapshot at {snapshot.path}: {added} new transcriptions, {snapshot.last_id()} in total")
+        snapshot.close()
+
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
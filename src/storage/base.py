@@ -0,0 +1,269 @@
+"""Storage interface shared by every transcription history backend."""
+
+import base64
+import binascii
+import csv
+import heapq
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .stats import HistoryStats
+
+# Column order of the history CSV. Every backend reads and exports rows
+# with exactly these columns so `/download` stays compatible.
+HISTORY_COLUMNS = [
+    'timestamp',
+    'filename',
+    'duration_seconds',
+    'model',
+    'transcription_text'
+]
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_duration(value) -> Optional[float]:
+    """Converts a stored duration ('' / None / number / text) to float or None."""
+    if value is None or value == '':
+        return None
+    try:
+        duration = float(value)
+    except (TypeError, ValueError):
+        return None
+    # NaN never compares equal to itself
+    return duration if duration == duration else None
+
+
+def make_record(
+    filename: str,
+    transcription_text: str,
+    duration_seconds: Optional[float] = None,
+    model: str = "deepgram-nova-2",
+    timestamp: Optional[str] = None
+) -> Dict:
+    """Builds a history record with the canonical columns."""
+    return {
+        'timestamp': timestamp or datetime.now().strftime(TIMESTAMP_FORMAT),
+        'filename': filename,
+        'duration_seconds': parse_duration(duration_seconds),
+        'model': model,
+        'transcription_text': transcription_text or ''
+    }
+
+
+def normalize_record(row: Dict) -> Dict:
+    """Normalizes a raw row (e.g. from csv.DictReader) into a history record."""
+    return {
+        'timestamp': row.get('timestamp') or datetime.now().strftime(TIMESTAMP_FORMAT),
+        'filename': row.get('filename') or '',
+        'duration_seconds': parse_duration(row.get('duration_seconds')),
+        'model': row.get('model') or '',
+        'transcription_text': row.get('transcription_text') or ''
+    }
+
+
+def read_csv_records(csv_path: Union[str, Path]) -> Iterator[Dict]:
+    """Streams the records of a history CSV file (header required)."""
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            yield normalize_record(row)
+
+
+def encode_cursor(record: Dict) -> str:
+    """Opaque pagination token pointing just past `record` (newest-first order)."""
+    raw = json.dumps([record['timestamp'], record['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Returns the (timestamp, id) key of a cursor. Raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not isinstance(timestamp, str) or not isinstance(row_id, int):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return timestamp, row_id
+
+
+def time_bound(value: Optional[str], end: bool = False) -> Optional[str]:
+    """Normalizes a date or datetime filter to TIMESTAMP_FORMAT.
+
+    A bare date (YYYY-MM-DD) used as an `end` bound covers the whole day.
+    Raises ValueError for values that are not ISO dates.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date {value!r}, expected YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+    if end and len(value) == 10:
+        parsed = parsed.replace(hour=23, minute=59, second=59)
+    return parsed.strftime(TIMESTAMP_FORMAT)
+
+
+def record_matches(
+    record: Dict,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    model: Optional[str] = None,
+    filename_prefix: Optional[str] = None,
+    filename: Optional[str] = None
+) -> bool:
+    """Whether a record passes the /history filters (bounds already normalized)."""
+    return (
+        (not start or record['timestamp'] >= start)
+        and (not end or record['timestamp'] <= end)
+        and (not model or record['model'] == model)
+        and (not filename_prefix or record['filename'].startswith(filename_prefix))
+        and (not filename or record['filename'] == filename)
+    )
+
+
+def split_page(rows: List[Dict], limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """Trims a page fetched with one extra row and builds its next cursor."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+class HistoryStore(ABC):
+    """Storage backend for the transcription history.
+
+    Records are plain dicts with the keys in HISTORY_COLUMNS plus an
+    integer 'id' assigned by the store in insertion order.
+    """
+
+    @abstractmethod
+    def append(self, record: Dict) -> Dict:
+        """Appends one record and returns it with its assigned 'id'."""
+
+    @abstractmethod
+    def append_many(self, records: Iterable[Dict]) -> int:
+        """Appends several records in a single write. Returns how many were written."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Returns the number of stored transcriptions."""
+
+    @abstractmethod
+    def iter_records(self) -> Iterator[Dict]:
+        """Yields every record in insertion order."""
+
+    def iter_records_after(self, after_id: int) -> Iterator[Dict]:
+        """Yields the records with an id above `after_id`, in insertion order.
+
+        Used to bring snapshots up to date with recent appends; backends
+        override it to start reading at `after_id` instead of scanning.
+        """
+        return (record for record in self.iter_records() if record['id'] > after_id)
+
+    @abstractmethod
+    def latest(
+        self,
+        limit: int = 10,
+        search: Optional[str] = None,
+        filename: Optional[str] = None
+    ) -> List[Dict]:
+        """Returns up to `limit` records, newest first.
+
+        `search` keeps records matching the full-text query (see
+        `search.py`) and `filename` keeps records of that exact file.
+        """
+
+    @abstractmethod
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        filename: Optional[str] = None
+    ) -> List[Dict]:
+        """Returns up to `limit` records matching `query`, most relevant first.
+
+        Each record carries a 'score' (higher is more relevant).
+        """
+
+    def page(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        model: Optional[str] = None,
+        filename_prefix: Optional[str] = None,
+        search: Optional[str] = None,
+        filename: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Keyset pagination over (timestamp, id), newest first.
+
+        `cursor` is the `next_cursor` of the previous page; `start`/`end`
+        are inclusive date or datetime bounds and `filename` an exact
+        file name. Returns (records, next_cursor), where next_cursor is
+        None on the last page.
+
+        This default scans the whole history; backends override it with
+        an index lookup.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        start, end = time_bound(start), time_bound(end, end=True)
+        matched = None
+        if search:
+            matched = {r['id'] for r in self.search(search, limit=self.count())}
+        candidates = (
+            record for record in self.iter_records()
+            if (matched is None or record['id'] in matched)
+            and (after is None or (record['timestamp'], record['id']) < after)
+            and record_matches(record, start, end, model, filename_prefix, filename)
+        )
+        rows = heapq.nlargest(limit + 1, candidates, key=lambda r: (r['timestamp'], r['id']))
+        return split_page(rows, limit)
+
+    def export(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict]:
+        """Streams the records for a CSV export, oldest first.
+
+        `start`/`end` are inclusive date or datetime bounds; they are
+        validated here (ValueError) before any record is read.
+        """
+        start, end = time_bound(start), time_bound(end, end=True)
+        return (record for record in self.iter_records() if record_matches(record, start, end))
+
+    def summary(self, recent: int = 5) -> Dict:
+        """Aggregates used by /stats (see `stats.build_summary`).
+
+        Count, durations, per-model counts, per-model and per-day
+        breakdowns and the `recent` newest filenames. Backends keep these
+        up to date as rows are stored; this default scans the history.
+        """
+        stats = HistoryStats(recent_size=recent)
+        for record in self.iter_records():
+            stats.add(record)
+        return stats.summary(recent)
+
+    def rebuild_stats(self) -> Dict:
+        """Recomputes the maintained aggregates from the stored rows."""
+        return self.summary()
+
+    def close(self):
+        """Releases open handles. The store must not be used afterwards."""
+
+    def save(
+        self,
+        filename: str,
+        transcription_text: str,
+        duration_seconds: Optional[float] = None,
+        model: str = "deepgram-nova-2",
+        timestamp: Optional[str] = None
+    ) -> Dict:
+        """Convenience wrapper around append() taking the record fields."""
+        return self.append(make_record(filename, transcription_text, duration_seconds, model, timestamp))
+
+    def import_csv(self, csv_path: Union[str, Path]) -> int:
+        """Imports every row of an existing history CSV. Returns rows imported."""
+        return self.append_many(read_csv_records(csv_path))
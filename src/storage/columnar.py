@@ -0,0 +1,268 @@
+"""Columnar (Parquet) snapshot of the history for analytics.
+
+The snapshot is a directory of Parquet files next to the history
+(`history.csv` -> `history.parquet/`). A refresh only writes the rows
+stored since the previous refresh, as a new part; once there are more
+than `max_parts` parts they are compacted into a single file. Reads
+memory-map the files and load just the columns they need, so
+aggregations never parse `transcription_text`.
+
+Used by `/download?format=parquet` and `python -m src.storage snapshot`.
+pyarrow is an optional dependency (`pip install pyarrow`); without it
+`snapshot_available()` is False. It is only imported when the first
+snapshot is created, so importing the storage package stays cheap.
+
+Configuration (environment variables):
+- HISTORY_SNAPSHOT_DIR: snapshot directory (default: history path with a .parquet suffix)
+- HISTORY_SNAPSHOT_MAX_PARTS: parts kept before compacting (default: 8)
+"""
+
+import importlib.util
+import os
+import re
+import threading
+import uuid
+from itertools import islice
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .base import HistoryStore, time_bound
+from .locking import FileLock
+from .stats import build_summary
+
+# pyarrow modules, imported by _load_pyarrow()
+pa = pc = pq = None
+
+SNAPSHOT_MAX_PARTS = int(os.getenv("HISTORY_SNAPSHOT_MAX_PARTS", 8))
+
+# Records converted and written per Parquet row group
+_BATCH_ROWS = 50_000
+
+_PART_RE = re.compile(r"^part-(\d{10})-(\d{10})\.parquet$")
+
+# Columns needed for the /stats-style summary (no transcription text)
+_SUMMARY_COLUMNS = ['id', 'timestamp', 'filename', 'duration_seconds', 'model']
+
+
+def snapshot_available() -> bool:
+    """True when pyarrow is installed (without importing it)."""
+    return pa is not None or importlib.util.find_spec("pyarrow") is not None
+
+
+def _load_pyarrow() -> bool:
+    global pa, pc, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.compute
+            import pyarrow.parquet
+        except ImportError:
+            return False
+        pa, pc, pq = pyarrow, pyarrow.compute, pyarrow.parquet
+    return True
+
+
+def _schema():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('timestamp', pa.string()),
+        ('filename', pa.string()),
+        ('duration_seconds', pa.float64()),
+        ('model', pa.string()),
+        ('transcription_text', pa.string())
+    ])
+
+
+def _batches(records: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _buckets(keys, durations) -> Dict[str, Dict]:
+    """Per-key count, duration total and timed count (see stats.py buckets)."""
+    grouped = pa.table({'key': keys, 'duration': durations}).group_by('key').aggregate([
+        ('key', 'count'), ('duration', 'sum'), ('duration', 'count')
+    ])
+    return {
+        key: {'count': count, 'total_duration': total or 0.0, 'timed_count': timed}
+        for key, count, total, timed in zip(
+            grouped['key'].to_pylist(),
+            grouped['key_count'].to_pylist(),
+            grouped['duration_sum'].to_pylist(),
+            grouped['duration_count'].to_pylist()
+        )
+    }
+
+
+class ParquetSnapshot:
+    """Incrementally refreshed Parquet copy of a history store.
+
+    Parts are named after the id range they hold
+    (`part-<first>-<last>.parquet`), so the id to resume from is known
+    without opening them. Refreshes and compactions hold an exclusive
+    file lock and reads a shared one, so several processes can share
+    the directory.
+    """
+
+    def __init__(
+        self,
+        store: HistoryStore,
+        path: Union[str, Path],
+        max_parts: int = SNAPSHOT_MAX_PARTS
+    ):
+        if not _load_pyarrow():
+            raise RuntimeError("Parquet snapshots require pyarrow: pip install pyarrow")
+        self.store = store
+        self.path = Path(path)
+        self.max_parts = max(1, max_parts)
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(self.path / ".lock")
+
+    def _parts(self) -> List[Tuple[int, int, Path]]:
+        """(first_id, last_id, path) of every part, oldest first."""
+        if not self.path.is_dir():
+            return []
+        parts = []
+        for entry in self.path.iterdir():
+            match = _PART_RE.match(entry.name)
+            if match:
+                parts.append((int(match.group(1)), int(match.group(2)), entry))
+        return sorted(parts)
+
+    def last_id(self) -> int:
+        """Id of the newest record in the snapshot (0 if empty)."""
+        parts = self._parts()
+        return parts[-1][1] if parts else 0
+
+    def refresh(self) -> int:
+        """Writes the records stored since the last refresh as a new part.
+
+        Compacts the parts when there are too many. A history that
+        shrank (replaced or truncated) is snapshotted again from scratch.
+        Returns the number of records added.
+        """
+        with self._lock, self._file_lock.hold():
+            parts = self._parts()
+            last = parts[-1][1] if parts else 0
+            if last > self.store.count():
+                for _, _, part in parts:
+                    part.unlink()
+                last = 0
+
+            tmp = self.path / f".part-{uuid.uuid4().hex}.tmp"
+            writer = None
+            first = added = 0
+            try:
+                for batch in _batches(self.store.iter_records_after(last), _BATCH_ROWS):
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp, _schema(), compression='zstd')
+                        first = batch[0]['id']
+                    writer.write_table(pa.Table.from_pylist(batch, schema=_schema()))
+                    added += len(batch)
+                    last = batch[-1]['id']
+                if writer is not None:
+                    writer.close()
+                    writer = None
+                    os.replace(tmp, self.path / f"part-{first:010d}-{last:010d}.parquet")
+            finally:
+                if writer is not None:
+                    writer.close()
+                tmp.unlink(missing_ok=True)
+
+            if len(self._parts()) > self.max_parts:
+                self._compact()
+            return added
+
+    def _compact(self) -> None:
+        """Merges every part into one file. Caller holds both locks."""
+        parts = self._parts()
+        tmp = self.path / f".compact-{uuid.uuid4().hex}.tmp"
+        try:
+            with pq.ParquetWriter(tmp, _schema(), compression='zstd') as writer:
+                for _, _, part in parts:
+                    for batch in pq.ParquetFile(part, memory_map=True).iter_batches(batch_size=_BATCH_ROWS):
+                        writer.write_batch(batch)
+            os.replace(tmp, self.path / f"part-{parts[0][0]:010d}-{parts[-1][1]:010d}.parquet")
+        finally:
+            tmp.unlink(missing_ok=True)
+        # The merged file's id range differs from every old part's
+        for _, _, part in parts:
+            part.unlink(missing_ok=True)
+
+    def _filter(self, table, start: Optional[str], end: Optional[str]):
+        if start:
+            table = table.filter(pc.greater_equal(table['timestamp'], start))
+        if end:
+            table = table.filter(pc.less_equal(table['timestamp'], end))
+        return table
+
+    def read(
+        self,
+        columns: Optional[List[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None
+    ):
+        """Refreshes, then returns the snapshot as a memory-mapped pyarrow Table.
+
+        Only `columns` are loaded (all by default); `start`/`end` are
+        inclusive date or datetime bounds (ValueError if malformed).
+        """
+        start, end = time_bound(start), time_bound(end, end=True)
+        self.refresh()
+        wanted = columns or _schema().names
+        read_columns = list(dict.fromkeys(wanted + (['timestamp'] if start or end else [])))
+        with self._file_lock.hold(shared=True):
+            tables = [
+                pq.read_table(part, columns=read_columns, memory_map=True)
+                for _, _, part in self._parts()
+            ]
+        schema = pa.schema([_schema().field(name) for name in read_columns])
+        table = pa.concat_tables(tables) if tables else schema.empty_table()
+        return self._filter(table, start, end).select(wanted)
+
+    def export(self, sink: Union[str, Path, BinaryIO], start: Optional[str] = None, end: Optional[str] = None) -> int:
+        """Writes the (filtered) snapshot as one Parquet file to `sink`.
+
+        Parts are copied one row group at a time, so memory use does not
+        grow with the history. Returns the number of records written.
+        """
+        start, end = time_bound(start), time_bound(end, end=True)
+        self.refresh()
+        written = 0
+        with self._file_lock.hold(shared=True), \
+                pq.ParquetWriter(sink, _schema(), compression='zstd') as writer:
+            for _, _, part in self._parts():
+                for batch in pq.ParquetFile(part, memory_map=True).iter_batches(batch_size=_BATCH_ROWS):
+                    table = self._filter(pa.Table.from_batches([batch]), start, end)
+                    if table.num_rows:
+                        writer.write_table(table)
+                        written += table.num_rows
+        return written
+
+    def summary(self, recent: int = 5) -> Dict:
+        """Same aggregates as `HistoryStore.summary()`, computed from the
+        snapshot's columns without reading any transcription text."""
+        table = self.read(_SUMMARY_COLUMNS)
+        durations = table['duration_seconds']
+        models = _buckets(table['model'], durations)
+        days = _buckets(pc.utf8_slice_codeunits(table['timestamp'], 0, 10), durations)
+        recent_files = []
+        if recent > 0 and table.num_rows:
+            newest = table.select(['timestamp', 'id', 'filename']).sort_by(
+                [('timestamp', 'descending'), ('id', 'descending')]
+            ).slice(0, recent)
+            recent_files = newest['filename'].to_pylist()
+        return build_summary(models, days, recent_files)
+
+    def close(self) -> None:
+        self._file_lock.close()
+
+
+def create_snapshot(store: HistoryStore, path: Optional[Union[str, Path]] = None) -> ParquetSnapshot:
+    """Snapshot of `store` in `path`, $HISTORY_SNAPSHOT_DIR or next to the history."""
+    path = path or os.getenv("HISTORY_SNAPSHOT_DIR") or Path(store.path).with_suffix(".parquet")
+    return ParquetSnapshot(store, path)
@@ -0,0 +1,519 @@
+"""Append-only CSV backend for the transcription history.
+
+New transcriptions are appended to the end of the CSV file instead of
+reading and rewriting the whole history, so saving costs the same no
+matter how many rows already exist. The file keeps the historic layout
+(`timestamp, filename, duration_seconds, model, transcription_text`),
+which means existing `history.csv` files are used as-is.
+
+Text search uses an in-process inverted index (see `search.py`) that is
+built on the first search and then kept up to date as rows are appended.
+The byte offset where each row starts is tracked too, so pages of
+`/history` are read by seeking straight to their rows. Rows are normally
+appended in time order; once rows with older timestamps are imported, a
+position index sorted by (timestamp, id) keeps pages and exports just as
+direct.
+
+Several processes (uvicorn workers, the batch CLI) can share the file:
+appends take an inter-process lock (see `locking.py`) and concurrent
+saves are group-committed (see `group_commit.py`), one fsync per group.
+"""
+
+import csv
+import io
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .base import (
+    HISTORY_COLUMNS,
+    HistoryStore,
+    decode_cursor,
+    normalize_record,
+    record_matches,
+    split_page,
+    time_bound,
+)
+from .group_commit import GroupCommit, PendingWrite
+from .locking import FileLock
+from .search import InvertedIndex
+from .stats import HistoryStats
+from ..tracing import traced
+
+# Flush encoded rows to disk once the pending buffer reaches this size
+_WRITE_BUFFER_BYTES = 1024 * 1024
+
+# Rows read per sequential chunk when paging backwards through the file
+_PAGE_READ_ROWS = 256
+
+
+def _encode_rows(records: Iterable[Dict]) -> Iterator[Tuple[bytes, int]]:
+    """Encodes records as CSV lines, yielding (payload, row_count) chunks."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    rows = 0
+    for record in records:
+        duration = record.get('duration_seconds')
+        writer.writerow([
+            record['timestamp'],
+            record['filename'],
+            '' if duration is None else duration,
+            record['model'],
+            record['transcription_text']
+        ])
+        rows += 1
+        if buffer.tell() >= _WRITE_BUFFER_BYTES:
+            yield buffer.getvalue().encode('utf-8'), rows
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if rows:
+        yield buffer.getvalue().encode('utf-8'), rows
+
+
+class CsvHistoryStore(HistoryStore):
+    """History store backed by an append-only CSV file.
+
+    Writes are serialized with a lock (between threads) and a file lock
+    (between processes), issued as a single append and fsync'ed before
+    returning; concurrent writes share the append and the fsync. The row
+    count is tracked incrementally: the store remembers the byte offset
+    it has already counted and only parses rows appended after it, which
+    includes rows appended by other processes.
+    """
+
+    def __init__(self, csv_path: Union[str, Path]):
+        self.path = Path(csv_path)
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(self.path.with_name(self.path.name + '.lock'))
+        self._group_commit = GroupCommit(self._commit)
+        self._header = HISTORY_COLUMNS
+        self._timestamp_column = 0
+        # State derived from the rows as they are read (see _refresh):
+        # - byte offset and count of the rows processed so far
+        # - row start offsets (by id - 1) and whether timestamps never go
+        #   backwards in file order, which lets pages be read by id;
+        #   otherwise the position index, built on the first page
+        # - running statistics for /stats
+        # - the search index, built on the first search
+        self._reset(with_index=False)
+        self._initialize()
+
+    def _initialize(self):
+        """Creates the CSV file with headers if it doesn't exist."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Another process may be creating or appending to the file too
+        with self._file_lock.hold():
+            if not self.path.exists() or self.path.stat().st_size == 0:
+                with open(self.path, 'w', encoding='utf-8', newline='') as f:
+                    csv.writer(f, lineterminator='\n').writerow(HISTORY_COLUMNS)
+                    f.flush()
+                    os.fsync(f.fileno())
+            else:
+                with open(self.path, 'a+b') as f:
+                    self._ensure_trailing_newline(f)
+
+    def _iter_rows_from(self, f, offset: int) -> Iterator[Tuple[List[str], int]]:
+        """Parses rows starting at `offset`, yielding (row, end_offset) pairs.
+
+        Only complete lines are consumed, so a row that is still being
+        written by another process is picked up on a later call.
+        """
+        f.seek(offset)
+        position = [offset]
+
+        def lines():
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    return
+                position[0] += len(raw)
+                yield raw.decode('utf-8')
+
+        for row in csv.reader(lines()):
+            yield row, position[0]
+
+    def _refresh(self, f) -> None:
+        """Processes rows appended since the last refresh. Caller holds the lock.
+
+        Updates the row count, the row offsets, the running statistics
+        and, once it exists, the search index.
+        """
+        offset = self._offset
+        count = self._count
+        skip_header = offset == 0
+        for row, end in self._iter_rows_from(f, offset):
+            start, offset = offset, end
+            if skip_header:
+                skip_header = False
+                self._header = row
+                self._timestamp_column = row.index('timestamp') if 'timestamp' in row else 0
+                continue
+            if not row:
+                continue
+            count += 1
+            self._row_offsets.append(start)
+            timestamp = self._row_timestamp(row)
+            if timestamp < self._last_timestamp:
+                self._in_time_order = False
+            self._last_timestamp = max(timestamp, self._last_timestamp)
+            if self._order is not None:
+                insort(self._order, (timestamp, count))
+            record = {'id': count, **self._to_record(row)}
+            self._stats.add(record)
+            if self._index is not None:
+                self._index.add(count, record['transcription_text'])
+        self._offset = offset
+        self._count = count
+
+    def _catch_up(self, f) -> None:
+        """`_refresh` under the shared file lock, so rows another process
+        is appending are never read half-written. Caller holds the lock."""
+        with self._file_lock.hold(shared=True):
+            self._refresh(f)
+
+    def _to_record(self, row: List[str]) -> Dict:
+        return normalize_record(dict(zip(self._header, row)))
+
+    def _row_timestamp(self, row: List[str]) -> str:
+        return row[self._timestamp_column] if len(row) > self._timestamp_column else ''
+
+    def _reset(self, with_index: bool) -> None:
+        """Forgets everything derived from the file so the next refresh
+        re-reads it from the start. Caller holds the lock."""
+        # New objects: readers holding the old ones keep a consistent
+        # view while the rows are re-read
+        self._row_offsets = array('q')
+        self._stats = HistoryStats()
+        self._index: Optional[InvertedIndex] = InvertedIndex() if with_index else None
+        self._order: Optional[List[Tuple[str, int]]] = None
+        self._last_timestamp = ''
+        self._in_time_order = True
+        self._offset = 0
+        self._count = 0
+
+    def _search_index(self, query: str) -> List[Tuple[int, float]]:
+        """Matches for `query` in the search index, built on first use and
+        caught up with new rows. Queried under the lock: commits add to the
+        postings the query iterates."""
+        with self._lock:
+            with open(self.path, 'rb') as f:
+                if self._index is None:
+                    self._reset(with_index=True)
+                self._catch_up(f)
+            return self._index.search(query)
+
+    def _time_order(self, f) -> List[Tuple[str, int]]:
+        """The position index: (timestamp, id) of every row, sorted.
+
+        Only needed once rows are out of time order; built from the file
+        on first use, then `_refresh` inserts new rows. Caller holds the lock.
+        """
+        if self._order is None:
+            order = []
+            if self._count:
+                for row, _ in self._iter_rows_from(f, self._row_offsets[0]):
+                    if not row:
+                        continue
+                    order.append((self._row_timestamp(row), len(order) + 1))
+                    if len(order) == self._count:
+                        break
+            order.sort()
+            self._order = order
+        return self._order
+
+    def _ordered_ids(self, order, below: Optional[Tuple] = None, from_key: Optional[Tuple] = None) -> Iterator[int]:
+        """Ids from the position index: newest first below `below`, or
+        oldest first from `from_key`. Read in chunks under the lock, since
+        commits insert into the index; each chunk resumes after the last key."""
+        forward = from_key is not None
+        last = None
+        while True:
+            with self._lock:
+                if forward:
+                    position = bisect_right(order, last) if last else bisect_left(order, from_key)
+                    chunk = order[position:position + _PAGE_READ_ROWS]
+                else:
+                    bound = last or below
+                    position = bisect_left(order, bound) if bound else len(order)
+                    chunk = order[max(0, position - _PAGE_READ_ROWS):position][::-1]
+            if not chunk:
+                return
+            for _, row_id in chunk:
+                yield row_id
+            last = chunk[-1]
+
+    def _read_records(self, ids: List[int]) -> List[Dict]:
+        """Reads the records with the given ids by seeking to their offsets."""
+        with open(self.path, 'rb') as f:
+            return [self._read_range(f, self._row_offsets, row_id, row_id)[0] for row_id in ids]
+
+    def _read_range(self, f, offsets, first: int, last: int) -> List[Dict]:
+        """Reads the records with ids first..last in one sequential pass."""
+        records = []
+        row_id = first
+        for row, _ in self._iter_rows_from(f, offsets[first - 1]):
+            if not row:
+                continue
+            records.append({'id': row_id, **self._to_record(row)})
+            if row_id == last:
+                break
+            row_id += 1
+        return records
+
+    def _last_id_where(self, f, offsets, upper: int, before) -> int:
+        """Highest id <= upper whose timestamp satisfies `before` (0 if none).
+
+        Bisects by seeking, so rows must be in time order and `before`
+        must hold for a prefix of them.
+        """
+        low, high = 0, upper
+        while low < high:
+            middle = (low + high + 1) // 2
+            if before(self._read_range(f, offsets, middle, middle)[0]['timestamp']):
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def _ensure_trailing_newline(self, f) -> None:
+        """Terminates a last line that was written without a newline."""
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) != b'\n':
+            f.write(b'\n')
+
+    def _commit(self, batches: List[PendingWrite]) -> None:
+        """Appends every batch and fsyncs once (see GroupCommit).
+
+        Holds the exclusive file lock from reading the end of the file to
+        the fsync: rows other processes appended before are counted
+        first, so the ids handed out are exact.
+        """
+        with self._lock, self._file_lock.hold():
+            with open(self.path, 'a+b') as f:
+                self._ensure_trailing_newline(f)
+                self._refresh(f)
+                f.seek(0, os.SEEK_END)
+                total = self._count
+                for batch in batches:
+                    try:
+                        for payload, rows in _encode_rows(batch.records):
+                            f.write(payload)
+                            batch.written += rows
+                    except Exception as e:
+                        batch.error = e
+                    total += batch.written
+                    batch.last_id = total
+                f.flush()
+                os.fsync(f.fileno())
+                # Picks up the new rows (count and search index)
+                self._refresh(f)
+
+    @traced("history.append")
+    def append(self, record: Dict) -> Dict:
+        record = normalize_record(record)
+        committed = self._group_commit.submit([record])
+        return {'id': committed.last_id, **record}
+
+    @traced("history.append_many")
+    def append_many(self, records: Iterable[Dict]) -> int:
+        return self._group_commit.submit(normalize_record(r) for r in records).written
+
+    @traced("history.count")
+    def count(self) -> int:
+        with self._lock:
+            with open(self.path, 'rb') as f:
+                self._catch_up(f)
+            return self._count
+
+    def iter_records(self) -> Iterator[Dict]:
+        with open(self.path, 'rb') as f:
+            row_id = 0
+            header = None
+            for row, _ in self._iter_rows_from(f, 0):
+                if header is None:
+                    header = row
+                    continue
+                if not row:
+                    continue
+                row_id += 1
+                yield {'id': row_id, **normalize_record(dict(zip(header, row)))}
+
+    def iter_records_after(self, after_id: int) -> Iterator[Dict]:
+        with self._lock:
+            with open(self.path, 'rb') as f:
+                self._catch_up(f)
+            offsets, count = self._row_offsets, self._count
+        return self._iter_range(offsets, max(after_id, 0) + 1, count)
+
+    def _iter_range(self, offsets, first: int, last: int) -> Iterator[Dict]:
+        """Streams the records with ids first..last, seeking to the first."""
+        if first > last:
+            return
+        with open(self.path, 'rb') as f:
+            row_id = first
+            for row, _ in self._iter_rows_from(f, offsets[first - 1]):
+                if not row:
+                    continue
+                yield {'id': row_id, **self._to_record(row)}
+                if row_id == last:
+                    return
+                row_id += 1
+
+    @traced("history.search")
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        filename: Optional[str] = None
+    ) -> List[Dict]:
+        results = []
+        for row_id, score in self._search_index(query):
+            record = self._read_records([row_id])[0]
+            if filename and record['filename'] != filename:
+                continue
+            results.append({**record, 'score': score})
+            if len(results) >= limit:
+                break
+        return results
+
+    @traced("history.page")
+    def page(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        model: Optional[str] = None,
+        filename_prefix: Optional[str] = None,
+        search: Optional[str] = None,
+        filename: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        after = decode_cursor(cursor) if cursor else None
+        start, end = time_bound(start), time_bound(end, end=True)
+        matches = self._search_index(search) if search else None
+        with self._lock:
+            with open(self.path, 'rb') as f:
+                self._catch_up(f)
+                order = None if self._in_time_order else self._time_order(f)
+            offsets, upper = self._row_offsets, self._count
+
+        rows = []
+        with open(self.path, 'rb') as f:
+            if order is not None:
+                # Out of time order: walk the position index down from
+                # the cursor or `end`, whichever is lower
+                bounds = [key for key in (after, end and (end, float('inf'))) if key]
+                ids = (i for i in self._ordered_ids(order, below=min(bounds) if bounds else None) if i <= upper)
+                if matches is not None:
+                    matched = {i for i, _ in matches}
+                    ids = (i for i in ids if i in matched)
+                candidates = (self._read_range(f, offsets, i, i)[0] for i in ids)
+            else:
+                # In time order, (timestamp, id) order is plain id order: the
+                # page is read backwards from the cursor, skipping to `end`
+                # by bisection
+                if after:
+                    upper = min(upper, after[1] - 1)
+                if end:
+                    upper = self._last_id_where(f, offsets, upper, lambda ts: ts <= end)
+                candidates = self._records_down_from(f, offsets, upper, matches)
+
+            for record in candidates:
+                if start and record['timestamp'] < start:
+                    break
+                if record_matches(record, model=model, filename_prefix=filename_prefix, filename=filename):
+                    rows.append(record)
+                    if len(rows) > limit:
+                        break
+        return split_page(rows, limit)
+
+    def _records_down_from(self, f, offsets, upper: int, matches: Optional[List[Tuple[int, float]]]) -> Iterator[Dict]:
+        """Records with id <= upper, highest id first (only `matches` if given)."""
+        if matches is not None:
+            for row_id in sorted((i for i, _ in matches if i <= upper), reverse=True):
+                yield self._read_range(f, offsets, row_id, row_id)[0]
+            return
+        last = upper
+        while last >= 1:
+            first = max(1, last - _PAGE_READ_ROWS + 1)
+            yield from reversed(self._read_range(f, offsets, first, last))
+            last = first - 1
+
+    def export(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict]:
+        start, end = time_bound(start), time_bound(end, end=True)
+        if not (start or end):
+            return self.iter_records()
+        with self._lock:
+            with open(self.path, 'rb') as f:
+                self._catch_up(f)
+                order = None if self._in_time_order else self._time_order(f)
+            offsets, count = self._row_offsets, self._count
+        if order is not None:
+            return self._export_ordered(order, offsets, count, start, end)
+        return self._export_range(offsets, count, start, end)
+
+    def _export_ordered(self, order, offsets, count: int, start: Optional[str], end: Optional[str]) -> Iterator[Dict]:
+        """Reads the rows between two timestamps through the position index."""
+        with open(self.path, 'rb') as f:
+            for row_id in self._ordered_ids(order, from_key=(start or '', 0)):
+                if row_id > count:
+                    continue
+                record = self._read_range(f, offsets, row_id, row_id)[0]
+                if end and record['timestamp'] > end:
+                    return
+                yield record
+
+    def _export_range(self, offsets, count: int, start: Optional[str], end: Optional[str]) -> Iterator[Dict]:
+        """Reads the rows between two timestamps of a file in time order."""
+        with open(self.path, 'rb') as f:
+            first = 1
+            if start:
+                first = self._last_id_where(f, offsets, count, lambda ts: ts < start) + 1
+            if first > count:
+                return
+            row_id = first
+            for row, _ in self._iter_rows_from(f, offsets[first - 1]):
+                if not row:
+                    continue
+                record = {'id': row_id, **self._to_record(row)}
+                if row_id > count or (end and record['timestamp'] > end):
+                    return
+                yield record
+                row_id += 1
+
+    @traced("history.latest")
+    def latest(
+        self,
+        limit: int = 10,
+        search: Optional[str] = None,
+        filename: Optional[str] = None
+    ) -> List[Dict]:
+        return self.page(limit, search=search, filename=filename)[0]
+
+    @traced("history.summary")
+    def summary(self, recent: int = 5) -> Dict:
+        with self._lock:
+            with open(self.path, 'rb') as f:
+                self._catch_up(f)
+            return self._stats.summary(recent)
+
+    def rebuild_stats(self) -> Dict:
+        with self._lock:
+            with open(self.path, 'rb') as f:
+                self._reset(with_index=self._index is not None)
+                self._catch_up(f)
+            return self._stats.summary()
+
+    def close(self):
+        self._file_lock.close()
+
+    def import_csv(self, csv_path: Union[str, Path]) -> int:
+        if Path(csv_path).resolve() == self.path.resolve():
+            raise ValueError(f"Cannot import '{csv_path}' into itself")
+        return super().import_csv(csv_path)
@@ -0,0 +1,38 @@
+"""Streaming CSV export of the transcription history.
+
+Records are encoded into chunks of about EXPORT_CHUNK_BYTES, so the
+memory used by an export does not depend on the size of the history.
+"""
+
+import csv
+import io
+import zlib
+from typing import Dict, Iterable, Iterator
+
+from .base import HISTORY_COLUMNS
+
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def iter_csv_chunks(records: Iterable[Dict], chunk_bytes: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    """Encodes records as UTF-8 CSV (header first), yielding byte chunks."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(HISTORY_COLUMNS)
+    for record in records:
+        writer.writerow(['' if record[column] is None else record[column] for column in HISTORY_COLUMNS])
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compresses a stream of chunks into a single gzip stream."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
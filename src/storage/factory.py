@@ -0,0 +1,76 @@
+"""Builds the history store selected through environment variables.
+
+`get_history_store()` returns the process-wide store shared by the API
+server and the agent tools, so both write to the same history and reuse
+its warm state (open connections, row offsets, search index, running
+statistics) instead of rebuilding it on every call.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+from .base import HistoryStore
+from .csv_store import CsvHistoryStore
+from .sqlite_store import SqliteHistoryStore
+
+DEFAULT_CSV_PATH = "data/transcriptions/output/history.csv"
+
+HISTORY_BACKENDS = ('csv', 'sqlite')
+
+
+def create_history_store(
+    backend: Optional[str] = None,
+    csv_path: Optional[Union[str, Path]] = None,
+    db_path: Optional[Union[str, Path]] = None
+) -> HistoryStore:
+    """Creates the configured history store.
+
+    - HISTORY_BACKEND: 'csv' (default) or 'sqlite'
+    - CSV_PATH: history CSV (the csv backend, and the migration source for sqlite)
+    - HISTORY_DB_PATH: SQLite database (default: CSV_PATH with a .db suffix)
+
+    The sqlite backend imports the existing CSV once, the first time
+    the database is opened.
+    """
+    backend = (backend or os.getenv("HISTORY_BACKEND", "csv")).strip().lower()
+    csv_path = Path(csv_path or os.getenv("CSV_PATH", DEFAULT_CSV_PATH))
+
+    if backend == "csv":
+        return CsvHistoryStore(csv_path)
+
+    if backend == "sqlite":
+        db_path = Path(db_path or os.getenv("HISTORY_DB_PATH") or csv_path.with_suffix(".db"))
+        store = SqliteHistoryStore(db_path)
+        store.migrate_from_csv(csv_path)
+        return store
+
+    raise ValueError(
+        f"Unknown HISTORY_BACKEND '{backend}'. Options: {', '.join(HISTORY_BACKENDS)}"
+    )
+
+
+_shared_store: Optional[HistoryStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    """Returns the process-wide history store, creating it from the
+    environment on first use (thread-safe)."""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = create_history_store()
+        return _shared_store
+
+
+def set_history_store(store: Optional[HistoryStore]) -> Optional[HistoryStore]:
+    """Installs `store` as the process-wide history store (None resets it).
+
+    Returns the previous store; closing it is up to the caller.
+    """
+    global _shared_store
+    with _shared_store_lock:
+        previous, _shared_store = _shared_store, store
+        return previous
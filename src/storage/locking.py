@@ -0,0 +1,71 @@
+"""Advisory file lock shared by every process that uses the same history.
+
+Several uvicorn workers (or the batch CLI next to the server) append to
+the same history CSV. Writers hold the lock exclusively from the moment
+they look at the end of the file until their rows are fsync'ed, so
+appends from different processes never interleave and row ids stay
+consistent. Readers take it shared while parsing new rows, so they never
+see half of another process's append.
+
+The lock lives in a sidecar file (`history.csv.lock`) rather than on the
+CSV itself, so holding it never interferes with plain reads of the data.
+POSIX systems use flock(); Windows falls back to an exclusive
+msvcrt.locking() for both modes.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Inter-process reader/writer lock on `path`.
+
+    Not reentrant, and not a lock between threads: callers serialize
+    their own threads (the stores do it with a threading.Lock) and use
+    this to exclude other processes.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._fd = None
+        self._open_lock = threading.Lock()
+
+    def _fileno(self) -> int:
+        with self._open_lock:
+            if self._fd is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            return self._fd
+
+    @contextmanager
+    def hold(self, shared: bool = False) -> Iterator[None]:
+        fd = self._fileno()
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def close(self) -> None:
+        with self._open_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
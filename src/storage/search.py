@@ -0,0 +1,114 @@
+"""Full-text search helpers for the transcription history.
+
+Text is matched on normalized tokens: lower-cased and with accents
+removed, so "unión", "Union" and "UNION" are the same term. Every query
+token matches as a prefix ("transcrip" finds "transcripción") and all
+query tokens must appear in a transcription for it to match.
+"""
+
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, List, Tuple
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# BM25 parameters (same defaults as SQLite FTS5)
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+
+def normalize_text(text: str) -> str:
+    """Lower-cases text and strips accents (á -> a, ñ -> n, ü -> u)."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return stripped.casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits text into normalized word tokens."""
+    return _TOKEN_RE.findall(normalize_text(text))
+
+
+def build_match_query(search: str) -> str:
+    """Builds an FTS5 MATCH expression: every token as a quoted prefix term.
+
+    Quoting keeps user input from being parsed as FTS5 syntax (AND, NEAR,
+    column filters...). Returns '' when the search has no word tokens.
+    """
+    return ' '.join(f'"{token}"*' for token in tokenize(search))
+
+
+class InvertedIndex:
+    """In-memory inverted index with BM25 ranking and prefix matching.
+
+    Terms are kept in a sorted list so a prefix expands to its matching
+    terms with a binary search instead of a scan of the vocabulary.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._terms: List[str] = []
+        self._doc_lengths: Dict[int, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def add(self, doc_id: int, text: str) -> None:
+        """Indexes the text of one document."""
+        tokens = tokenize(text)
+        self._doc_lengths[doc_id] = len(tokens)
+        self._total_length += len(tokens)
+        for term, frequency in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                insort(self._terms, term)
+            postings[doc_id] = frequency
+
+    def _expand(self, prefix: str) -> List[str]:
+        """Returns every indexed term starting with `prefix`."""
+        start = bisect_left(self._terms, prefix)
+        terms = []
+        for term in self._terms[start:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """Returns (doc_id, score) pairs for documents matching every token,
+        best first (ties broken by newest document)."""
+        tokens = tokenize(query)
+        if not tokens or not self._doc_lengths:
+            return []
+
+        total_docs = len(self._doc_lengths)
+        average_length = self._total_length / total_docs or 1
+        scores: Dict[int, float] = {}
+        matched = None
+
+        for token in dict.fromkeys(tokens):
+            token_scores: Dict[int, float] = {}
+            for term in self._expand(token):
+                postings = self._postings[term]
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * self._doc_lengths[doc_id] / average_length)
+                    weight = idf * frequency * (_BM25_K1 + 1) / (frequency + norm)
+                    token_scores[doc_id] = token_scores.get(doc_id, 0.0) + weight
+            docs = set(token_scores)
+            matched = docs if matched is None else matched & docs
+            if not matched:
+                return []
+            for doc_id in matched:
+                scores[doc_id] = scores.get(doc_id, 0.0) + token_scores[doc_id]
+
+        return sorted(
+            ((doc_id, scores[doc_id]) for doc_id in matched),
+            key=lambda item: (item[1], item[0]),
+            reverse=True
+        )
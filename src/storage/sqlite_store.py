@@ -0,0 +1,466 @@
+"""SQLite backend for the transcription history.
+
+The database runs in WAL mode so readers never block the writer, and
+keeps indexes on `timestamp`, `filename` and `model`: "latest N",
+per-model counts and filename lookups are index scans instead of full
+loads of the history.
+
+Text search goes through an FTS5 index (`transcriptions_fts`) kept in
+sync by triggers. Its tokenizer folds case and removes diacritics, so
+Spanish text matches with or without accents.
+
+Per-model and per-day aggregates for /stats live in `stats_models` and
+`stats_days`, also maintained by triggers, so /stats reads a handful of
+rows instead of scanning the history.
+
+Concurrent saves are group-committed (see `group_commit.py`): they share
+one transaction, and so one WAL fsync. SQLite's own locking (with
+busy_timeout) keeps writes from several processes safe.
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .base import HistoryStore, decode_cursor, normalize_record, read_csv_records, split_page, time_bound
+from .group_commit import GroupCommit, PendingWrite
+from .search import build_match_query
+from .stats import build_summary
+from ..tracing import traced
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcriptions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    duration_seconds REAL,
+    model TEXT NOT NULL,
+    transcription_text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcriptions_timestamp ON transcriptions (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_transcriptions_filename ON transcriptions (filename);
+CREATE INDEX IF NOT EXISTS idx_transcriptions_model ON transcriptions (model);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE transcriptions_fts USING fts5(
+    transcription_text,
+    content='transcriptions',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER transcriptions_fts_insert AFTER INSERT ON transcriptions BEGIN
+    INSERT INTO transcriptions_fts (rowid, transcription_text)
+    VALUES (new.id, new.transcription_text);
+END;
+CREATE TRIGGER transcriptions_fts_delete AFTER DELETE ON transcriptions BEGIN
+    INSERT INTO transcriptions_fts (transcriptions_fts, rowid, transcription_text)
+    VALUES ('delete', old.id, old.transcription_text);
+END;
+CREATE TRIGGER transcriptions_fts_update AFTER UPDATE ON transcriptions BEGIN
+    INSERT INTO transcriptions_fts (transcriptions_fts, rowid, transcription_text)
+    VALUES ('delete', old.id, old.transcription_text);
+    INSERT INTO transcriptions_fts (rowid, transcription_text)
+    VALUES (new.id, new.transcription_text);
+END;
+INSERT INTO transcriptions_fts (transcriptions_fts) VALUES ('rebuild');
+"""
+
+_STATS_SCHEMA = """
+CREATE TABLE stats_models (
+    model TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    total_duration REAL NOT NULL,
+    timed_count INTEGER NOT NULL
+);
+CREATE TABLE stats_days (
+    day TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    total_duration REAL NOT NULL,
+    timed_count INTEGER NOT NULL
+);
+CREATE TRIGGER stats_insert AFTER INSERT ON transcriptions BEGIN
+    INSERT INTO stats_models (model, count, total_duration, timed_count)
+    VALUES (new.model, 1, COALESCE(new.duration_seconds, 0), new.duration_seconds IS NOT NULL)
+    ON CONFLICT (model) DO UPDATE SET
+        count = count + 1,
+        total_duration = total_duration + excluded.total_duration,
+        timed_count = timed_count + excluded.timed_count;
+    INSERT INTO stats_days (day, count, total_duration, timed_count)
+    VALUES (substr(new.timestamp, 1, 10), 1, COALESCE(new.duration_seconds, 0), new.duration_seconds IS NOT NULL)
+    ON CONFLICT (day) DO UPDATE SET
+        count = count + 1,
+        total_duration = total_duration + excluded.total_duration,
+        timed_count = timed_count + excluded.timed_count;
+END;
+CREATE TRIGGER stats_delete AFTER DELETE ON transcriptions BEGIN
+    UPDATE stats_models SET
+        count = count - 1,
+        total_duration = total_duration - COALESCE(old.duration_seconds, 0),
+        timed_count = timed_count - (old.duration_seconds IS NOT NULL)
+    WHERE model = old.model;
+    UPDATE stats_days SET
+        count = count - 1,
+        total_duration = total_duration - COALESCE(old.duration_seconds, 0),
+        timed_count = timed_count - (old.duration_seconds IS NOT NULL)
+    WHERE day = substr(old.timestamp, 1, 10);
+    DELETE FROM stats_models WHERE count <= 0;
+    DELETE FROM stats_days WHERE count <= 0;
+END;
+"""
+
+_REBUILD_STATS = """
+DELETE FROM stats_models;
+DELETE FROM stats_days;
+INSERT INTO stats_models (model, count, total_duration, timed_count)
+SELECT model, COUNT(*), COALESCE(SUM(duration_seconds), 0), COUNT(duration_seconds)
+FROM transcriptions GROUP BY model;
+INSERT INTO stats_days (day, count, total_duration, timed_count)
+SELECT substr(timestamp, 1, 10), COUNT(*), COALESCE(SUM(duration_seconds), 0), COUNT(duration_seconds)
+FROM transcriptions GROUP BY substr(timestamp, 1, 10);
+"""
+
+_COLUMNS = "id, timestamp, filename, duration_seconds, model, transcription_text"
+
+_INSERT = (
+    "INSERT INTO transcriptions "
+    "(timestamp, filename, duration_seconds, model, transcription_text) "
+    "VALUES (:timestamp, :filename, :duration_seconds, :model, :transcription_text)"
+)
+
+
+def _execute_script(conn: sqlite3.Connection, script: str) -> None:
+    """Runs `script` statement by statement inside the current transaction
+    (executescript() would commit it first)."""
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+
+
+# Rows fetched per round-trip when streaming the whole history
+_FETCH_SIZE = 500
+
+
+class SqliteHistoryStore(HistoryStore):
+    """History store backed by a SQLite database in WAL mode.
+
+    Each thread gets its own connection; writes are serialized by a lock
+    (and by SQLite's own locking across processes).
+    """
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.path = Path(db_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._group_commit = GroupCommit(self._commit)
+        self._initialize()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns the connection of the current thread, opening it if needed."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _initialize(self):
+        """Creates the schema if the database is new.
+
+        The full-text index and the statistics tables are added (and
+        filled from existing rows) the first time a database is opened by
+        a version that knows about them.
+        """
+        conn = self._connect()
+        with self._write_lock:
+            # One write transaction, so processes opening a new database at
+            # the same time don't both find a table missing and create it
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                _execute_script(conn, _SCHEMA)
+                tables = {
+                    row['name'] for row in conn.execute(
+                        "SELECT name FROM sqlite_master WHERE name IN ('transcriptions_fts', 'stats_models')"
+                    )
+                }
+                if 'transcriptions_fts' not in tables:
+                    _execute_script(conn, _FTS_SCHEMA)
+                if 'stats_models' not in tables:
+                    _execute_script(conn, _STATS_SCHEMA + _REBUILD_STATS)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def close(self):
+        """Closes every connection opened by this store."""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT value FROM store_meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row['value'] if row else None
+
+    def _commit(self, batches: List[PendingWrite]) -> None:
+        """Inserts every batch in one transaction (see GroupCommit).
+
+        Each batch runs in its own savepoint, so a batch with a bad
+        record fails alone without undoing the others.
+        """
+        conn = self._connect()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for batch in batches:
+                    conn.execute("SAVEPOINT batch")
+                    try:
+                        cursor = conn.executemany(_INSERT, batch.records)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO batch")
+                        batch.error = e
+                    else:
+                        batch.written = cursor.rowcount
+                        batch.last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                    conn.execute("RELEASE batch")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    @traced("history.append")
+    def append(self, record: Dict) -> Dict:
+        record = normalize_record(record)
+        committed = self._group_commit.submit([record])
+        return {'id': committed.last_id, **record}
+
+    @traced("history.append_many")
+    def append_many(self, records: Iterable[Dict]) -> int:
+        return self._group_commit.submit(normalize_record(r) for r in records).written
+
+    @traced("history.count")
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM transcriptions").fetchone()[0]
+
+    def iter_records(self) -> Iterator[Dict]:
+        return self._stream("ORDER BY id")
+
+    def iter_records_after(self, after_id: int) -> Iterator[Dict]:
+        return self._stream("WHERE id > ? ORDER BY id", (after_id,))
+
+    def export(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict]:
+        start, end = time_bound(start), time_bound(end, end=True)
+        if not (start or end):
+            return self.iter_records()
+        clauses, params = [], []
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            clauses.append("timestamp <= ?")
+            params.append(end)
+        # Range scan on the (timestamp, id) index, already in order
+        return self._stream(f"WHERE {' AND '.join(clauses)} ORDER BY timestamp, id", tuple(params))
+
+    def _stream(self, clauses: str, params: tuple = ()) -> Iterator[Dict]:
+        """Yields rows of a query in batches of _FETCH_SIZE.
+
+        A dedicated connection keeps long exports from sharing a cursor;
+        it may be advanced from different threads, one at a time.
+        """
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.execute(f"SELECT {_COLUMNS} FROM transcriptions {clauses}", params)
+            while True:
+                rows = cursor.fetchmany(_FETCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            conn.close()
+
+    @traced("history.latest")
+    def latest(
+        self,
+        limit: int = 10,
+        search: Optional[str] = None,
+        filename: Optional[str] = None
+    ) -> List[Dict]:
+        clauses, params = [], []
+        if search:
+            match = build_match_query(search)
+            if not match:
+                return []
+            clauses.append(
+                "id IN (SELECT rowid FROM transcriptions_fts WHERE transcriptions_fts MATCH ?)"
+            )
+            params.append(match)
+        if filename:
+            clauses.append("filename = ?")
+            params.append(filename)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT {_COLUMNS} FROM transcriptions {where} "
+            f"ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    @traced("history.page")
+    def page(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        model: Optional[str] = None,
+        filename_prefix: Optional[str] = None,
+        search: Optional[str] = None,
+        filename: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        # Every bound is on the (timestamp, id) index, so a page walks the
+        # index from the cursor and reads at most limit + 1 matching rows
+        clauses, params = [], []
+        if cursor:
+            clauses.append("(timestamp, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        start, end = time_bound(start), time_bound(end, end=True)
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            clauses.append("timestamp <= ?")
+            params.append(end)
+        if model:
+            clauses.append("model = ?")
+            params.append(model)
+        if filename_prefix:
+            clauses.append("substr(filename, 1, ?) = ?")
+            params.extend((len(filename_prefix), filename_prefix))
+        if filename:
+            clauses.append("filename = ?")
+            params.append(filename)
+        if search:
+            match = build_match_query(search)
+            if not match:
+                return [], None
+            clauses.append(
+                "id IN (SELECT rowid FROM transcriptions_fts WHERE transcriptions_fts MATCH ?)"
+            )
+            params.append(match)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT {_COLUMNS} FROM transcriptions {where} "
+            f"ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+        return split_page([dict(row) for row in rows], limit)
+
+    @traced("history.search")
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        filename: Optional[str] = None
+    ) -> List[Dict]:
+        match = build_match_query(query)
+        if not match:
+            return []
+        filename_clause = "AND t.filename = ?" if filename else ""
+        params = (match, filename, limit) if filename else (match, limit)
+        # bm25() is lower for better matches; ties go to the newest row
+        rows = self._connect().execute(
+            f"SELECT t.id, t.timestamp, t.filename, t.duration_seconds, t.model, "
+            f"t.transcription_text, -bm25(transcriptions_fts) AS score "
+            f"FROM transcriptions_fts JOIN transcriptions t ON t.id = transcriptions_fts.rowid "
+            f"WHERE transcriptions_fts MATCH ? {filename_clause} "
+            f"ORDER BY bm25(transcriptions_fts), t.id DESC LIMIT ?",
+            params
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    @traced("history.summary")
+    def summary(self, recent: int = 5) -> Dict:
+        conn = self._connect()
+        buckets = {}
+        for table, key in (('stats_models', 'model'), ('stats_days', 'day')):
+            buckets[table] = {
+                row[key]: {
+                    'count': row['count'],
+                    'total_duration': row['total_duration'],
+                    'timed_count': row['timed_count']
+                }
+                for row in conn.execute(f"SELECT {key}, count, total_duration, timed_count FROM {table}")
+            }
+        recent_files = [row['filename'] for row in self.latest(recent)] if recent > 0 else []
+        return build_summary(buckets['stats_models'], buckets['stats_days'], recent_files)
+
+    def rebuild_stats(self) -> Dict:
+        conn = self._connect()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in _REBUILD_STATS.strip().split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return self.summary()
+
+    def migrate_from_csv(self, csv_path: Union[str, Path]) -> int:
+        """One-shot import of a legacy history CSV.
+
+        The migration is recorded in `store_meta`, so later calls are
+        no-ops even if the CSV keeps existing next to the database.
+        Returns the number of rows imported.
+        """
+        csv_path = Path(csv_path)
+        conn = self._connect()
+        with self._write_lock:
+            # IMMEDIATE takes the write lock up front so two processes
+            # starting together cannot both run the migration
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                migrated = conn.execute(
+                    "SELECT value FROM store_meta WHERE key = 'csv_migrated_from'"
+                ).fetchone()
+                if migrated is not None:
+                    conn.rollback()
+                    return 0
+                imported = 0
+                if csv_path.exists():
+                    # rowcount, not total_changes: the FTS triggers add changes too
+                    imported = conn.executemany(_INSERT, read_csv_records(csv_path)).rowcount
+                conn.execute(
+                    "INSERT INTO store_meta (key, value) VALUES ('csv_migrated_from', ?)",
+                    (str(csv_path),)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return imported
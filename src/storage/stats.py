@@ -0,0 +1,79 @@
+"""Running aggregates of the transcription history served by /stats.
+
+Aggregates are updated record by record as rows are stored, so reading
+them costs the same no matter how large the history is.
+"""
+
+import bisect
+import os
+from typing import Dict, List, Tuple
+
+# Filenames kept in the recent-files ring buffer
+RECENT_FILES = int(os.getenv("STATS_RECENT_FILES", 10))
+
+
+def _bucket() -> Dict:
+    return {'count': 0, 'total_duration': 0.0, 'timed_count': 0}
+
+
+def _add_to_bucket(bucket: Dict, duration) -> None:
+    bucket['count'] += 1
+    if duration is not None:
+        bucket['total_duration'] += duration
+        bucket['timed_count'] += 1
+
+
+def breakdown(bucket: Dict) -> Dict:
+    """Public view of an aggregate bucket: count, total and average duration."""
+    timed = bucket['timed_count']
+    return {
+        'count': bucket['count'],
+        'total_duration_seconds': round(bucket['total_duration'], 2),
+        'average_duration_seconds': round(bucket['total_duration'] / timed, 2) if timed else 0
+    }
+
+
+def build_summary(models: Dict[str, Dict], days: Dict[str, Dict], recent: List[str]) -> Dict:
+    """Assembles HistoryStore.summary() from per-model and per-day buckets."""
+    return {
+        'count': sum(b['count'] for b in models.values()),
+        'total_duration': sum(b['total_duration'] for b in models.values()),
+        'timed_count': sum(b['timed_count'] for b in models.values()),
+        'model_counts': {model: b['count'] for model, b in models.items()},
+        'by_model': {model: breakdown(b) for model, b in sorted(models.items())},
+        'by_day': {day: breakdown(b) for day, b in sorted(days.items())},
+        'recent_files': recent
+    }
+
+
+class HistoryStats:
+    """Aggregates of a history kept up to date with `add()`.
+
+    Tracks totals per model and per day (YYYY-MM-DD) plus a ring buffer
+    with the newest `recent_size` files, ordered by (timestamp, id) so
+    rows imported out of time order land in the right place.
+    """
+
+    def __init__(self, recent_size: int = RECENT_FILES):
+        self.recent_size = recent_size
+        self.models: Dict[str, Dict] = {}
+        self.days: Dict[str, Dict] = {}
+        self._recent: List[Tuple[str, int, str]] = []
+
+    def add(self, record: Dict) -> None:
+        duration = record['duration_seconds']
+        _add_to_bucket(self.models.setdefault(record['model'], _bucket()), duration)
+        _add_to_bucket(self.days.setdefault(record['timestamp'][:10], _bucket()), duration)
+
+        key = (record['timestamp'], record['id'], record['filename'])
+        if len(self._recent) < self.recent_size or key > self._recent[0]:
+            bisect.insort(self._recent, key)
+            if len(self._recent) > self.recent_size:
+                self._recent.pop(0)
+
+    def recent_files(self, limit: int) -> List[str]:
+        """Newest filenames first (at most `recent_size`)."""
+        return [filename for _, _, filename in reversed(self._recent[-limit:])] if limit > 0 else []
+
+    def summary(self, recent: int = 5) -> Dict:
+        return build_summary(self.models, self.days, self.recent_files(recent))
@@ -0,0 +1,276 @@
+"""Live transcription through Deepgram's streaming API (/v1/listen over WebSocket).
+
+The API server's /stream endpoint relays a client's audio to a
+`DeepgramStream` as it arrives and sends every result back as soon as
+Deepgram produces it: interim hypotheses while a phrase is being
+spoken, then the final text of each stretch of audio. Nothing is
+buffered on the way in or out, so the latency is Deepgram's own.
+
+    async with DeepgramStream(language="es") as stream:
+        await stream.send(chunk)       # while audio is captured (one task)
+        await stream.finish()          # no more audio
+        async for result in stream:    # interim and final results (another task)
+            ...
+    stream.transcript                  # the final results, joined
+
+Connection failures count against the same circuit breaker as the
+pre-recorded clients (see deepgram_client.py). Needs the `websockets`
+package, imported on first use.
+
+Configuration (environment variables):
+- DEEPGRAM_API_KEY: API key (required)
+- DEEPGRAM_STREAM_URL: base URL of the streaming API (default: DEEPGRAM_API_URL
+  with a ws:// or wss:// scheme)
+- DEEPGRAM_KEEPALIVE_SECONDS: pause in the audio after which a KeepAlive is sent
+  (default: 5; Deepgram closes streams that get nothing for 10 seconds)
+- STREAM_IDLE_TIMEOUT_SECONDS: /stream ends a session whose client sends
+  nothing for this long (default: 30)
+"""
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlencode
+
+from .deepgram_client import (
+    DEFAULT_API_URL,
+    CircuitBreaker,
+    DeepgramError,
+    _api_error,
+    _listen_params,
+    get_circuit_breaker,
+)
+
+STREAM_IDLE_TIMEOUT = float(os.getenv("STREAM_IDLE_TIMEOUT_SECONDS", 30))
+
+# Text messages a client sends to say the audio is over
+STOP_MESSAGES = ("stop", "CloseStream")
+
+
+@dataclass
+class StreamResult:
+    """Transcript of a stretch of audio. `start`/`duration` are seconds of audio."""
+
+    text: str
+    is_final: bool
+    speech_final: bool = False
+    start: float = 0.0
+    duration: float = 0.0
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+    def to_dict(self) -> Dict:
+        return {
+            "type": "final" if self.is_final else "interim",
+            "text": self.text,
+            "start": round(self.start, 3),
+            "duration": round(self.duration, 3),
+            "speech_final": self.speech_final
+        }
+
+
+def parse_result(message: Dict) -> Optional[StreamResult]:
+    """The result in a Deepgram "Results" message (None for other messages)."""
+    if message.get("type") != "Results":
+        return None
+    alternatives = (message.get("channel") or {}).get("alternatives") or [{}]
+    return StreamResult(
+        text=(alternatives[0].get("transcript") or "").strip(),
+        is_final=bool(message.get("is_final")),
+        speech_final=bool(message.get("speech_final")),
+        start=float(message.get("start") or 0.0),
+        duration=float(message.get("duration") or 0.0)
+    )
+
+
+def stream_url(base_url: Optional[str] = None) -> str:
+    """WebSocket base URL of the streaming API."""
+    url = (base_url or os.getenv("DEEPGRAM_STREAM_URL") or os.getenv("DEEPGRAM_API_URL", DEFAULT_API_URL)).rstrip('/')
+    if url.startswith("https://"):
+        return "wss://" + url[len("https://"):]
+    if url.startswith("http://"):
+        return "ws://" + url[len("http://"):]
+    return url
+
+
+class DeepgramStream:
+    """One live transcription session.
+
+    `send` and `finish` are called by the task that receives the audio;
+    iterating the stream yields results until Deepgram closes it after
+    `finish`. A stream that ends abnormally raises DeepgramError.
+    """
+
+    def __init__(
+        self,
+        model: str = "nova-2",
+        language: Optional[str] = None,
+        encoding: Optional[str] = None,
+        sample_rate: Optional[int] = None,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        keepalive: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None
+    ):
+        self.model = model
+        self.language = language
+        self.encoding = encoding
+        self.sample_rate = sample_rate
+        self.api_key = api_key if api_key is not None else os.getenv("DEEPGRAM_API_KEY")
+        self.url = stream_url(base_url)
+        self.keepalive = keepalive or float(os.getenv("DEEPGRAM_KEEPALIVE_SECONDS", 5))
+        self.connect_timeout = connect_timeout or float(os.getenv("DEEPGRAM_CONNECT_TIMEOUT_SECONDS", 10))
+        self.circuit_breaker = circuit_breaker or get_circuit_breaker()
+        self.finals: List[str] = []
+        self.audio_seconds = 0.0
+        self._connection = None
+        self._keepalive_task: Optional[asyncio.Task] = None
+        self._last_sent = 0.0
+        self._finished = False
+
+    @property
+    def transcript(self) -> str:
+        return " ".join(self.finals)
+
+    def _params(self) -> Dict[str, str]:
+        params = {**_listen_params(self.model, self.language), "interim_results": "true", "punctuate": "true"}
+        if self.encoding:
+            params["encoding"] = self.encoding
+        if self.sample_rate:
+            params["sample_rate"] = str(self.sample_rate)
+        return params
+
+    async def __aenter__(self) -> "DeepgramStream":
+        if not self.api_key:
+            raise DeepgramError("DEEPGRAM_API_KEY not configured")
+        try:
+            from websockets.asyncio.client import connect
+            from websockets.exceptions import InvalidStatus, WebSocketException
+        except ImportError as e:
+            raise DeepgramError("Live transcription requires websockets (pip install websockets)") from e
+
+        with self.circuit_breaker.guard():
+            try:
+                self._connection = await connect(
+                    f"{self.url}/v1/listen?{urlencode(self._params())}",
+                    additional_headers={"Authorization": f"Token {self.api_key}"},
+                    open_timeout=self.connect_timeout,
+                    max_size=None
+                )
+            except InvalidStatus as e:
+                status = e.response.status_code
+                raise _api_error(status, e.response.body.decode('utf-8', errors='replace')) from e
+            except (OSError, asyncio.TimeoutError, WebSocketException) as e:
+                raise DeepgramError(f"Deepgram stream failed: {e}") from e
+
+        self._last_sent = time.monotonic()
+        self._keepalive_task = asyncio.create_task(self._keep_alive())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._stop_keepalive()
+        if self._connection is not None:
+            await self._connection.close()
+
+    def _stop_keepalive(self) -> None:
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+
+    async def _send(self, message) -> None:
+        from websockets.exceptions import ConnectionClosed
+        try:
+            await self._connection.send(message)
+        except ConnectionClosed as e:
+            raise DeepgramError(f"Deepgram stream closed: {e}") from e
+        self._last_sent = time.monotonic()
+
+    async def send(self, chunk: bytes) -> None:
+        """Forwards a chunk of audio."""
+        if self._finished:
+            raise DeepgramError("Audio sent after the end of the stream")
+        await self._send(chunk)
+
+    async def finish(self) -> None:
+        """No more audio: Deepgram sends the last results and closes the stream."""
+        if self._finished:
+            return
+        self._finished = True
+        self._stop_keepalive()
+        try:
+            await self._send(json.dumps({"type": "CloseStream"}))
+        except DeepgramError:
+            pass
+
+    async def _keep_alive(self) -> None:
+        """Keeps the stream open through pauses in the audio."""
+        try:
+            while True:
+                idle = time.monotonic() - self._last_sent
+                if idle >= self.keepalive:
+                    await self._send(json.dumps({"type": "KeepAlive"}))
+                    idle = 0.0
+                await asyncio.sleep(self.keepalive - idle)
+        except DeepgramError:
+            pass
+
+    async def __aiter__(self) -> AsyncIterator[StreamResult]:
+        from websockets.exceptions import ConnectionClosedError
+        try:
+            async for raw in self._connection:
+                if isinstance(raw, bytes):
+                    continue
+                message = json.loads(raw)
+                if message.get("type") == "Metadata":
+                    self.audio_seconds = max(self.audio_seconds, float(message.get("duration") or 0.0))
+                result = parse_result(message)
+                if result is None:
+                    continue
+                self.audio_seconds = max(self.audio_seconds, result.end)
+                if result.is_final and result.text:
+                    self.finals.append(result.text)
+                yield result
+        except ConnectionClosedError as e:
+            reason = f"{e.rcvd.code} {e.rcvd.reason}".strip() if e.rcvd else "connection lost"
+            raise DeepgramError(f"Deepgram stream closed: {reason}") from e
+
+
+async def forward_audio(websocket, stream: DeepgramStream, idle_timeout: float = STREAM_IDLE_TIMEOUT) -> str:
+    """Sends a client's audio (binary WebSocket messages) to `stream`.
+
+    Stops when the client sends a stop message, disconnects or sends
+    nothing for `idle_timeout` seconds, and then finishes the stream so
+    Deepgram delivers the last results. Returns why it stopped: "stop",
+    "disconnect", "idle" or "error" (Deepgram went away).
+    """
+    reason = "stop"
+    try:
+        while True:
+            message = await asyncio.wait_for(websocket.receive(), idle_timeout)
+            if message["type"] == "websocket.disconnect":
+                reason = "disconnect"
+                break
+            if message.get("bytes"):
+                await stream.send(message["bytes"])
+            elif message.get("text") and _is_stop(message["text"]):
+                break
+    except asyncio.TimeoutError:
+        reason = "idle"
+    except DeepgramError:
+        reason = "error"
+    finally:
+        await stream.finish()
+    return reason
+
+
+def _is_stop(text: str) -> bool:
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return text.strip() in STOP_MESSAGES
+    return isinstance(message, dict) and message.get("type") in STOP_MESSAGES
@@ -1,14 +1,12 @@
 """Tool for managing transcription history in CSV format."""
 
-import os
-import csv
-from typing import Type, Optional, List
-from datetime import datetime
-from pathlib import Path
+from typing import Type, Optional
 
-import pandas as pd
 from langchain.tools import BaseTool
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+from ..concurrency import run_blocking
+from ..storage import HistoryStore, create_history_store, get_history_store
 
 
 class SaveTranscriptionInput(BaseModel):
@@ -45,27 +43,25 @@ class HistoryTool(BaseTool):
         "To query: optionally provide a search term and result limit."
     )
 
-    csv_path: str = Field(default="data/transcriptions/output/history.csv")
+    csv_path: Optional[str] = Field(default=None)
+
+    _store: Optional[HistoryStore] = PrivateAttr(default=None)
 
-    def __init__(self, csv_path: str = "data/transcriptions/output/history.csv"):
+    def __init__(self, csv_path: Optional[str] = None, store: Optional[HistoryStore] = None):
+        """Uses `store` if given, a store of its own for an explicit `csv_path`,
+        and otherwise the process-wide store (see `get_history_store`)."""
         super().__init__()
         self.csv_path = csv_path
-        self._initialize_csv()
-
-    def _initialize_csv(self):
-        """Creates the CSV file with headers if it doesn't exist."""
-        csv_file = Path(self.csv_path)
-        csv_file.parent.mkdir(parents=True, exist_ok=True)
-
-        if not csv_file.exists():
-            df = pd.DataFrame(columns=[
-                'timestamp',
-                'filename',
-                'duration_seconds',
-                'model',
-                'transcription_text'
-            ])
-            df.to_csv(self.csv_path, index=False, encoding='utf-8')
+        if store is not None:
+            self._store = store
+        elif csv_path is not None:
+            # Creates the CSV file (or database, see HISTORY_BACKEND) if it doesn't exist
+            self._store = create_history_store(csv_path=csv_path)
+
+    @property
+    def store(self) -> HistoryStore:
+        """History store used to save and query transcriptions."""
+        return self._store if self._store is not None else get_history_store()
 
     def save_transcription(
         self,
@@ -76,29 +72,13 @@ class HistoryTool(BaseTool):
     ) -> str:
         """Saves a new transcription to the CSV."""
         try:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-            new_row = {
-                'timestamp': timestamp,
-                'filename': filename,
-                'duration_seconds': duration if duration else '',
-                'model': model,
-                'transcription_text': text
-            }
+            # Append the new row without rewriting the history
+            record = self.store.save(filename, text, duration if duration else None, model)
 
-            # Read existing CSV
-            df = pd.read_csv(self.csv_path, encoding='utf-8')
-
-            # Add new row
-            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-
-            # Save
-            df.to_csv(self.csv_path, index=False, encoding='utf-8')
-
-            total_transcriptions = len(df)
+            total_transcriptions = record['id']
             return (
                 f"Transcription saved successfully to history.\n"
-                f"Timestamp: {timestamp}\n"
+                f"Timestamp: {record['timestamp']}\n"
                 f"Total transcriptions in history: {total_transcriptions}"
             )
 
@@ -112,31 +92,22 @@ class HistoryTool(BaseTool):
     ) -> str:
         """Queries the transcription history."""
         try:
-            df = pd.read_csv(self.csv_path, encoding='utf-8')
+            # Latest matches, filtered if search term provided
+            rows = self.store.latest(limit, search)
 
-            if len(df) == 0:
-                return "History is empty. No transcriptions saved."
-
-            # Filter if search term provided
-            if search:
-                mask = df['transcription_text'].str.contains(
-                    search,
-                    case=False,
-                    na=False
-                )
-                df = df[mask]
-
-                if len(df) == 0:
+            if len(rows) == 0:
+                if search and self.store.count() > 0:
                     return f"No transcriptions found containing '{search}'."
+                return "History is empty. No transcriptions saved."
 
-            # Limit results
-            df = df.tail(limit)
+            # Show oldest to newest
+            rows.reverse()
 
             # Format results
-            result = f"Transcription history (showing last {len(df)}):\n\n"
+            result = f"Transcription history (showing last {len(rows)}):\n\n"
 
-            for idx, row in df.iterrows():
-                duration_str = f"{row['duration_seconds']:.1f}s" if pd.notna(row['duration_seconds']) else "N/A"
+            for row in rows:
+                duration_str = f"{row['duration_seconds']:.1f}s" if row['duration_seconds'] is not None else "N/A"
                 text_preview = row['transcription_text'][:100] + "..." if len(row['transcription_text']) > 100 else row['transcription_text']
 
                 result += f"""
@@ -149,7 +120,7 @@ Text: {text_preview}
 """
 
             result += f"\n{'='*60}\n"
-            result += f"Total transcriptions found: {len(df)}"
+            result += f"Total transcriptions found: {len(rows)}"
 
             return result
 
@@ -174,8 +145,8 @@ Text: {text_preview}
             return self.query_history()
 
     async def _arun(self, *args, **kwargs) -> str:
-        """Asynchronous version."""
-        return self._run(*args, **kwargs)
+        """Asynchronous version: history I/O runs in the blocking pool."""
+        return await run_blocking(self._run, *args, **kwargs)
 
 
 # Specific tools for better agent integration
@@ -190,6 +161,13 @@ class SaveTranscriptionTool(BaseTool):
     )
     args_schema: Type[BaseModel] = SaveTranscriptionInput
 
+    _history: HistoryTool = PrivateAttr()
+
+    def __init__(self, store: Optional[HistoryStore] = None, **kwargs):
+        """Saves to `store`, or to the process-wide history store by default."""
+        super().__init__(**kwargs)
+        self._history = HistoryTool(store=store)
+
     def _run(
         self,
         filename: str,
@@ -197,11 +175,10 @@ class SaveTranscriptionTool(BaseTool):
         model: str = "whisper-base",
         duration: Optional[float] = None
     ) -> str:
-        history = HistoryTool()
-        return history.save_transcription(filename, text, model, duration)
+        return self._history.save_transcription(filename, text, model, duration)
 
     async def _arun(self, *args, **kwargs) -> str:
-        return self._run(*args, **kwargs)
+        return await run_blocking(self._run, *args, **kwargs)
 
 
 class QueryHistoryTool(BaseTool):
@@ -215,13 +192,19 @@ class QueryHistoryTool(BaseTool):
     )
     args_schema: Type[BaseModel] = QueryHistoryInput
 
+    _history: HistoryTool = PrivateAttr()
+
+    def __init__(self, store: Optional[HistoryStore] = None, **kwargs):
+        """Queries `store`, or the process-wide history store by default."""
+        super().__init__(**kwargs)
+        self._history = HistoryTool(store=store)
+
     def _run(
         self,
         search: Optional[str] = None,
         limit: int = 10
     ) -> str:
-        history = HistoryTool()
-        return history.query_history(search, limit)
+        return self._history.query_history(search, limit)
 
     async def _arun(self, *args, **kwargs) -> str:
-        return self._run(*args, **kwargs)
+        return await run_blocking(self._run, *args, **kwargs)
@@ -1,14 +1,16 @@
 """Tool for transcribing audio files using Deepgram API."""
 
 import os
-from typing import Type, Optional
-from datetime import datetime
+from typing import Optional, Tuple, Type
 from pathlib import Path
 
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 
-import requests
+from ..chunking import should_chunk, transcribe_chunked, transcribe_chunked_sync
+from ..concurrency import run_blocking
+from ..deepgram_client import DeepgramError, get_async_client, get_client
+from ..transcription_cache import transcribe_cached, transcribe_cached_sync
 
 
 class TranscribeAudioInput(BaseModel):
@@ -27,6 +29,10 @@ class TranscribeAudioInput(BaseModel):
         description="Language code (e.g., 'es' for Spanish, 'en' for English). "
                     "If not specified, language will be auto-detected"
     )
+    chunked: Optional[bool] = Field(
+        default=None,
+        description="Transcribe in parallel segments. By default only long recordings are split"
+    )
 
 
 
@@ -46,12 +52,43 @@ class TranscribeAudioTool(BaseTool):
         self,
         audio_file: str,
         model: str = "nova-2",
-        language: Optional[str] = None
+        language: Optional[str] = None,
+        chunked: Optional[bool] = None
     ) -> str:
         """Executes the audio file transcription using Deepgram API."""
+        audio_path = Path(audio_file)
+        error = self._validate(audio_path, audio_file, model)
+        if error:
+            return error
 
-        # Validate that the file exists
+        try:
+            return self._transcribe_with_deepgram(audio_path, model, language, chunked)
+        except Exception as e:
+            return f"Error during transcription: {str(e)}"
+
+    async def _arun(
+        self,
+        audio_file: str,
+        model: str = "nova-2",
+        language: Optional[str] = None,
+        chunked: Optional[bool] = None
+    ) -> str:
+        """Asynchronous transcription: Deepgram is called through the shared
+        async client and file hashing and cache lookups run in the blocking
+        pool, so the event loop is never blocked."""
         audio_path = Path(audio_file)
+        error = self._validate(audio_path, audio_file, model)
+        if error:
+            return error
+
+        try:
+            return await self._atranscribe_with_deepgram(audio_path, model, language, chunked)
+        except Exception as e:
+            return f"Error during transcription: {str(e)}"
+
+    def _validate(self, audio_path: Path, audio_file: str, model: str) -> Optional[str]:
+        """Error message for a missing file, unsupported format or model, or None."""
+        # Validate that the file exists
         if not audio_path.exists():
             return f"Error: The file '{audio_file}' does not exist."
 
@@ -70,68 +107,131 @@ class TranscribeAudioTool(BaseTool):
                 f"Error: Invalid model '{model}'. "
                 f"Available Deepgram models: {', '.join(valid_models)}"
             )
+        return None
 
+    def _transcribe_with_deepgram(
+        self,
+        audio_path: Path,
+        model: str,
+        language: Optional[str],
+        chunked: Optional[bool] = None
+    ) -> str:
+        """Transcribe using Deepgram API."""
+        error = self._start(audio_path, model)
+        if error:
+            return error
+
+        # Configure language for Deepgram
+        language_code = language if language else "auto"
+        segments = 1
+
+        def transcribe(path: Path) -> str:
+            nonlocal segments
+            # Shared pooled client: timeouts, retries with backoff, circuit breaker
+            client = get_client()
+            if should_chunk(path, chunked):
+                text, segments = transcribe_chunked_sync(
+                    path, lambda segment: client.transcribe_file(segment, model, language_code)[0]
+                )
+                return text
+            return client.transcribe_file(path, model, language_code)[0]
+
+        # Identical audio with the same model/language reuses the cached transcript
         try:
-            return self._transcribe_with_deepgram(audio_path, model, language)
-        except Exception as e:
-            return f"Error during transcription: {str(e)}"
+            result = transcribe_cached_sync(audio_path, language_code, transcribe, model=model)
+        except DeepgramError as e:
+            return f"Error: {str(e)}"
+        return self._response(audio_path, model, language, result, segments)
 
-    def _transcribe_with_deepgram(self, audio_path: Path, model: str, language: Optional[str]) -> str:
-        """Transcribe using Deepgram API."""
+    async def _atranscribe_with_deepgram(
+        self,
+        audio_path: Path,
+        model: str,
+        language: Optional[str],
+        chunked: Optional[bool] = None
+    ) -> str:
+        """Async counterpart of `_transcribe_with_deepgram`."""
+        error = self._start(audio_path, model)
+        if error:
+            return error
+
+        language_code = language if language else "auto"
+        segments = 1
+
+        async def transcribe_segment(segment_path: Path) -> str:
+            segment_text, _ = await get_async_client().transcribe_file(segment_path, model, language_code)
+            return segment_text
+
+        async def transcribe(path: Path) -> str:
+            nonlocal segments
+            if await run_blocking(should_chunk, path, chunked):
+                text, segments = await transcribe_chunked(path, transcribe_segment)
+                return text
+            return await transcribe_segment(path)
+
+        try:
+            result = await transcribe_cached(audio_path, language_code, transcribe, model=model)
+        except DeepgramError as e:
+            return f"Error: {str(e)}"
+        return self._response(audio_path, model, language, result, segments)
+
+    @staticmethod
+    def _start(audio_path: Path, model: str) -> Optional[str]:
+        """Loads the environment and announces the transcription; returns
+        an error message if the Deepgram key is missing."""
         from dotenv import load_dotenv
         load_dotenv()
 
-        api_key = os.getenv("DEEPGRAM_API_KEY")
-        if not api_key:
+        if not os.getenv("DEEPGRAM_API_KEY"):
             return "Error: DEEPGRAM_API_KEY not configured in environment variables."
 
         print(f"Transcribing '{audio_path.name}' with Deepgram API (model: {model})...")
+        return None
 
-        headers = {
-            "Authorization": f"Token {api_key}",
-            "Content-Type": "audio/*"
-        }
-
-        # Configure language for Deepgram
+    def _response(
+        self,
+        audio_path: Path,
+        model: str,
+        language: Optional[str],
+        result: Tuple[str, float, bool],
+        segments: int
+    ) -> str:
+        """Formats a (transcription, seconds, cached) result of the cache helpers."""
+        text, processing_duration, cached = result
         language_code = language if language else "auto"
-
-        start_time = datetime.now()
-        with open(audio_path, 'rb') as audio_file:
-            response = requests.post(
-                f"https://api.deepgram.com/v1/listen?model={model}&language={language_code}",
-                headers=headers,
-                data=audio_file
+        if cached:
+            return self._format_response(
+                audio_path.name, f'deepgram-{model}', language_code,
+                processing_duration, text, cached=True
             )
-        end_time = datetime.now()
-
-        if response.status_code != 200:
-            return f"Error from Deepgram API: {response.status_code} - {response.text}"
-
-        result = response.json()
-        processing_duration = (end_time - start_time).total_seconds()
+        detected_language = language_code if language != "auto" else "auto-detected"
+        return self._format_response(
+            audio_path.name, f'deepgram-{model}', detected_language, processing_duration, text,
+            segments=segments
+        )
 
-        # Extract transcript from Deepgram response
-        try:
-            text = result.get('results', {}).get('channels', [{}])[0].get('alternatives', [{}])[0].get('transcript', '').strip()
-            detected_language = language_code if language != "auto" else "auto-detected"
-        except (IndexError, KeyError):
-            return "Error parsing Deepgram API response"
-
-        return self._format_response(audio_path.name, f'deepgram-{model}', detected_language, processing_duration, text)
-
-    def _format_response(self, filename: str, model: str, language: str, duration: float, text: str) -> str:
+    def _format_response(
+        self,
+        filename: str,
+        model: str,
+        language: str,
+        duration: float,
+        text: str,
+        cached: bool = False,
+        segments: int = 1
+    ) -> str:
         """Format the transcription response."""
+        source = "cache (identical audio transcribed before)" if cached else "Deepgram API"
+        if segments > 1:
+            source += f" ({segments} segments in parallel)"
         return f"""Transcription completed successfully:
 
 File: {filename}
 Model used: {model}
 Detected language: {language}
 Processing time: {duration:.2f} seconds
+Source: {source}
 
 Transcribed text:
 {text}
 """
-
-    async def _arun(self, *args, **kwargs) -> str:
-        """Asynchronous version (not implemented, uses synchronous version)."""
-        return self._run(*args, **kwargs)
@@ -0,0 +1,345 @@
+"""Lightweight request tracing.
+
+An HTTP request is traced when the client sends the debug header
+(`X-Debug-Timings: 1`) or when traces are exported (TRACE_EXPORT). Code
+marks its stages with `span(name)`: every stage measured for /metrics
+(upload write, Deepgram transcription, history save, LLM call), each
+agent tool run and the history store operations open one. Spans are
+timed with the monotonic clock, get random ids and nest through context
+variables, so they follow requests into `run_blocking` threads and
+`asyncio.gather` tasks. Outside a trace `span()` costs one context
+variable lookup.
+
+With the debug header the response carries a `Server-Timing` header
+and an `X-Trace-Id`, and /upload, /upload/batch and /agent (details)
+add a `timings` breakdown to their JSON.
+
+Export (TRACE_EXPORT), done by a background thread off the request path:
+- file:<path>: one OTLP/JSON ExportTraceServiceRequest per line
+- otlp or otlp:<url>: POST to an OpenTelemetry collector's OTLP/HTTP
+  endpoint (default http://localhost:4318/v1/traces)
+
+Configuration (environment variables):
+- TRACE_EXPORT: export target (default: none, traces only for the debug header)
+- TRACE_SAMPLE_RATIO: fraction of requests traced for export (default: 1.0)
+- TRACE_DEBUG_HEADER: request header asking for timings (default: X-Debug-Timings)
+"""
+
+import functools
+import json
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", 1.0))
+TRACE_DEBUG_HEADER = os.getenv("TRACE_DEBUG_HEADER", "X-Debug-Timings").lower().encode("latin-1")
+
+DEFAULT_OTLP_URL = "http://localhost:4318/v1/traces"
+SERVICE_NAME = "transcription-api"
+
+# Traces waiting to be exported; more are dropped rather than slowing requests
+_EXPORT_QUEUE_SIZE = 1000
+_EXPORT_BATCH = 50
+
+
+@dataclass
+class Span:
+    """One timed operation. `start`/`end` are perf_counter() values."""
+
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    end: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+class Trace:
+    """Spans of one request. `debug` traces return their timings to the client."""
+
+    def __init__(self, name: str, debug: bool = False, **attributes):
+        self.trace_id = secrets.token_hex(16)
+        self.debug = debug
+        self.start = time.perf_counter()
+        self.start_unix_ns = time.time_ns()
+        self.root = Span(name, secrets.token_hex(8), None, self.start, attributes=attributes)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def _ms(self, seconds: float) -> float:
+        return round(seconds * 1000, 3)
+
+    def timings(self) -> Dict:
+        """Total time so far, time per stage and every finished span.
+
+        `stages` adds up the spans of each name (parallel tool runs can
+        add up to more than the total); span `start_ms` is relative to
+        the start of the request.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        stages: Dict[str, float] = {}
+        for span in spans:
+            stages[span.name] = stages.get(span.name, 0.0) + span.end - span.start
+        return {
+            "trace_id": self.trace_id,
+            "total_ms": self._ms((self.root.end or now) - self.start),
+            "stages": {name: self._ms(seconds) for name, seconds in stages.items()},
+            "spans": [
+                {
+                    "name": span.name,
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "start_ms": self._ms(span.start - self.start),
+                    "duration_ms": self._ms(span.end - span.start),
+                    **({"error": span.error} if span.error else {}),
+                    **({"attributes": span.attributes} if span.attributes else {})
+                }
+                for span in spans
+            ]
+        }
+
+    def _unix_nanos(self, perf: float) -> str:
+        return str(self.start_unix_ns + int((perf - self.start) * 1e9))
+
+    def to_otlp(self) -> List[Dict]:
+        """Spans (root included) in the OTLP/JSON span format."""
+        with self._lock:
+            spans = [self.root] + list(self.spans)
+        return [
+            {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                "name": span.name,
+                "kind": 2 if span is self.root else 1,  # SERVER / INTERNAL
+                "startTimeUnixNano": self._unix_nanos(span.start),
+                "endTimeUnixNano": self._unix_nanos(span.end if span.end is not None else span.start),
+                "attributes": [
+                    {"key": key, "value": {"stringValue": str(value)}}
+                    for key, value in span.attributes.items()
+                ],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 0}
+            }
+            for span in spans
+        ]
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_timings() -> Optional[Dict]:
+    """Timings of the current request if the client asked for them, else None."""
+    trace = _current_trace.get()
+    return trace.timings() if trace is not None and trace.debug else None
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Times the block as a child of the current span (no-op outside a trace)."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get() or trace.root
+    current = Span(name, secrets.token_hex(8), parent.span_id, time.perf_counter(), attributes=attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+        trace.add(current)
+
+
+def traced(name: str):
+    """Decorator: runs the function inside `span(name)` when a trace is active."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def trace(name: str, debug: bool = False, **attributes) -> Iterator[Trace]:
+    """Runs the block as a new trace; exports it when it ends (if configured)."""
+    current = Trace(name, debug=debug, **attributes)
+    trace_token = _current_trace.set(current)
+    span_token = _current_span.set(current.root)
+    try:
+        yield current
+    except Exception as e:
+        current.root.error = type(e).__name__
+        raise
+    finally:
+        current.root.end = time.perf_counter()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        exporter = get_exporter()
+        if exporter is not None:
+            exporter.export(current)
+
+
+class SpanExporter:
+    """Sends finished traces to a JSON-lines file or an OTLP/HTTP collector
+    from a background thread. Failures are reported once and otherwise ignored:
+    tracing never fails a request."""
+
+    def __init__(self, target: str):
+        kind, _, location = target.partition(":")
+        if kind == "file" and location:
+            self.path, self.url = Path(location), None
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        elif kind == "otlp":
+            self.path, self.url = None, location.lstrip() or DEFAULT_OTLP_URL
+        else:
+            raise ValueError(f"Invalid TRACE_EXPORT '{target}': use file:<path> or otlp[:<url>]")
+        self.exported = 0
+        self.dropped = 0
+        self._warned = False
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=_EXPORT_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._worker, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, finished: Trace) -> None:
+        try:
+            self._queue.put_nowait(finished)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """Waits until every queued trace has been written."""
+        self._queue.join()
+
+    def _worker(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < _EXPORT_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                if not self._warned:
+                    self._warned = True
+                    print(f"⚠️ Warning: Could not export traces: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: List[Trace]) -> None:
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": SERVICE_NAME}}
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "src.tracing"},
+                    "spans": [s for finished in batch for s in finished.to_otlp()]
+                }]
+            }]
+        }
+        if self.path is not None:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        else:
+            import httpx
+            httpx.post(self.url, json=payload, timeout=5).raise_for_status()
+
+
+_exporter: Optional[SpanExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> Optional[SpanExporter]:
+    """The process-wide exporter configured by TRACE_EXPORT, or None."""
+    global _exporter
+    target = os.getenv("TRACE_EXPORT")
+    if not target:
+        return None
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = SpanExporter(target)
+        return _exporter
+
+
+_TOKEN_UNSAFE = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+
+def server_timing(timings: Dict) -> str:
+    """Server-Timing header value: total plus one entry per stage."""
+    entries = [f"total;dur={timings['total_ms']}"]
+    entries += [
+        f"{_TOKEN_UNSAFE.sub('_', name)};dur={ms}"
+        for name, ms in timings["stages"].items()
+    ]
+    return ", ".join(entries)
+
+
+class TracingMiddleware:
+    """ASGI middleware tracing HTTP requests.
+
+    Requests with the debug header are always traced and get
+    `Server-Timing` and `X-Trace-Id` headers; others are traced (for
+    export only) when TRACE_EXPORT is set, at TRACE_SAMPLE_RATIO.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        debug = any(
+            name == TRACE_DEBUG_HEADER and value.strip() not in (b"", b"0", b"false")
+            for name, value in scope.get("headers", [])
+        )
+        if not debug and (get_exporter() is None or random.random() >= TRACE_SAMPLE_RATIO):
+            await self.app(scope, receive, send)
+            return
+
+        with trace(f"{scope['method']} {scope['path']}", debug=debug, method=scope["method"]) as current:
+            async def traced_send(message):
+                if message["type"] == "http.response.start":
+                    current.root.attributes["status"] = message["status"]
+                    if debug:
+                        headers = list(message.get("headers", []))
+                        headers.append((b"server-timing", server_timing(current.timings()).encode("latin-1")))
+                        headers.append((b"x-trace-id", current.trace_id.encode("latin-1")))
+                        message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, traced_send)
@@ -0,0 +1,227 @@
+"""Persistent cache of Deepgram transcriptions keyed by audio content.
+
+Re-uploading the same recording (same bytes) with the same model and
+language returns the stored transcript instead of calling Deepgram
+again. Entries expire after a TTL and the least recently used ones are
+evicted when the cache grows past its entry or size limits.
+`transcribe_cached` (and `transcribe_cached_sync` for blocking callers)
+wraps a transcription call with the lookup; the API server, the batch
+CLI and the transcription tool all go through them.
+
+Configuration (environment variables):
+- TRANSCRIPTION_CACHE_ENABLED: 'false' disables the cache (default: true)
+- TRANSCRIPTION_CACHE_PATH: SQLite file (default: $TRANSCRIPTIONS_DIR/cache/transcription_cache.db)
+- TRANSCRIPTION_CACHE_TTL_SECONDS: entry lifetime (default: 30 days)
+- TRANSCRIPTION_CACHE_MAX_ENTRIES: maximum number of entries (default: 10000)
+- TRANSCRIPTION_CACHE_MAX_MB: maximum total transcript size (default: 256)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from .concurrency import run_blocking
+
+# Read size used when hashing audio files
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcription_cache (
+    key TEXT PRIMARY KEY,
+    transcript TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcription_cache_created ON transcription_cache (created_at);
+CREATE INDEX IF NOT EXISTS idx_transcription_cache_last_used ON transcription_cache (last_used_at);
+"""
+
+
+def hash_file(path: Union[str, Path]) -> str:
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """SQLite-backed transcript cache with TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        db_path: Union[str, Path],
+        ttl_seconds: float = 30 * 24 * 3600,
+        max_entries: int = 10000,
+        max_bytes: int = 256 * 1024 * 1024
+    ):
+        self.path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def make_key(content_hash: str, model: str, language: Optional[str]) -> str:
+        return f"{content_hash}:{model}:{language or 'auto'}"
+
+    def get(self, content_hash: str, model: str, language: Optional[str]) -> Optional[str]:
+        """Returns the cached transcript, or None on a miss or expired entry."""
+        key = self.make_key(content_hash, model, language)
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT transcript, created_at FROM transcription_cache WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM transcription_cache WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE transcription_cache SET last_used_at = ? WHERE key = ?",
+                (now, key)
+            )
+            self.hits += 1
+            return row[0]
+
+    def put(self, content_hash: str, model: str, language: Optional[str], transcript: str) -> None:
+        """Stores a transcript and evicts entries over the configured limits."""
+        key = self.make_key(content_hash, model, language)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcription_cache "
+                "(key, transcript, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, transcript, len(transcript.encode('utf-8')), now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Drops expired entries, then least recently used ones over the limits."""
+        self._conn.execute(
+            "DELETE FROM transcription_cache WHERE created_at < ?",
+            (now - self.ttl_seconds,)
+        )
+        entries, total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcription_cache"
+        ).fetchone()
+        if entries <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        evict_count, evict_bytes = 0, 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM transcription_cache ORDER BY last_used_at"
+        ).fetchall():
+            if entries - evict_count <= self.max_entries and total_bytes - evict_bytes <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM transcription_cache WHERE key = ?", (key,))
+            evict_count += 1
+            evict_bytes += size
+
+    def stats(self) -> Dict:
+        """Hit/miss counters of this process and current cache size."""
+        with self._lock:
+            entries, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcription_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": total_bytes
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+_cache: Optional[TranscriptionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_transcription_cache() -> Optional[TranscriptionCache]:
+    """Returns the process-wide cache configured from the environment,
+    or None if caching is disabled."""
+    global _cache
+    if os.getenv("TRANSCRIPTION_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            default_dir = Path(os.getenv("TRANSCRIPTIONS_DIR", "data/transcriptions")) / "cache"
+            _cache = TranscriptionCache(
+                os.getenv("TRANSCRIPTION_CACHE_PATH", str(default_dir / "transcription_cache.db")),
+                ttl_seconds=float(os.getenv("TRANSCRIPTION_CACHE_TTL_SECONDS", 30 * 24 * 3600)),
+                max_entries=int(os.getenv("TRANSCRIPTION_CACHE_MAX_ENTRIES", 10000)),
+                max_bytes=int(float(os.getenv("TRANSCRIPTION_CACHE_MAX_MB", 256)) * 1024 * 1024)
+            )
+        return _cache
+
+
+async def transcribe_cached(
+    audio_path: Path,
+    language: Optional[str],
+    transcribe: Callable[[Path], Awaitable[str]],
+    content_hash: Optional[str] = None,
+    model: str = "nova-2"
+) -> Tuple[str, float, bool]:
+    """Runs `transcribe(audio_path)` unless identical audio was transcribed
+    before with the same model and language.
+
+    Returns (transcription, seconds, cached). On a hit `seconds` is the
+    lookup time instead of the Deepgram round-trip. Hashing and cache
+    access run in the blocking pool.
+    """
+    cache = get_transcription_cache()
+    start_time = time.perf_counter()
+    if cache is not None:
+        content_hash = content_hash or await run_blocking(hash_file, audio_path)
+        cached = await run_blocking(cache.get, content_hash, model, language)
+        if cached is not None:
+            return cached, time.perf_counter() - start_time, True
+
+    start_time = time.perf_counter()
+    transcription = await transcribe(audio_path)
+    duration = time.perf_counter() - start_time
+    if cache is not None and transcription:
+        await run_blocking(cache.put, content_hash, model, language, transcription)
+    return transcription, duration, False
+
+
+def transcribe_cached_sync(
+    audio_path: Path,
+    language: Optional[str],
+    transcribe: Callable[[Path], str],
+    content_hash: Optional[str] = None,
+    model: str = "nova-2"
+) -> Tuple[str, float, bool]:
+    """Blocking `transcribe_cached`, for callers outside the event loop."""
+    cache = get_transcription_cache()
+    start_time = time.perf_counter()
+    if cache is not None:
+        content_hash = content_hash or hash_file(audio_path)
+        cached = cache.get(content_hash, model, language)
+        if cached is not None:
+            return cached, time.perf_counter() - start_time, True
+
+    start_time = time.perf_counter()
+    transcription = transcribe(audio_path)
+    duration = time.perf_counter() - start_time
+    if cache is not None and transcription:
+        cache.put(content_hash, model, language, transcription)
+    return transcription, duration, False
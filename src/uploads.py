@@ -0,0 +1,149 @@
+"""Streaming handling of uploaded audio files.
+
+Uploads are copied to disk in fixed-size chunks and hashed on the way,
+so the memory used per upload is bounded by the chunk size instead of
+the file size. Size limits are enforced while the bytes arrive: by
+`UploadSizeLimitMiddleware` on the raw request body (MAX_REQUEST_MB)
+and by `save_upload` on each file (MAX_UPLOAD_MB).
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Tuple
+
+from fastapi import HTTPException, UploadFile
+
+from .concurrency import run_blocking
+from .metrics import track_stage
+
+# Bytes read from the upload per iteration
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+
+# Largest accepted audio file
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", 500)) * 1024 * 1024)
+
+# Largest accepted request body (several files in /upload/batch share it)
+MAX_REQUEST_BYTES = int(float(os.getenv("MAX_REQUEST_MB", os.getenv("MAX_UPLOAD_MB", 500))) * 1024 * 1024)
+
+# Headroom for multipart boundaries and form fields around the file
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+def upload_destination(upload_dir: Path, filename: str) -> Path:
+    """Path inside `upload_dir` for an uploaded file (directory parts are dropped).
+
+    The name gets a random prefix, so uploads of files with the same name
+    never overwrite each other.
+    """
+    return upload_dir / f"{uuid.uuid4().hex[:12]}_{Path(filename).name}"
+
+
+async def save_upload(
+    file: UploadFile,
+    destination: Path,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> Tuple[int, str]:
+    """Streams an upload to `destination`, hashing it on the way.
+
+    The file is written under a unique temporary name and moved into
+    place once complete, so a rejected or interrupted upload never leaves
+    a partial file behind. Raises HTTPException(413) as soon as the upload grows
+    past `max_bytes`.
+
+    Returns (size_in_bytes, sha256_hex).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    partial = destination.with_name(f"{destination.name}.{uuid.uuid4().hex}.part")
+    try:
+        with track_stage("upload_write"), open(partial, "wb") as f:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Maximum size: {max_bytes // (1024 * 1024)} MB"
+                    )
+                digest.update(chunk)
+                await run_blocking(f.write, chunk)
+        os.replace(partial, destination)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    return size, digest.hexdigest()
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+    """ASGI middleware rejecting request bodies larger than `max_body_bytes`.
+
+    The declared Content-Length is checked up front and the streamed body
+    is counted as it is received, so an oversized upload is cut off
+    before it is spooled to disk. Rejected requests get a 413 response.
+    """
+
+    def __init__(self, app, max_body_bytes: int = MAX_REQUEST_BYTES + _MULTIPART_OVERHEAD):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def _reject(self, send):
+        body = json.dumps({
+            "detail": f"Request body too large. Maximum size: {self.max_body_bytes // (1024 * 1024)} MB"
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_body_bytes:
+                await self._reject(send)
+                return
+
+        state = {"received": 0, "too_large": False, "rejected": False}
+
+        async def limited_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+                if state["received"] > self.max_body_bytes:
+                    state["too_large"] = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            # Form parsing turns the receive error into its own error
+            # response; replace it with the 413
+            if state["too_large"]:
+                if not state["rejected"]:
+                    state["rejected"] = True
+                    await self._reject(send)
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _BodyTooLarge:
+            if not state["rejected"]:
+                state["rejected"] = True
+                await self._reject(send)
@@ -0,0 +1,55 @@
+"""
+Shared pytest configuration
+
+The API server reads its configuration from the environment when it is
+imported, so test data directories and keys are set here, before any
+test module imports it.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import from src
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+_DATA_DIR = Path(tempfile.mkdtemp(prefix="transcription-tests-"))
+
+os.environ["UPLOAD_DIR"] = str(_DATA_DIR / "uploads")
+os.environ["TRANSCRIPTIONS_DIR"] = str(_DATA_DIR / "transcriptions")
+os.environ["CSV_PATH"] = str(_DATA_DIR / "transcriptions" / "output" / "history.csv")
+os.environ["DEEPGRAM_API_KEY"] = "test-deepgram-key"
+os.environ["TRANSCRIPTION_CACHE_ENABLED"] = "false"
+# An empty key keeps .env from enabling the real Groq agent
+os.environ["GROQ_API_KEY"] = ""
+
+
+@pytest.fixture
+def deepgram_stub():
+    """Local Deepgram stand-in; the API server's client points at it."""
+    from tests.deepgram_stub import DeepgramStub
+    from src import deepgram_client
+
+    with DeepgramStub() as stub:
+        previous = os.environ.get("DEEPGRAM_API_URL")
+        os.environ["DEEPGRAM_API_URL"] = stub.url
+        deepgram_client._async_clients.clear()
+        yield stub
+        deepgram_client._async_clients.clear()
+        if previous is None:
+            os.environ.pop("DEEPGRAM_API_URL", None)
+        else:
+            os.environ["DEEPGRAM_API_URL"] = previous
+
+
+@pytest.fixture
+def deepgram_stream_stub(monkeypatch):
+    """Local Deepgram streaming stand-in; /stream connects to it."""
+    from tests.deepgram_stream_stub import DeepgramStreamStub
+
+    with DeepgramStreamStub() as stub:
+        monkeypatch.setenv("DEEPGRAM_STREAM_URL", stub.url)
+        yield stub
@@ -0,0 +1,131 @@
+"""
+Local stand-in for Deepgram's streaming endpoint (/v1/listen over WebSocket)
+
+Runs a websockets server on 127.0.0.1 in a background thread. The audio
+is treated as UTF-8 text, so tests send "hola " "qué tal " ... and that
+text is the transcript: every audio message gets an interim result with
+the phrase so far, and every `final_every` messages (and on CloseStream)
+the phrase becomes final. Audio timestamps assume `bytes_per_second`.
+"""
+
+import asyncio
+import json
+import threading
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlparse
+
+from websockets.asyncio.server import serve
+
+
+def results_message(text: str, is_final: bool, start: float, duration: float) -> dict:
+    """A message with the structure of Deepgram's streaming "Results"."""
+    return {
+        "type": "Results",
+        "channel_index": [0, 1],
+        "start": start,
+        "duration": duration,
+        "is_final": is_final,
+        "speech_final": is_final,
+        "channel": {"alternatives": [{"transcript": text, "confidence": 0.99, "words": []}]}
+    }
+
+
+class DeepgramStreamStub:
+    """Threaded fake Deepgram streaming server.
+
+    - final_every: audio messages per final result
+    - delay: seconds to wait before each result
+    - reject_with: HTTP status returned instead of accepting the connection
+    - close_with: close code sent after the first audio message (a failing stream)
+    """
+
+    def __init__(self, final_every: int = 3, delay: float = 0.0, bytes_per_second: int = 32000):
+        self.final_every = final_every
+        self.delay = delay
+        self.bytes_per_second = bytes_per_second
+        self.reject_with = None
+        self.close_with = None
+        self.connections = []
+        self.keepalives = 0
+        self._loop = None
+        self._stopped = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.url = None
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._stopped.set_result, None)
+        self._thread.join(5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._serve())
+
+    async def _serve(self):
+        self._stopped = self._loop.create_future()
+        async with serve(self._handler, "127.0.0.1", 0, process_request=self._check) as server:
+            host, port = server.sockets[0].getsockname()[:2]
+            self.url = f"http://{host}:{port}"
+            self._ready.set()
+            await self._stopped
+
+    def _check(self, connection, request):
+        url = urlparse(request.path)
+        self.connections.append({
+            "path": url.path,
+            "params": {k: v[0] for k, v in parse_qs(url.query).items()},
+            "headers": dict(request.headers.raw_items())
+        })
+        if url.path != "/v1/listen":
+            return connection.respond(HTTPStatus.NOT_FOUND, "Not found\n")
+        if not request.headers.get("Authorization", "").startswith("Token "):
+            return connection.respond(HTTPStatus.UNAUTHORIZED, "Invalid credentials\n")
+        if self.reject_with is not None:
+            return connection.respond(HTTPStatus(self.reject_with), f"stub failure {self.reject_with}\n")
+        return None
+
+    async def _handler(self, connection):
+        phrase, chunks, start, received = b"", 0, 0.0, 0
+
+        async def result(is_final):
+            nonlocal phrase, chunks, start
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            duration = len(phrase) / self.bytes_per_second
+            text = phrase.decode("utf-8", errors="replace").strip()
+            await connection.send(json.dumps(results_message(text, is_final, start, duration)))
+            if is_final:
+                phrase, chunks, start = b"", 0, start + duration
+
+        async for message in connection:
+            if isinstance(message, bytes):
+                if self.close_with is not None:
+                    await connection.close(self.close_with, "stub failure")
+                    return
+                phrase += message
+                received += len(message)
+                chunks += 1
+                await result(is_final=chunks >= self.final_every)
+                continue
+            kind = json.loads(message).get("type")
+            if kind == "KeepAlive":
+                self.keepalives += 1
+            elif kind == "CloseStream":
+                if phrase:
+                    await result(is_final=True)
+                await connection.send(json.dumps({
+                    "type": "Metadata", "duration": received / self.bytes_per_second
+                }))
+                await connection.close()
+                return
@@ -0,0 +1,137 @@
+"""
+Local stand-in for the Deepgram /v1/listen endpoint
+
+Runs a threaded HTTP server on 127.0.0.1 that answers transcription
+requests with the same JSON shape as Deepgram. Tests can set a delay,
+a transcript function and a queue of failure status codes.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def listen_response(transcript: str, model: str = "nova-2") -> dict:
+    """Builds a response with the structure of Deepgram's /v1/listen."""
+    return {
+        "metadata": {
+            "request_id": "stub-request",
+            "models": [model],
+            "channels": 1
+        },
+        "results": {
+            "channels": [{
+                "alternatives": [{
+                    "transcript": transcript,
+                    "confidence": 0.99,
+                    "words": []
+                }]
+            }]
+        }
+    }
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog (5) makes bursts of concurrent connections wait
+    # for SYN retransmits, which skews timing assertions
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class DeepgramStub:
+    """Threaded fake Deepgram server.
+
+    - delay: seconds to wait before answering each request
+    - transcript: function (body_bytes, query_params) -> transcript
+    - failures: list of status codes returned (in order) before succeeding
+    """
+
+    def __init__(self, delay: float = 0.0, transcript=None):
+        self.delay = delay
+        self.transcript = transcript or (lambda body, params: f"stub transcript of {len(body)} bytes")
+        self.failures = []
+        self.requests = []
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _read_body(self) -> bytes:
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    body = b""
+                    while True:
+                        size = int(self.rfile.readline().strip(), 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return body
+                        body += self.rfile.read(size)
+                        self.rfile.readline()
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def _send_json(self, status: int, payload: dict):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                body = self._read_body()
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                with stub._lock:
+                    stub.requests.append({
+                        "path": url.path,
+                        "params": params,
+                        "headers": dict(self.headers),
+                        "size": len(body)
+                    })
+                    stub.connections.add(self.client_address)
+                    failure = stub.failures.pop(0) if stub.failures else None
+
+                if url.path != "/v1/listen":
+                    self._send_json(404, {"err_msg": "Not found"})
+                    return
+                if not self.headers.get("Authorization", "").startswith("Token "):
+                    self._send_json(401, {"err_msg": "Invalid credentials"})
+                    return
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if failure is not None:
+                    self._send_json(failure, {"err_msg": f"stub failure {failure}"})
+                    return
+                transcript = stub.transcript(body, params)
+                self._send_json(200, listen_response(transcript, params.get("model", "nova-2")))
+
+        return Handler
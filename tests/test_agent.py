@@ -0,0 +1,437 @@
+"""
+Tests for the agent's routing (intent fast path and LLM fallback)
+
+Uses a fake LLM and fake tools, so no API keys are needed.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.agent import IntelligentAgent
+from src.intent import IntentClassifier
+
+
+class FakeTool:
+    def __init__(self, name):
+        self.name = name
+        self.calls = []
+
+    def _run(self, **kwargs):
+        self.calls.append(kwargs)
+        return f"{self.name} {kwargs}"
+
+
+class FakeLLM:
+    """Answers every message with the given tool call."""
+
+    def __init__(self, tool_calls=None, content="respuesta del LLM"):
+        self.response = SimpleNamespace(tool_calls=tool_calls or [], content=content)
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return self.response
+
+
+def _agent(llm, threshold=None):
+    tools = [FakeTool("transcribe_audio"), FakeTool("save_transcription"), FakeTool("query_history")]
+    agent = IntelligentAgent(llm, tools, IntentClassifier(threshold=threshold))
+    return agent, {tool.name: tool for tool in tools}
+
+
+def _ask(agent, message):
+    return agent.invoke({"messages": [{"role": "user", "content": message}]})["messages"][-1]["content"]
+
+
+def test_classifier_extracts_intents_and_arguments(tmp_path):
+    """Rules pick the tool, its arguments and a confidence."""
+    audio = tmp_path / "reunion.mp3"
+    audio.write_bytes(b"audio")
+    classifier = IntentClassifier(threshold=0.8)
+
+    intent = classifier.classify("Dame las últimas 5 transcripciones del historial")
+    assert (intent.tool, intent.args) == ("query_history", {"limit": 5})
+
+    intent = classifier.classify("Busca transcripciones que mencionen presupuesto en el historial")
+    assert intent.args == {"search": "presupuesto"}
+
+    intent = classifier.classify(f"Transcribe este audio en inglés. Archivo subido: {audio}")
+    assert (intent.tool, intent.args) == ("transcribe_audio", {"audio_file": str(audio), "language": "en"})
+
+    # Uncertain requests are left to the LLM
+    assert classifier.classify("Hola, ¿qué tal?") is None
+    assert classifier.classify(f"Archivo subido: {audio}") is None
+    assert classifier.classify("transcribe el audio de ayer") is None
+    assert classifier.classify(f"Transcribe y guarda este audio. Archivo subido: {audio}") is None
+    assert classifier.classify("transcribe reunion.mp3 y busca en el historial") is None
+
+
+def test_fast_path_skips_llm_and_counts_hits(tmp_path):
+    """Confident intents run the tool directly; the rest go to the LLM."""
+    llm = FakeLLM(tool_calls=[{"name": "query_history", "args": {"search": "hola"}}])
+    agent, tools = _agent(llm)
+
+    assert _ask(agent, "dame el historial").startswith("query_history")
+    assert _ask(agent, "¿Cuántas transcripciones hay?").startswith("query_history")
+    assert llm.calls == 0
+
+    _ask(agent, "¿Hay algo que diga hola?")
+    assert llm.calls == 1
+    assert tools["query_history"].calls[-1] == {"search": "hola"}
+
+    stats = agent.stats()
+    assert (stats["requests"], stats["fast_path"], stats["llm"]) == (3, 2, 1)
+    assert stats["fast_path_hit_rate"] == round(2 / 3, 4)
+    assert stats["fast_path_by_tool"] == {"query_history": 2}
+
+
+def test_threshold_above_one_disables_fast_path():
+    """With the threshold above 1 every message goes to the LLM."""
+    llm = FakeLLM(content="sin herramientas")
+    agent, _ = _agent(llm, threshold=1.1)
+
+    assert _ask(agent, "dame el historial") == "sin herramientas"
+    assert llm.calls == 1
+    assert agent.stats()["fast_path"] == 0
+
+
+def test_decision_cache_reuses_llm_decisions_across_uploads(tmp_path):
+    """Repeated messages skip the LLM, with the upload path swapped back in."""
+    from src.decision_cache import DecisionCache
+
+    class EchoPathLLM(FakeLLM):
+        """Asks to transcribe the uploaded file, whatever its path."""
+
+        def invoke(self, messages):
+            self.calls += 1
+            path = messages[-1]["content"].split("Archivo subido: ")[-1]
+            return SimpleNamespace(tool_calls=[{"name": "transcribe_audio", "args": {"audio_file": path}, "id": "1"}], content="")
+
+    llm = EchoPathLLM()
+    tools = [FakeTool("transcribe_audio"), FakeTool("query_history")]
+    cache = DecisionCache(max_entries=10, ttl_seconds=60, db_path=tmp_path / "decisions.db")
+    # Threshold above 1: every message goes through the LLM decision path
+    agent = IntelligentAgent(llm, tools, IntentClassifier(threshold=1.1), decision_cache=cache)
+
+    _ask(agent, "¿Puedes pasar esto a texto, por favor? Archivo subido: uploads/a.mp3")
+    _ask(agent, "¿puedes pasar  esto a texto por favor?. Archivo subido: uploads/b.mp3")
+    assert llm.calls == 1
+    assert tools[0].calls == [{"audio_file": "uploads/a.mp3"}, {"audio_file": "uploads/b.mp3"}]
+
+    # Persisted entries survive a new cache instance...
+    restored = IntelligentAgent(llm, tools, IntentClassifier(threshold=1.1),
+                                decision_cache=DecisionCache(db_path=tmp_path / "decisions.db"))
+    _ask(restored, "Puedes pasar esto a texto por favor. Archivo subido: uploads/c.mp3")
+    assert llm.calls == 1
+    assert tools[0].calls[-1] == {"audio_file": "uploads/c.mp3"}
+
+    # ...but not a change in the bound tools
+    changed = IntelligentAgent(llm, tools[:1], IntentClassifier(threshold=1.1),
+                               decision_cache=DecisionCache(db_path=tmp_path / "decisions.db"))
+    _ask(changed, "Puedes pasar esto a texto por favor. Archivo subido: uploads/d.mp3")
+    assert llm.calls == 2
+    assert agent.stats()["decision_cache"]["hits"] == 1
+
+
+def test_decision_cache_lru_and_ttl():
+    """Entries expire after the TTL and the least recently used are evicted."""
+    from src.decision_cache import DecisionCache
+
+    cache = DecisionCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", {"tool_calls": [], "content": "a"})
+    cache.put("b", {"tool_calls": [], "content": "b"})
+    assert cache.get("a") is not None
+    cache.put("c", {"tool_calls": [], "content": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+    cache.ttl_seconds = 0
+    assert cache.get("c") is None
+
+
+class SlowTool(FakeTool):
+    def __init__(self, name, delay, log):
+        super().__init__(name)
+        self.delay = delay
+        self.log = log
+
+    def _run(self, **kwargs):
+        import time
+        self.log.append(("start", self.name, time.perf_counter()))
+        time.sleep(self.delay)
+        self.log.append(("end", self.name, time.perf_counter()))
+        return f"{self.name} done"
+
+
+class ScriptedLLM:
+    """Answers with the next scripted response; records every conversation."""
+
+    def __init__(self, *tool_calls_per_round):
+        self.rounds = list(tool_calls_per_round)
+        self.conversations = []
+
+    def invoke(self, messages):
+        self.conversations.append(list(messages))
+        tool_calls = self.rounds.pop(0)(messages) if self.rounds else []
+        return SimpleNamespace(tool_calls=tool_calls, content="" if tool_calls else "hecho")
+
+
+def test_tool_calls_run_in_parallel_and_dependent_ones_go_back_to_the_llm():
+    """Independent calls overlap; a save asked for together with the
+    transcription is made again by the LLM once it has the transcript."""
+    log = []
+    tools = [SlowTool("transcribe_audio", 0.3, log), SlowTool("query_history", 0.3, log),
+             SlowTool("save_transcription", 0.05, log)]
+    llm = ScriptedLLM(
+        lambda messages: [
+            {"name": "save_transcription", "args": {"filename": "a.mp3", "text": "inventado"}},
+            {"name": "transcribe_audio", "args": {"audio_file": "a.mp3"}},
+            {"name": "query_history", "args": {}},
+            {"name": "missing_tool", "args": {}},
+        ],
+        lambda messages: [
+            {"name": "save_transcription", "args": {"filename": "a.mp3", "text": messages[-3].content}}
+        ]
+    )
+    agent = IntelligentAgent(llm, tools, IntentClassifier(threshold=1.1))
+
+    result = agent.invoke({"messages": [{"role": "user", "content": "haz todo"}]})
+
+    runs = result["tool_runs"]
+    assert [r["tool"] for r in runs] == ["transcribe_audio", "query_history", "missing_tool", "save_transcription"]
+    assert [r["status"] for r in runs] == ["ok", "ok", "error", "ok"]
+    assert runs[-1]["args"]["text"] == "transcribe_audio done"
+    assert all(r["latency_ms"] >= 250 for r in runs[:2])
+    assert result["route"] == "llm"
+    content = result["messages"][-1]["content"]
+    assert "transcribe_audio done" in content and "no encontrada" in content
+
+    # The second round saw the results of the first, without the deferred save
+    assistant = llm.conversations[1][2]
+    assert [call["name"] for call in assistant.tool_calls] == ["transcribe_audio", "query_history", "missing_tool"]
+    # One extra round past max_steps=1, whose calls end the request
+    assert len(llm.conversations) == 2
+
+    times = {(event, name): t for event, name, t in log}
+    # transcribe and query overlap...
+    assert times[("start", "query_history")] < times[("end", "transcribe_audio")]
+    # ...and the save only runs with the transcript
+    assert times[("start", "save_transcription")] >= times[("end", "transcribe_audio")]
+
+    # If the LLM repeats both calls in its extra round, the save is skipped
+    repeat = lambda messages: [{"name": "transcribe_audio", "args": {"audio_file": "a.mp3"}},
+                               {"name": "save_transcription", "args": {"filename": "a.mp3", "text": "x"}}]
+    agent = IntelligentAgent(ScriptedLLM(repeat, repeat), tools, IntentClassifier(threshold=1.1))
+    runs = asyncio.run(agent.ainvoke({"messages": [{"role": "user", "content": "haz todo"}]}))["tool_runs"]
+    assert [(r["tool"], r["status"]) for r in runs] == [
+        ("transcribe_audio", "ok"), ("transcribe_audio", "ok"), ("save_transcription", "skipped")
+    ]
+
+
+def test_results_loop_back_to_llm_up_to_max_steps():
+    """With max_steps > 1 the LLM sees tool results and can chain calls."""
+    class ChainLLM:
+        def __init__(self):
+            self.conversations = []
+
+        def invoke(self, messages):
+            self.conversations.append(messages)
+            step = len(self.conversations)
+            if step == 1:
+                return SimpleNamespace(tool_calls=[{"name": "transcribe_audio", "args": {"audio_file": "a.mp3"}}], content="")
+            if step == 2:
+                text = messages[-1].content
+                return SimpleNamespace(tool_calls=[{"name": "save_transcription", "args": {"filename": "a.mp3", "text": text}}], content="")
+            return SimpleNamespace(tool_calls=[], content="Listo: transcrito y guardado.")
+
+    llm = ChainLLM()
+    agent, tools = _agent(llm, threshold=1.1)
+    agent.max_steps = 3
+
+    result = agent.invoke({"messages": [{"role": "user", "content": "transcribe a.mp3 y guárdalo"}]})
+
+    assert [r["tool"] for r in result["tool_runs"]] == ["transcribe_audio", "save_transcription"]
+    assert tools["save_transcription"].calls[0]["text"].startswith("transcribe_audio")
+    assert result["messages"][-1]["content"].endswith("Listo: transcrito y guardado.")
+    assert len(llm.conversations) == 3
+
+    # Bounded: with 2 steps the third LLM round never happens
+    llm = ChainLLM()
+    agent, _ = _agent(llm, threshold=1.1)
+    agent.max_steps = 2
+    result = agent.invoke({"messages": [{"role": "user", "content": "transcribe a.mp3 y guárdalo"}]})
+    assert len(llm.conversations) == 2
+    assert len(result["tool_runs"]) == 2
+
+
+class AsyncSlowTool(FakeTool):
+    """Tool whose async path sleeps without blocking, tracking overlap."""
+
+    def __init__(self, name, delay):
+        super().__init__(name)
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+
+    async def _arun(self, **kwargs):
+        import asyncio
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        self.calls.append(kwargs)
+        return f"{self.name} async"
+
+
+class AsyncFakeLLM(FakeLLM):
+    def __init__(self, tool_calls=None, delay=0.0):
+        super().__init__(tool_calls, content="")
+        self.delay = delay
+
+    async def ainvoke(self, messages):
+        import asyncio
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.response
+
+
+def test_ainvoke_overlaps_concurrent_requests():
+    """Concurrent ainvoke calls share the event loop instead of queuing."""
+    import asyncio
+    import time
+
+    tool = AsyncSlowTool("query_history", 0.3)
+    llm = AsyncFakeLLM(tool_calls=[{"name": "query_history", "args": {"search": "hola"}}], delay=0.2)
+    agent = IntelligentAgent(llm, [tool], IntentClassifier())
+
+    async def run():
+        messages = ["dame el historial"] * 5 + ["¿Hay algo que diga hola?"] * 5
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            agent.ainvoke({"messages": [{"role": "user", "content": m}]}) for m in messages
+        ))
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(run())
+
+    assert all(r["messages"][-1]["content"] == "query_history async" for r in results)
+    assert [r["route"] for r in results].count("fast_path") == 5
+    assert llm.calls == 5
+    assert tool.max_running == 10
+    # Serially this would take 5 * 0.3 + 5 * 0.5 = 4s
+    assert elapsed < 1.5
+
+
+def test_ainvoke_matches_invoke_for_sync_tools_and_llm():
+    """Tools without `_arun` and LLMs without `ainvoke` run in the pool."""
+    import asyncio
+
+    llm = FakeLLM(tool_calls=[{"name": "transcribe_audio", "args": {"audio_file": "a.mp3"}},
+                              {"name": "missing_tool", "args": {}}])
+    agent, tools = _agent(llm, threshold=1.1)
+
+    result = asyncio.run(agent.ainvoke({"messages": [{"role": "user", "content": "haz algo"}]}))
+
+    assert [r["status"] for r in result["tool_runs"]] == ["ok", "error"]
+    assert tools["transcribe_audio"].calls == [{"audio_file": "a.mp3"}]
+    assert result == {**agent.invoke({"messages": [{"role": "user", "content": "haz algo"}]}),
+                      "tool_runs": result["tool_runs"]}
+
+
+def test_agent_endpoint_requests_overlap(monkeypatch):
+    """/agent awaits the agent, so slow requests don't queue behind each other."""
+    import asyncio
+    import time
+
+    import httpx
+    import src.api_server as api_server
+
+    tool = AsyncSlowTool("query_history", 0.4)
+    monkeypatch.setattr(api_server, "agent", IntelligentAgent(FakeLLM(), [tool], IntentClassifier()))
+
+    async def run():
+        transport = httpx.ASGITransport(app=api_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.post("/agent", data={"message": "dame el historial", "details": "true"})
+                for _ in range(8)
+            ))
+            return responses, time.perf_counter() - start
+
+    responses, elapsed = asyncio.run(run())
+
+    assert all(r.status_code == 200 and r.json()["route"] == "fast_path" for r in responses)
+    assert tool.max_running == 8
+    assert elapsed < 2.0
+
+
+def test_server_import_defers_the_agent():
+    """Importing the API server doesn't load LangChain, Groq or pyarrow."""
+    import subprocess
+
+    code = (
+        "import sys, src.api_server as s; "
+        "print(s.agent is s.AGENT_NOT_LOADED, "
+        "[m for m in ('src.agent', 'langchain_groq', 'pyarrow', 'numpy') if m in sys.modules])"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=Path(__file__).parent.parent,
+        capture_output=True, text=True, check=True
+    ).stdout
+
+    assert output.strip().splitlines()[-1] == "True []"
+
+
+def test_agent_warms_up_in_background_and_is_built_once(monkeypatch):
+    """/health answers and /ready is 503 while the agent is built; concurrent
+    first /agent calls share one build."""
+    import threading
+
+    from fastapi.testclient import TestClient
+
+    import src.agent
+    import src.api_server as api_server
+
+    release = threading.Event()
+    builds = []
+
+    def create_agent(history_store):
+        builds.append(history_store)
+        release.wait(10)
+        return IntelligentAgent(FakeLLM(), [FakeTool("query_history")], IntentClassifier())
+
+    monkeypatch.setattr(src.agent, "create_agent", create_agent)
+    monkeypatch.setattr(api_server, "agent", api_server.AGENT_NOT_LOADED)
+    monkeypatch.setattr(api_server, "agent_status", {"state": "not_loaded", "error": None, "load_seconds": None})
+    monkeypatch.setattr(api_server, "AGENT_WARMUP", True)
+
+    with TestClient(api_server.app) as client:
+        assert client.get("/health").status_code == 200
+        starting = client.get("/ready")
+        assert starting.status_code == 503
+        assert starting.json()["status"] == "starting"
+
+        results = []
+        callers = [
+            threading.Thread(target=lambda: results.append(
+                client.post("/agent", data={"message": "dame el historial"}).status_code
+            ))
+            for _ in range(3)
+        ]
+        for caller in callers:
+            caller.start()
+        release.set()
+        for caller in callers:
+            caller.join(10)
+
+        ready = client.get("/ready")
+        assert ready.status_code == 200
+        assert ready.json()["agent"] == "ready"
+
+    assert results == [200, 200, 200]
+    assert builds == [api_server.history_store]
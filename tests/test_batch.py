@@ -0,0 +1,79 @@
+"""
+Tests for batch transcription (POST /upload/batch and python -m src.batch)
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+from src import api_server, batch
+from src.api_server import app
+
+
+def test_upload_batch_concurrent_single_write(deepgram_stub, monkeypatch):
+    """Files are transcribed concurrently and saved with one history write."""
+    deepgram_stub.delay = 0.3
+    deepgram_stub.transcript = lambda body, params: f"batch {len(body)}"
+    writes = []
+    append_many = api_server.history_store.append_many
+    monkeypatch.setattr(api_server.history_store, "append_many", lambda rows: writes.append(len(rows)) or append_many(rows))
+    monkeypatch.setattr(api_server.history_store, "append", lambda record: writes.append("single"))
+    before = api_server.history_store.count()
+
+    files = [("files", (f"clip{i}.mp3", b"x" * (10 + i))) for i in range(8)]
+    with TestClient(app) as client:
+        response = client.post("/upload/batch?concurrency=8", files=files)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] is True
+    assert (data["total"], data["succeeded"], data["failed"]) == (8, 8, 0)
+    assert [r["filename"] for r in data["results"]] == [f"clip{i}.mp3" for i in range(8)]
+    assert [r["transcription"] for r in data["results"]] == [f"batch {10 + i}" for i in range(8)]
+    # 8 calls of 0.3s each would take 2.4s in sequence
+    assert max(r["duration"] for r in data["results"]) < 8 * deepgram_stub.delay / 2
+    assert writes == [8]
+    assert api_server.history_store.count() == before + 8
+
+
+def test_upload_batch_partial_failures(deepgram_stub):
+    """Invalid files and Deepgram errors are reported per file without aborting."""
+    deepgram_stub.transcript = lambda body, params: "" if body == b"silence" else "ok"
+    before = api_server.history_store.count()
+
+    files = [
+        ("files", ("good.wav", b"audio")),
+        ("files", ("notes.txt", b"text")),
+        ("files", ("empty.mp3", b"silence")),
+    ]
+    with TestClient(app) as client:
+        response = client.post("/upload/batch", files=files)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] is False
+    assert (data["total"], data["succeeded"], data["failed"]) == (3, 1, 2)
+    good, text, empty = data["results"]
+    assert good["success"] and good["transcription"] == "ok"
+    assert not text["success"] and "Invalid file extension" in text["error"]
+    assert not empty["success"] and "No transcription" in empty["error"]
+    assert api_server.history_store.count() == before + 1
+
+
+def test_batch_cli(deepgram_stub, tmp_path, capsys):
+    """The CLI transcribes a folder and saves the results to the history."""
+    folder = tmp_path / "audio"
+    folder.mkdir()
+    for name in ("a.mp3", "b.wav", "readme.txt"):
+        (folder / name).write_bytes(name.encode())
+    before = api_server.history_store.count()
+
+    exit_code = batch.main([str(folder), "--concurrency", "2", "--output", str(tmp_path / "results.json")])
+
+    assert exit_code == 0
+    assert "2 transcribed, 0 failed, 2 saved to history" in capsys.readouterr().out
+    assert (tmp_path / "results.json").exists()
+    assert api_server.history_store.count() == before + 2
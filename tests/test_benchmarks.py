@@ -0,0 +1,42 @@
+"""
+Tests for the benchmark suite (benchmarks/suite.py), run at a tiny size
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks import suite
+
+
+def test_suite_reports_every_scenario_as_json(tmp_path):
+    output = tmp_path / "bench.json"
+
+    status = suite.main([
+        "--backends", "sqlite", "--sizes", "300", "--requests", "2", "--saves", "5",
+        "--uploads", "4", "--concurrency", "2", "--upload-kb", "4", "--download-runs", "1",
+        "--deepgram-delay", "0", "--llm-delay", "0", "--output", str(output)
+    ])
+
+    assert status == 0
+    [result] = json.loads(output.read_text(encoding="utf-8"))["results"]
+    assert (result["backend"], result["size"], result["populate"]["rows"]) == ("sqlite", 300, 300)
+    assert set(result["history"]) == set(suite.HISTORY_QUERIES) | {"paginate"}
+    assert result["upload"]["errors"] == 0 and result["upload"]["n"] == 4
+    assert set(result["agent"]) == {"fast_path", "llm"}
+    assert result["download"]["csv_gzip"]["bytes"] < result["download"]["csv"]["bytes"]
+
+
+def test_compare_flags_slower_and_lower_throughput_metrics():
+    def report(p50_ms, per_second):
+        return {"results": [{
+            "backend": "csv", "size": 10, "stats": {"p50_ms": p50_ms, "n": 50},
+            "upload": {"per_second": per_second}
+        }]}
+
+    regressions = suite.compare(report(12.0, 50.0), report(10.0, 80.0), max_regression=1.25)
+
+    assert [(r["metric"], r["ratio"]) for r in regressions] == [("upload.per_second", 1.6)]
+    assert suite.compare(report(20.0, 80.0), report(10.0, 80.0), 1.25)[0]["metric"] == "stats.p50_ms"
@@ -0,0 +1,206 @@
+"""
+Tests for chunked transcription of long recordings (src/chunking.py)
+
+The audio is synthetic: every "word" is a 0.4 s tone whose frequency
+encodes it, so the Deepgram stub can transcribe any segment it receives
+and the stitched result can be compared with the whole recording.
+"""
+
+import asyncio
+import functools
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+from src import api_server, chunking
+from src.chunking import plan_segments, should_chunk, stitch_transcripts, transcribe_chunked
+from src.deepgram_client import get_async_client
+from src.tools import transcriber
+from src.tools.transcriber import TranscribeAudioTool
+
+RATE = 8000
+WORDS = [
+    "hola", "buenos", "días", "reunión", "equipo", "proyecto", "cliente", "entrega",
+    "semana", "viernes", "informe", "presupuesto", "revisar", "cambios", "pruebas", "datos",
+    "servidor", "audio", "texto", "modelo", "plazo", "tarea", "correo", "llamada"
+]
+
+
+def _frequency(index: int) -> float:
+    return 300.0 + 40.0 * index
+
+
+def _decode(samples: np.ndarray) -> str:
+    """Words of a mono signal: one per run of sound, by its dominant frequency."""
+    frame = RATE // 100
+    frames = len(samples) // frame
+    energy = np.sqrt(np.mean(samples[:frames * frame].reshape(frames, -1) ** 2, axis=1))
+    active = np.concatenate([[False], energy > 0.05, [False]])
+    edges = np.flatnonzero(active[1:] != active[:-1])
+    words = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        if end - start < 5:  # under 50 ms: a sliver cut at a segment edge
+            continue
+        run = samples[start * frame:end * frame]
+        spectrum = np.abs(np.fft.rfft(run))
+        peak = np.fft.rfftfreq(len(run), 1 / RATE)[int(np.argmax(spectrum))]
+        index = int(round((peak - 300.0) / 40.0))
+        if 0 <= index < len(WORDS):
+            words.append(WORDS[index])
+    return " ".join(words)
+
+
+def _stub_transcript(body: bytes, params: dict) -> str:
+    samples, _ = sf.read(io.BytesIO(body), dtype="float32")
+    return _decode(samples)
+
+
+@pytest.fixture(scope="module")
+def long_audio(tmp_path_factory):
+    """~100 s WAV: tone words 0.5 s apart with a 1.5 s pause every 12 words."""
+    rng = random.Random(7)
+    tone = np.arange(int(0.4 * RATE)) / RATE
+    gap = np.zeros(int(0.1 * RATE), dtype=np.float32)
+    pause = np.zeros(int(1.5 * RATE), dtype=np.float32)
+    pieces = [pause]
+    for i in range(160):
+        word = rng.randrange(len(WORDS))
+        pieces += [(0.5 * np.sin(2 * np.pi * _frequency(word) * tone)).astype(np.float32), gap]
+        if i % 12 == 11:
+            pieces.append(pause)
+    samples = np.concatenate(pieces)
+    path = tmp_path_factory.mktemp("chunking") / "meeting.wav"
+    sf.write(path, samples, RATE, subtype="PCM_16")
+    return path, samples
+
+
+def test_segments_are_cut_in_silence_and_overlap(long_audio):
+    path, samples = long_audio
+
+    segments = plan_segments(path, chunk_seconds=20, overlap_seconds=3, search_seconds=4)
+
+    assert segments[0][0] == 0.0
+    assert segments[-1][1] == pytest.approx(len(samples) / RATE)
+    assert len(segments) == 6
+    for (start, end), (next_start, _) in zip(segments, segments[1:]):
+        assert end == pytest.approx(next_start + 3)
+        # Every cut falls where nothing is being said
+        cut = samples[int((next_start - 0.03) * RATE):int((next_start + 0.03) * RATE)]
+        assert np.abs(cut).max() < 1e-3
+
+
+def test_chunked_transcript_matches_whole_file(long_audio, deepgram_stub):
+    """Stitching the segments' transcripts gives the whole file's transcript."""
+    path, samples = long_audio
+    deepgram_stub.delay = 0.3
+    deepgram_stub.transcript = _stub_transcript
+
+    async def transcribe(segment_path):
+        text, _ = await get_async_client().transcribe_file(segment_path, "nova-2", "es")
+        return text
+
+    async def run():
+        start = time.perf_counter()
+        result = await transcribe_chunked(path, transcribe, concurrency=4, chunk_seconds=20)
+        return result, time.perf_counter() - start
+
+    (text, count), elapsed = asyncio.run(run())
+
+    assert text == _decode(samples)
+    assert len(text.split()) == 160
+    assert count == len(deepgram_stub.requests) >= 4
+    # Segments are transcribed concurrently, not one after another
+    assert elapsed < count * deepgram_stub.delay * 0.75
+
+
+def test_stitching_ignores_case_punctuation_and_cut_words():
+    assert stitch_transcripts([
+        "Hola, ¿qué tal? Empezamos la reunión del",
+        "la reunión del equipo. Primero, el informe",
+        "el informe semanal."
+    ]) == "Hola, ¿qué tal? Empezamos la reunión del equipo. Primero, el informe semanal."
+    # A word garbled at the cut (on either side) doesn't hide the overlap
+    assert stitch_transcripts(
+        ["uno dos tres cuatro cinc", "os tres cuatro cinco seis"]
+    ) == "uno dos tres cuatro cinco seis"
+    # A single repeated word is not enough evidence of an overlap
+    assert stitch_transcripts(["uno dos tres", "tres cuatro"]) == "uno dos tres tres cuatro"
+    assert stitch_transcripts(["sin", "", "solape"]) == "sin solape"
+
+
+def test_should_chunk(long_audio, tmp_path):
+    path, _ = long_audio
+    not_audio = tmp_path / "notes.mp3"
+    not_audio.write_bytes(b"not really audio")
+
+    assert should_chunk(path, min_seconds=60)
+    assert not should_chunk(path, min_seconds=600)
+    assert should_chunk(path, chunked=True, min_seconds=600)
+    assert not should_chunk(path, chunked=False, min_seconds=60)
+    # Files that can't be decoded locally go to Deepgram in one request
+    assert not should_chunk(not_audio, chunked=True)
+
+
+def test_upload_chunked(long_audio, deepgram_stub, monkeypatch):
+    path, samples = long_audio
+    deepgram_stub.transcript = _stub_transcript
+    monkeypatch.setattr(api_server, "transcribe_chunked", functools.partial(transcribe_chunked, chunk_seconds=20))
+
+    with TestClient(api_server.app) as client:
+        response = client.post(
+            "/upload", params={"chunked": "true"}, files={"file": ("meeting.wav", path.read_bytes())}
+        )
+
+    assert response.status_code == 200
+    assert response.json()["transcription"] == _decode(samples)
+    assert len(deepgram_stub.requests) >= 4
+
+
+def test_transcribe_tool_chunked(long_audio, deepgram_stub, monkeypatch):
+    from src import deepgram_client
+
+    path, samples = long_audio
+    deepgram_client.reset_clients()
+    deepgram_stub.transcript = _stub_transcript
+    monkeypatch.setattr(
+        transcriber, "transcribe_chunked_sync",
+        functools.partial(chunking.transcribe_chunked_sync, chunk_seconds=20)
+    )
+    monkeypatch.setattr(transcriber, "transcribe_chunked", functools.partial(transcribe_chunked, chunk_seconds=20))
+    tool = TranscribeAudioTool()
+    try:
+        result = tool._run(audio_file=str(path), language="es", chunked=True)
+        async_result = asyncio.run(tool._arun(audio_file=str(path), language="es", chunked=True))
+    finally:
+        deepgram_client.reset_clients()
+
+    for output in (result, async_result):
+        assert _decode(samples) in output
+        assert "segments in parallel" in output
+
+
+def test_sync_chunking_stops_after_a_failed_segment(long_audio):
+    """A failing segment raises its error; segments not started yet never run."""
+    path, _ = long_audio
+    started = []
+
+    def transcribe(segment_path):
+        started.append(segment_path.name)
+        if len(started) == 1:
+            raise RuntimeError("segment failed")
+        time.sleep(0.2)
+        return "texto"
+
+    with pytest.raises(RuntimeError, match="segment failed"):
+        chunking.transcribe_chunked_sync(path, transcribe, concurrency=1, chunk_seconds=10)
+    assert len(started) < len(plan_segments(path, 10, chunking.CHUNK_OVERLAP_SECONDS))
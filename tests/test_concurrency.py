@@ -0,0 +1,59 @@
+"""
+Load test: the API keeps answering while transcriptions are in flight
+"""
+
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from src.api_server import app
+
+CONCURRENT_UPLOADS = 50
+DEEPGRAM_DELAY_SECONDS = 1.0
+
+
+async def _run_load(stub):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+
+        async def upload(i):
+            files = {"file": (f"clip_{i}.mp3", f"audio {i}".encode() * 100, "audio/mpeg")}
+            return await client.post("/upload", files=files)
+
+        async def probe_health(stop):
+            latencies = []
+            while not stop.is_set():
+                start = time.perf_counter()
+                response = await client.get("/health")
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200
+                await asyncio.sleep(0.02)
+            return latencies
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_health(stop))
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(upload(i) for i in range(CONCURRENT_UPLOADS)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        return responses, elapsed, await probe
+
+
+def test_health_stays_fast_under_concurrent_uploads(deepgram_stub):
+    """50 uploads wait on a slow Deepgram at once; /health is unaffected."""
+    deepgram_stub.delay = DEEPGRAM_DELAY_SECONDS
+
+    responses, elapsed, latencies = asyncio.run(_run_load(deepgram_stub))
+
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses if r.status_code != 200]
+    assert len(deepgram_stub.requests) == CONCURRENT_UPLOADS
+    # Sequential handling would take CONCURRENT_UPLOADS * delay seconds
+    assert elapsed < CONCURRENT_UPLOADS * DEEPGRAM_DELAY_SECONDS / 5
+    assert len(latencies) >= 10
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    print(f"\n/health under load: {len(latencies)} probes, "
+          f"median {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+          f"max {max(latencies) * 1000:.1f} ms; {CONCURRENT_UPLOADS} uploads in {elapsed:.2f} s")
+    assert p95 < 0.25
@@ -0,0 +1,176 @@
+"""
+Tests for the shared Deepgram client against a local stub server
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.deepgram_client import (
+    AsyncDeepgramClient,
+    CircuitBreaker,
+    CircuitOpenError,
+    DeepgramClient,
+    DeepgramError,
+    RetryPolicy
+)
+from src.tools.transcriber import TranscribeAudioTool
+from tests.deepgram_stub import DeepgramStub
+
+
+def make_client(stub, cls=DeepgramClient, **kwargs):
+    kwargs.setdefault("retry_policy", RetryPolicy(max_retries=3, base_delay=0.01, max_delay=0.05))
+    kwargs.setdefault("circuit_breaker", CircuitBreaker(failure_threshold=2, reset_timeout=0.2))
+    return cls(api_key="test-key", base_url=stub.url, **kwargs)
+
+
+@pytest.fixture
+def audio(tmp_path):
+    path = tmp_path / "meeting.wav"
+    path.write_bytes(b"RIFF" + b"\x00" * 4000)
+    return path
+
+
+def test_sync_client_reuses_connections_and_parses_listen_response(audio):
+    with DeepgramStub(transcript=lambda body, params: f"hola {params['language']}") as stub:
+        client = make_client(stub)
+        results = [client.transcribe_file(audio, "nova-2", "es") for _ in range(5)]
+
+    assert results[0][0] == "hola es"
+    assert results[0][1]["results"]["channels"][0]["alternatives"][0]["confidence"] == 0.99
+    assert [r["size"] for r in stub.requests] == [4004] * 5
+    assert stub.requests[0]["params"] == {"model": "nova-2", "language": "es"}
+    # Keep-alive: every request came over the same connection
+    assert len(stub.connections) == 1
+
+
+def test_retries_with_backoff_on_429_and_5xx_only(audio):
+    with DeepgramStub() as stub:
+        client = make_client(stub)
+
+        stub.failures = [429, 503, 502]
+        assert client.transcribe_file(audio)[0].startswith("stub transcript")
+        assert len(stub.requests) == 4
+
+        stub.failures = [400]
+        with pytest.raises(DeepgramError) as error:
+            client.transcribe_file(audio)
+        assert error.value.status_code == 400
+        assert len(stub.requests) == 5
+
+
+def test_circuit_breaker_opens_and_recovers(audio):
+    with DeepgramStub() as stub:
+        client = make_client(stub, retry_policy=RetryPolicy(max_retries=0))
+
+        stub.failures = [500, 500]
+        for _ in range(2):
+            with pytest.raises(DeepgramError):
+                client.transcribe_file(audio)
+        assert client.circuit_breaker.state == "open"
+
+        # Rejected without reaching Deepgram
+        with pytest.raises(CircuitOpenError):
+            client.transcribe_file(audio)
+        assert len(stub.requests) == 2
+
+        time.sleep(0.25)
+        assert client.circuit_breaker.state == "half-open"
+        assert client.transcribe_file(audio)[0].startswith("stub transcript")
+        assert client.circuit_breaker.state == "closed"
+
+
+def test_circuit_breaker_trial_ends_with_cancellation_or_unexpected_errors(audio, monkeypatch):
+    """A half-open trial that is cancelled or fails oddly doesn't keep the circuit shut."""
+    from src import deepgram_client
+
+    async def cancelled_trial(client):
+        call = asyncio.create_task(client.transcribe_file(audio))
+        await asyncio.sleep(0.1)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+    async def run(stub):
+        client = make_client(stub, AsyncDeepgramClient, retry_policy=RetryPolicy(max_retries=0))
+        try:
+            stub.failures = [500, 500]
+            for _ in range(2):
+                with pytest.raises(DeepgramError):
+                    await client.transcribe_file(audio)
+            await asyncio.sleep(0.25)
+
+            stub.delay = 0.5
+            await cancelled_trial(client)
+            assert client.circuit_breaker.state == "half-open"
+
+            stub.delay = 0
+            with monkeypatch.context() as patched:
+                patched.setattr(deepgram_client, "extract_transcript", lambda result: int("not json"))
+                with pytest.raises(ValueError):
+                    await client.transcribe_file(audio)
+            assert client.circuit_breaker.state == "open"
+
+            await asyncio.sleep(0.25)
+            return await client.transcribe_file(audio)
+        finally:
+            await client.aclose()
+
+    with DeepgramStub() as stub:
+        transcript, _ = asyncio.run(run(stub))
+
+    assert transcript.startswith("stub transcript")
+
+
+def test_async_client_retries_and_pools(audio):
+    async def run(stub):
+        client = make_client(stub, AsyncDeepgramClient)
+        try:
+            stub.failures = [503]
+            first = await client.transcribe_file(audio, "nova-2", "en")
+            rest = await asyncio.gather(*(client.transcribe_file(audio) for _ in range(3)))
+            return first, rest
+        finally:
+            await client.aclose()
+
+    with DeepgramStub() as stub:
+        first, rest = asyncio.run(run(stub))
+
+    assert first[0] == "stub transcript of 4004 bytes"
+    assert len(rest) == 3
+    assert len(stub.requests) == 5
+
+
+def test_transcribe_tool_uses_shared_client(audio, deepgram_stub):
+    from src import deepgram_client
+
+    deepgram_client.reset_clients()
+    deepgram_stub.transcript = lambda body, params: "texto del stub"
+    tool = TranscribeAudioTool()
+    try:
+        result = tool._run(audio_file=str(audio), language="es")
+        assert "texto del stub" in result
+        deepgram_stub.failures = [401]
+        assert "Deepgram API error: 401" in tool._run(audio_file=str(audio), language="es")
+    finally:
+        deepgram_client.reset_clients()
+
+
+def test_transcribe_tool_async_path_overlaps(audio, deepgram_stub):
+    """`_arun` uses the async client, so concurrent calls overlap."""
+    deepgram_stub.delay = 0.4
+    deepgram_stub.transcript = lambda body, params: "texto async"
+    tool = TranscribeAudioTool()
+
+    async def run():
+        start = time.perf_counter()
+        results = await asyncio.gather(*(tool._arun(audio_file=str(audio), language="es") for _ in range(6)))
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(run())
+
+    assert all("texto async" in r for r in results)
+    assert len(deepgram_stub.requests) == 6
+    assert elapsed < 1.5
+    assert "does not exist" in asyncio.run(tool._arun(audio_file=str(audio) + ".missing"))
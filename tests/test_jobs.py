@@ -0,0 +1,75 @@
+"""
+Tests for asynchronous transcription jobs (POST /jobs, GET /jobs/{id})
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from src import api_server
+from src.api_server import app
+
+
+async def _submit_and_poll(files, timeout=10):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        submitted = []
+        for name, content in files:
+            start = time.perf_counter()
+            response = await client.post("/jobs", files={"file": (name, content)})
+            submitted.append((response, time.perf_counter() - start))
+
+        jobs = {}
+        deadline = time.monotonic() + timeout
+        pending = {r.json()["job_id"] for r, _ in submitted if r.status_code == 202}
+        while pending and time.monotonic() < deadline:
+            for job_id in list(pending):
+                job = (await client.get(f"/jobs/{job_id}")).json()
+                if job["status"] in ("completed", "failed"):
+                    jobs[job_id] = job
+                    pending.discard(job_id)
+            await asyncio.sleep(0.05)
+        missing = await client.get("/jobs/does-not-exist")
+        return submitted, jobs, missing
+
+
+def test_jobs_return_immediately_and_save_history(deepgram_stub):
+    """Submitting does not wait for Deepgram; completed jobs land in history."""
+    deepgram_stub.delay = 0.5
+    deepgram_stub.transcript = lambda body, params: f"job transcript {len(body)}"
+    before = api_server.history_store.count()
+
+    submitted, jobs, missing = asyncio.run(_submit_and_poll(
+        [("call.mp3", b"a" * 100), ("call.mp3", b"b" * 200), ("notes.wav", b"c" * 300)]
+    ))
+
+    assert [r.status_code for r, _ in submitted] == [202, 202, 202]
+    assert all(elapsed < deepgram_stub.delay for _, elapsed in submitted)
+    assert submitted[0][0].json()["status"] == "queued"
+    assert missing.status_code == 404
+
+    assert len(jobs) == 3
+    assert all(job["status"] == "completed" for job in jobs.values())
+    assert sorted(job["result"]["transcription"] for job in jobs.values()) == [
+        "job transcript 100", "job transcript 200", "job transcript 300"
+    ]
+    assert api_server.history_store.count() == before + 3
+    latest = api_server.history_store.latest(3)
+    assert sorted(r["filename"] for r in latest) == ["call.mp3", "call.mp3", "notes.wav"]
+
+
+def test_failed_jobs_report_the_error(deepgram_stub):
+    deepgram_stub.failures = [400]
+
+    submitted, jobs, _ = asyncio.run(_submit_and_poll([("bad.mp3", b"x" * 10)]))
+
+    job = next(iter(jobs.values()))
+    assert job["status"] == "failed"
+    assert "400" in job["error"]
+    assert job["result"] is None
+
+
+def test_jobs_reject_unsupported_files():
+    submitted, _, _ = asyncio.run(_submit_and_poll([("notes.txt", b"hello")]))
+    assert submitted[0][0].status_code == 400
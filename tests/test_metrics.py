@@ -0,0 +1,86 @@
+"""
+Tests for the Prometheus metrics (src/metrics.py and GET /metrics)
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+from src import api_server
+from src.metrics import ERRORS, HTTP_IN_FLIGHT, HTTP_REQUESTS, STAGE_SECONDS, Registry
+
+
+def _count(stage):
+    snapshot = STAGE_SECONDS.snapshot(stage=stage)
+    return snapshot["count"] if snapshot else 0
+
+
+def test_histogram_and_counter_exposition_format():
+    registry = Registry()
+    latency = registry.histogram("op_seconds", "Operation latency", ("op",), buckets=(0.1, 1.0))
+    errors = registry.counter("op_errors_total", "Errors", ("type",))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, op='say "hi"')
+    errors.inc(type="ValueError")
+    errors.inc(2, type="ValueError")
+
+    assert registry.render().splitlines() == [
+        "# HELP op_seconds Operation latency",
+        "# TYPE op_seconds histogram",
+        'op_seconds_bucket{op="say \\"hi\\"",le="0.1"} 2',
+        'op_seconds_bucket{op="say \\"hi\\"",le="1"} 3',
+        'op_seconds_bucket{op="say \\"hi\\"",le="+Inf"} 4',
+        'op_seconds_sum{op="say \\"hi\\""} 3.65',
+        'op_seconds_count{op="say \\"hi\\""} 4',
+        "# HELP op_errors_total Errors",
+        "# TYPE op_errors_total counter",
+        'op_errors_total{type="ValueError"} 3',
+    ]
+    # The same name returns the registered metric
+    assert registry.counter("op_errors_total", "Errors", ("type",)) is errors
+
+    # Counts kept elsewhere are published without ever going down
+    lookups = registry.counter("lookups_total", "Lookups", ("result",))
+    for total in (5, 3, 8):
+        lookups.advance_to(total, result="hit")
+    assert lookups.value(result="hit") == 8
+
+
+def test_upload_stages_errors_and_requests_are_measured(deepgram_stub):
+    deepgram_stub.transcript = lambda body, params: "texto medido"
+    before = {stage: _count(stage) for stage in ("upload_write", "transcribe_audio", "save_to_csv")}
+    failures = ERRORS.value(stage="transcribe_audio", type="DeepgramError")
+    ok_requests = HTTP_REQUESTS.value(method="POST", route="/upload", status="200")
+
+    with TestClient(api_server.app) as client:
+        assert client.post("/upload", files={"file": ("medido.mp3", b"audio")}).status_code == 200
+        deepgram_stub.failures = [401]
+        assert client.post("/upload", files={"file": ("fallo.mp3", b"audio")}).status_code == 500
+        text = client.get("/metrics")
+
+    assert text.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert {stage: _count(stage) - n for stage, n in before.items()} == {
+        "upload_write": 2, "transcribe_audio": 2, "save_to_csv": 1
+    }
+    assert ERRORS.value(stage="transcribe_audio", type="DeepgramError") == failures + 1
+    assert HTTP_REQUESTS.value(method="POST", route="/upload", status="200") == ok_requests + 1
+    assert HTTP_IN_FLIGHT.value(route="/upload") == 0
+    assert 'transcription_stage_duration_seconds_count{stage="transcribe_audio"}' in text.text
+    assert 'http_requests_in_flight{route="/metrics"} 1' in text.text
+
+
+def test_agent_llm_and_tool_stages_are_measured():
+    from tests.test_agent import FakeLLM, _agent, _ask
+
+    llm = FakeLLM(tool_calls=[{"name": "query_history", "args": {"limit": 2}}, {"name": "invented", "args": {}}])
+    agent, _ = _agent(llm, threshold=1.1)
+    before = {stage: _count(stage) for stage in ("llm_invoke", "tool:query_history", "tool:unknown")}
+
+    _ask(agent, "algo que solo el LLM entiende")
+
+    assert {stage: _count(stage) - n for stage, n in before.items()} == {
+        "llm_invoke": 1, "tool:query_history": 1, "tool:unknown": 1
+    }
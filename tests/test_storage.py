@@ -0,0 +1,575 @@
+"""
+Tests for the transcription history store
+"""
+
+import csv
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import from src
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.storage import HISTORY_COLUMNS, CsvHistoryStore, SqliteHistoryStore, create_history_store
+
+
+def test_csv_store_appends_without_rewriting(tmp_path):
+    """Saves append rows to the CSV and keep the historic layout."""
+    csv_path = tmp_path / "history.csv"
+    store = CsvHistoryStore(csv_path)
+
+    first = store.save("a.mp3", "primera transcripción", 1.5, "deepgram-nova-2")
+    second = store.save("b.mp3", 'texto con "comillas", comas\ny saltos', None, "deepgram-nova-2")
+
+    assert (first['id'], second['id']) == (1, 2)
+    assert store.count() == 2
+
+    with open(csv_path, encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == HISTORY_COLUMNS
+    assert rows[1][1:] == ["a.mp3", "1.5", "deepgram-nova-2", "primera transcripción"]
+    assert rows[2][2] == ""
+    assert rows[2][4] == 'texto con "comillas", comas\ny saltos'
+
+    latest = store.latest(10)
+    assert [r['filename'] for r in latest] == ["b.mp3", "a.mp3"]
+    assert store.latest(10, search="PRIMERA")[0]['filename'] == "a.mp3"
+
+
+def test_csv_store_counts_rows_written_by_other_instances(tmp_path):
+    """The cached row count follows appends made through another handle."""
+    csv_path = tmp_path / "history.csv"
+    first = CsvHistoryStore(csv_path)
+    second = CsvHistoryStore(csv_path)
+
+    first.save("a.mp3", "uno")
+    assert second.count() == 1
+    assert second.save("b.mp3", "dos")['id'] == 2
+    assert first.count() == 2
+
+
+def test_import_existing_history_csv(tmp_path):
+    """An existing history.csv can be imported into a store."""
+    source = tmp_path / "old.csv"
+    source.write_text(
+        "timestamp,filename,duration_seconds,model,transcription_text\n"
+        "2026-01-28 21:18:51,ejemplo1.m4a,2.182029,deepgram-nova-2,hola\n"
+        "2026-01-28 21:45:36,Ejemplo2.mp3,,deepgram-nova-2,adiós",
+        encoding='utf-8'
+    )
+    store = CsvHistoryStore(tmp_path / "history.csv")
+
+    assert store.import_csv(source) == 2
+    records = list(store.iter_records())
+    assert records[0]['duration_seconds'] == 2.182029
+    assert records[1]['duration_seconds'] is None
+    assert records[1]['transcription_text'] == "adiós"
+
+    # Files without a trailing newline are terminated before appending
+    existing = CsvHistoryStore(source)
+    assert existing.save("c.mp3", "tres")['id'] == 3
+    assert [r['filename'] for r in existing.iter_records()][-1] == "c.mp3"
+
+
+def test_sqlite_store_uses_indexes_and_migrates_csv_once(tmp_path):
+    """The sqlite backend imports the CSV once and answers from its indexes."""
+    csv_path = tmp_path / "history.csv"
+    legacy = CsvHistoryStore(csv_path)
+    legacy.save("a.mp3", "uno", 1.0, "deepgram-nova-2", timestamp="2026-01-01 10:00:00")
+    legacy.save("b.mp3", "dos", 3.0, "deepgram-nova", timestamp="2026-01-02 10:00:00")
+
+    store = create_history_store("sqlite", csv_path)
+    assert store.count() == 2
+    assert store.path == tmp_path / "history.db"
+    assert store.migrate_from_csv(csv_path) == 0
+    store.close()
+    direct = SqliteHistoryStore(tmp_path / "direct.db")
+    assert direct.migrate_from_csv(csv_path) == 2
+    direct.close()
+
+    # Reopening does not import the CSV a second time
+    store = create_history_store("sqlite", csv_path)
+    store.save("a.mp3", "tres", None, "deepgram-nova-2", timestamp="2026-01-03 10:00:00")
+    assert store.count() == 3
+    assert [r['transcription_text'] for r in store.latest(2)] == ["tres", "dos"]
+    assert [r['id'] for r in store.latest(10, filename="a.mp3")] == [3, 1]
+
+    summary = store.summary()
+    assert summary['model_counts'] == {"deepgram-nova-2": 2, "deepgram-nova": 1}
+    assert (summary['total_duration'], summary['timed_count']) == (4.0, 2)
+
+    plan = store._connect().execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM transcriptions "
+        "ORDER BY timestamp DESC, id DESC LIMIT 5"
+    ).fetchall()
+    assert any("idx_transcriptions_timestamp" in row[-1] for row in plan)
+    assert store._connect().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    store.close()
+
+
+def test_full_text_search_is_ranked_prefix_and_accent_insensitive(tmp_path):
+    """Both backends rank matches and ignore accents and case."""
+    csv_path = tmp_path / "history.csv"
+    for store in (CsvHistoryStore(csv_path), create_history_store("sqlite", tmp_path / "other.csv")):
+        store.save("a.mp3", "La unión federal de cincuenta estados")
+        store.save("b.mp3", "Reunión de transcripción del equipo")
+        store.save("c.mp3", "Unión, unión y más UNION en esta transcripción")
+
+        assert [r['filename'] for r in store.search("union")] == ["c.mp3", "a.mp3"]
+        assert store.search("union")[0]['score'] > store.search("union")[1]['score']
+        assert {r['filename'] for r in store.search("TRANSCRIP")} == {"b.mp3", "c.mp3"}
+        assert [r['filename'] for r in store.search("unión transcripcion")] == ["c.mp3"]
+        assert store.search("union", filename="a.mp3")[0]['filename'] == "a.mp3"
+        assert store.search('"; DROP') == []
+
+        # Recent-first search and index updates on save
+        store.save("d.mp3", "otra union")
+        assert [r['filename'] for r in store.latest(2, search="unión")] == ["d.mp3", "c.mp3"]
+        store.close()
+
+
+def _page_all(store, **filters):
+    """Follows next_cursor until the last page; returns ids and page sizes."""
+    ids, sizes, cursor = [], [], None
+    while True:
+        rows, cursor = store.page(limit=3, cursor=cursor, **filters)
+        ids.extend(r['id'] for r in rows)
+        sizes.append(len(rows))
+        if cursor is None:
+            return ids, sizes
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_keyset_pagination_and_filters(tmp_path, backend):
+    """Pages follow (timestamp, id) newest first and filters run in the store."""
+    store = create_history_store(backend, tmp_path / "history.csv")
+    store.append_many(
+        {
+            'timestamp': f"2026-03-{day:02d} 10:00:00",
+            'filename': f"{'call' if i % 2 else 'memo'}_{i}.mp3",
+            'duration_seconds': 1.0,
+            'model': "deepgram-nova-2" if i % 3 else "deepgram-nova",
+            'transcription_text': "reunión de equipo" if i % 4 == 0 else "otra cosa"
+        }
+        # Two rows per day share a timestamp, so the id breaks the tie
+        for i, day in enumerate(d // 2 + 1 for d in range(10))
+    )
+
+    ids, sizes = _page_all(store)
+    assert ids == list(range(10, 0, -1))
+    assert sizes == [3, 3, 3, 1]
+
+    ids, _ = _page_all(store, start="2026-03-02", end="2026-03-04")
+    assert ids == [8, 7, 6, 5, 4, 3]
+    ids, _ = _page_all(store, model="deepgram-nova")
+    assert ids == [10, 7, 4, 1]
+    ids, _ = _page_all(store, filename_prefix="call_", start="2026-03-03")
+    assert ids == [10, 8, 6]
+    ids, _ = _page_all(store, search="reunion")
+    assert ids == [9, 5, 1]
+
+    with pytest.raises(ValueError):
+        store.page(cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        store.page(start="yesterday")
+    store.close()
+
+
+def test_csv_pagination_with_rows_out_of_time_order(tmp_path):
+    """Imported older rows are still paged in timestamp order."""
+    store = CsvHistoryStore(tmp_path / "history.csv")
+    store.save("new.mp3", "nuevo", timestamp="2026-05-01 10:00:00")
+    store.save("old.mp3", "viejo", timestamp="2026-01-01 10:00:00")
+    store.save("mid.mp3", "medio", timestamp="2026-03-01 10:00:00")
+
+    rows, cursor = store.page(limit=2)
+    assert [r['filename'] for r in rows] == ["new.mp3", "mid.mp3"]
+    rows, cursor = store.page(limit=2, cursor=cursor)
+    assert [r['filename'] for r in rows] == ["old.mp3"]
+    assert cursor is None
+
+
+def test_csv_position_index_keeps_out_of_order_rows_in_step_with_sqlite(tmp_path):
+    """Once rows are out of time order, pages and exports follow (timestamp, id)
+    through the position index, which also takes rows saved afterwards."""
+    import random
+
+    rng = random.Random(7)
+    csv_store = CsvHistoryStore(tmp_path / "history.csv")
+    sqlite_store = create_history_store("sqlite", tmp_path / "other.csv")
+
+    def save(n):
+        records = [
+            {
+                'timestamp': f"2026-0{rng.randint(1, 6)}-{rng.randint(10, 28)} 10:00:00",
+                'filename': f"{rng.choice(['call', 'memo'])}_{rng.randint(0, 999)}.mp3",
+                'transcription_text': rng.choice(["reunión de equipo", "otra cosa"])
+            }
+            for _ in range(n)
+        ]
+        for store in (csv_store, sqlite_store):
+            store.append_many(records)
+
+    def same_results():
+        for filters in ({}, {'search': "reunion"}, {'filename_prefix': "call_", 'start': "2026-02-15"},
+                        {'end': "2026-04-20"}, {'start': "2026-03-01", 'end': "2026-05-01"}):
+            assert _page_all(csv_store, **filters)[0] == _page_all(sqlite_store, **filters)[0]
+        export = [r['id'] for r in csv_store.export(start="2026-02-01", end="2026-05-15")]
+        assert export == [r['id'] for r in sqlite_store.export(start="2026-02-01", end="2026-05-15")]
+        assert [r['id'] for r in csv_store.latest(4, search="equipo")] == \
+            [r['id'] for r in sqlite_store.latest(4, search="equipo")]
+
+    save(40)
+    same_results()
+    assert csv_store._order is not None
+
+    save(25)
+    same_results()
+    assert len(csv_store._order) == 65
+    csv_store.close()
+    sqlite_store.close()
+
+
+def test_history_endpoint_returns_next_cursor():
+    """/history pages through the store and rejects malformed cursors."""
+    from fastapi.testclient import TestClient
+
+    from src import api_server
+
+    for i in range(3):
+        api_server.history_store.save(f"page_{i}.mp3", "texto", timestamp=f"2020-01-0{i + 1} 00:00:00")
+    client = TestClient(api_server.app)
+
+    first = client.get("/history", params={"limit": 2, "filename_prefix": "page_"}).json()
+    assert [t['filename'] for t in first['transcriptions']] == ["page_2.mp3", "page_1.mp3"]
+    second = client.get("/history", params={
+        "limit": 2, "filename_prefix": "page_", "cursor": first['next_cursor']
+    }).json()
+    assert [t['filename'] for t in second['transcriptions']] == ["page_0.mp3"]
+    assert second['next_cursor'] is None
+
+    assert client.get("/history", params={"cursor": "garbage"}).status_code == 400
+    assert client.get("/history", params={"start": "2020-13-45"}).status_code == 400
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_export_streams_date_range(tmp_path, backend):
+    """export() yields only the rows inside the inclusive date range, oldest first."""
+    store = create_history_store(backend, tmp_path / "history.csv")
+    store.append_many(
+        {'timestamp': f"2026-04-{day:02d} 12:00:00", 'filename': f"{day}.mp3",
+         'duration_seconds': None, 'model': "deepgram-nova-2", 'transcription_text': "x"}
+        for day in range(1, 8)
+    )
+
+    assert [r['filename'] for r in store.export("2026-04-03", "2026-04-05")] == ["3.mp3", "4.mp3", "5.mp3"]
+    assert [r['filename'] for r in store.export(start="2026-04-06 12:00:00")] == ["6.mp3", "7.mp3"]
+    assert len(list(store.export())) == 7
+    with pytest.raises(ValueError):
+        store.export(end="soon")
+    store.close()
+
+
+def test_download_streams_gzip_csv():
+    """/download streams chunks, gzip-encoded when accepted, filtered by date."""
+    import gzip
+
+    from fastapi.testclient import TestClient
+
+    from src import api_server
+
+    api_server.history_store.save("old.mp3", "antiguo", timestamp="2019-06-01 08:00:00")
+    api_server.history_store.save("new.mp3", 'con "comillas"', timestamp="2019-06-02 08:00:00")
+    client = TestClient(api_server.app)
+
+    with client.stream("GET", "/download", params={"start": "2019-06-02", "end": "2019-06-02"},
+                       headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    rows = list(csv.reader(gzip.decompress(raw).decode('utf-8').splitlines()))
+    assert rows == [HISTORY_COLUMNS, ["2019-06-02 08:00:00", "new.mp3", "", "deepgram-nova-2", 'con "comillas"']]
+
+    plain = client.get("/download", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.text.startswith(",".join(HISTORY_COLUMNS))
+    assert client.get("/download", params={"start": "nope"}).status_code == 400
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_stats_are_maintained_on_save_and_rebuilt(tmp_path, backend):
+    """summary() follows every save; rebuild_stats() recomputes it from the rows."""
+    store = create_history_store(backend, tmp_path / "history.csv")
+    store.save("a.mp3", "uno", 2.0, "deepgram-nova-2", timestamp="2026-02-01 09:00:00")
+    store.save("b.mp3", "dos", None, "deepgram-nova", timestamp="2026-02-01 18:00:00")
+    assert store.summary()['count'] == 2
+
+    store.save("c.mp3", "tres", 4.0, "deepgram-nova-2", timestamp="2026-02-03 09:00:00")
+    # Imported late, older than everything else
+    store.save("old.mp3", "viejo", 1.0, "deepgram-nova-2", timestamp="2025-12-31 23:00:00")
+
+    summary = store.summary(recent=3)
+    assert (summary['count'], summary['total_duration'], summary['timed_count']) == (4, 7.0, 3)
+    assert summary['model_counts'] == {"deepgram-nova-2": 3, "deepgram-nova": 1}
+    assert summary['by_model']["deepgram-nova-2"] == {
+        'count': 3, 'total_duration_seconds': 7.0, 'average_duration_seconds': 2.33
+    }
+    assert list(summary['by_day']) == ["2025-12-31", "2026-02-01", "2026-02-03"]
+    assert summary['by_day']["2026-02-01"]['count'] == 2
+    assert summary['recent_files'] == ["c.mp3", "b.mp3", "a.mp3"]
+
+    if backend == "sqlite":
+        # Simulate aggregates drifting away from the rows
+        with store._connect() as conn:
+            conn.execute("DELETE FROM stats_days")
+    assert store.rebuild_stats()['by_day'] == summary['by_day']
+    assert store.summary(recent=3) == summary
+    store.close()
+
+
+def test_stats_endpoint_reports_breakdowns():
+    """/stats includes per-model and per-day breakdowns."""
+    from fastapi.testclient import TestClient
+
+    from src import api_server
+
+    api_server.history_store.save("stats.mp3", "hola", 3.0, "deepgram-nova-2")
+    data = TestClient(api_server.app).get("/stats", params={"days": 1}).json()
+
+    assert data['total_transcriptions'] == api_server.history_store.count()
+    assert data['recent_files'][0] == "stats.mp3"
+    assert data['by_model']["deepgram-nova-2"]['count'] >= 1
+    assert len(data['by_day']) == 1
+
+
+def test_tools_and_api_share_the_process_wide_store(tmp_path):
+    """History tools default to the shared store instead of their own CSV."""
+    import src.api_server as api_server
+    from src.storage import get_history_store, set_history_store
+    from src.tools.history import HistoryTool, QueryHistoryTool, SaveTranscriptionTool
+
+    # The server installs its store (built from CSV_PATH) as the shared one
+    assert get_history_store() is api_server.history_store
+    assert HistoryTool().store is api_server.history_store
+
+    store = CsvHistoryStore(tmp_path / "shared.csv")
+    previous = set_history_store(store)
+    try:
+        save, query = SaveTranscriptionTool(), QueryHistoryTool()
+        save._run(filename="shared.mp3", text="texto compartido", model="deepgram-nova-2")
+        save._run(filename="other.mp3", text="otro texto", model="deepgram-nova-2")
+        assert store.count() == 2
+        assert "shared.mp3" in query._run(search="compartido")
+        # Tools keep no state of their own: every call sees the same store
+        assert SaveTranscriptionTool()._history.store is QueryHistoryTool()._history.store is store
+    finally:
+        set_history_store(previous)
+
+    # An injected store wins over the shared one
+    injected = CsvHistoryStore(tmp_path / "injected.csv")
+    SaveTranscriptionTool(store=injected)._run(filename="x.mp3", text="x")
+    assert (injected.count(), store.count()) == (1, 2)
+
+
+def _save_from_process(backend, csv_path, worker, saves, threads):
+    """Runs in a separate process: `saves` saves from `threads` threads."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    store = create_history_store(backend, csv_path)
+
+    def save(i):
+        filename = f"w{worker}_{i}.mp3"
+        return store.save(filename, f"texto {worker} {i}", 1.0)['id'], filename
+
+    with ThreadPoolExecutor(threads) as pool:
+        saved = list(pool.map(save, range(saves)))
+    commits = store._group_commit.stats()['commits']
+    store.close()
+    return saved, commits
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_parallel_saves_from_many_processes_lose_nothing(tmp_path, backend):
+    """Thousands of saves from several processes: every row lands exactly
+    once, under the id its save returned, with fewer commits than saves."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    csv_path = tmp_path / "history.csv"
+    processes, saves = 4, 500
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [
+            pool.submit(_save_from_process, backend, csv_path, worker, saves, 8)
+            for worker in range(processes)
+        ]
+        results = [future.result(timeout=120) for future in futures]
+
+    saved = [pair for pairs, _ in results for pair in pairs]
+    total = processes * saves
+    assert sorted(row_id for row_id, _ in saved) == list(range(1, total + 1))
+
+    store = create_history_store(backend, csv_path)
+    stored = {record['id']: record['filename'] for record in store.iter_records()}
+    assert store.count() == total
+    assert stored == dict(saved)
+    # Concurrent saves shared commits (and fsyncs)
+    assert sum(commits for _, commits in results) < total
+    store.close()
+
+
+def test_csv_search_while_rows_are_appended(tmp_path):
+    """Searches don't iterate the index while a commit is adding to it."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    store = CsvHistoryStore(tmp_path / "history.csv")
+    store.save("first.mp3", "reunión inicial")
+
+    def append(worker):
+        for i in range(20):
+            store.append_many(
+                {'filename': f"w{worker}_{i}_{j}.mp3", 'transcription_text': f"reunión palabra{worker}{i}{j} equipo"}
+                for j in range(10)
+            )
+
+    def search(_):
+        for _ in range(50):
+            store.search("reunion")
+            store.latest(5, search="reu")
+            store.page(limit=5, search="equipo")
+
+    # Frequent thread switches make an unlocked query fail almost every run
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            futures = [pool.submit(append, w) for w in range(4)] + [pool.submit(search, w) for w in range(4)]
+            for future in futures:
+                future.result(timeout=120)
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert len(store.search("reunion", limit=1000)) == 801
+    store.close()
+
+
+def test_group_commit_isolates_failing_batches(tmp_path):
+    """A batch that fails to encode doesn't fail the batches committed with it."""
+    from src.storage.group_commit import GroupCommit, PendingWrite
+
+    store = CsvHistoryStore(tmp_path / "history.csv")
+
+    def bad_records():
+        raise ValueError("registro inválido")
+        yield
+
+    good, bad = PendingWrite([{'timestamp': '2024-01-01 00:00:00', 'filename': 'a.mp3', 'duration_seconds': None,
+                               'model': 'm', 'transcription_text': 'a'}]), PendingWrite(bad_records())
+    store._commit([bad, good])
+
+    assert (good.written, good.last_id, good.error) == (1, 1, None)
+    assert isinstance(bad.error, ValueError) and bad.written == 0
+
+    commit = GroupCommit(store._commit)
+    with pytest.raises(ValueError):
+        commit.submit(bad_records())
+    assert commit.submit([{**good.records[0], 'filename': 'b.mp3'}]).last_id == 2
+    assert store.count() == 2
+
+
+@pytest.mark.parametrize("backend", ["csv", "sqlite"])
+def test_parquet_snapshot_refreshes_incrementally(tmp_path, backend):
+    """Each refresh writes only new rows; parts are compacted past the limit
+    and the snapshot's aggregates match the store's."""
+    pytest.importorskip("pyarrow")
+    from src.storage import ParquetSnapshot
+
+    store = create_history_store(backend, tmp_path / "history.csv")
+    store.append_many(
+        {'timestamp': f"2024-03-{i % 3 + 1:02d} 10:00:{i:02d}", 'filename': f"f{i}.mp3",
+         'duration_seconds': None if i % 4 == 0 else 2.5, 'model': f"m{i % 2}", 'transcription_text': "texto " * 20}
+        for i in range(30)
+    )
+    snapshot = ParquetSnapshot(store, tmp_path / "history.parquet", max_parts=3)
+
+    assert snapshot.refresh() == 30
+    assert snapshot.refresh() == 0
+    parts = []
+    for i in range(3):
+        store.save(f"new{i}.mp3", "nuevo", 1.0, "m2", timestamp=f"2024-03-04 09:00:0{i}")
+        assert snapshot.refresh() == 1
+        parts.append(sorted(p.name for p in (tmp_path / "history.parquet").glob("*.parquet")))
+    assert parts[1] == ["part-0000000001-0000000030.parquet", "part-0000000031-0000000031.parquet",
+                        "part-0000000032-0000000032.parquet"]
+    # A fourth part goes over the limit: everything is merged into one
+    assert parts[2] == ["part-0000000001-0000000033.parquet"]
+
+    assert snapshot.summary(5) == store.summary(5)
+    table = snapshot.read(['id', 'filename'], start="2024-03-04")
+    assert table.column_names == ['id', 'filename']
+    assert table['filename'].to_pylist() == ["new0.mp3", "new1.mp3", "new2.mp3"]
+    with pytest.raises(ValueError):
+        snapshot.read(start="ayer")
+    snapshot.close()
+    store.close()
+
+
+def test_download_parquet_endpoint(tmp_path):
+    """/download?format=parquet serves the (filtered) history as Parquet."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    import io
+
+    from fastapi.testclient import TestClient
+    import src.api_server as api_server
+
+    api_server.history_store.save("pq_old.mp3", "antiguo", 1.0, timestamp="2018-05-01 08:00:00")
+    api_server.history_store.save("pq_new.mp3", 'con "comillas"', None, timestamp="2018-05-02 08:00:00")
+    client = TestClient(api_server.app)
+
+    response = client.get("/download", params={"format": "parquet", "start": "2018-05-02", "end": "2018-05-02"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    assert ".parquet" in response.headers["content-disposition"]
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.to_pylist() == [
+        {key: record[key] for key in table.column_names}
+        for record in api_server.history_store.export("2018-05-02", "2018-05-02")
+    ]
+    assert table['transcription_text'].to_pylist() == ['con "comillas"']
+
+    full = pq.read_table(io.BytesIO(client.get("/download?format=parquet").content))
+    assert full.num_rows == api_server.history_store.count()
+    assert client.get("/download", params={"format": "parquet", "start": "ayer"}).status_code == 400
+    assert client.get("/download", params={"format": "xlsx"}).status_code == 422
+
+
+def test_snapshot_stats_skip_text_parsing(tmp_path):
+    """Aggregating from the snapshot beats parsing the text-heavy CSV."""
+    pytest.importorskip("pyarrow")
+    import time
+
+    import pandas as pd
+    from src.storage import ParquetSnapshot
+
+    store = CsvHistoryStore(tmp_path / "history.csv")
+    text = "palabra " * 250
+    store.append_many(
+        {'timestamp': f"2024-01-{i % 28 + 1:02d} 10:00:00", 'filename': f"f{i}.mp3",
+         'duration_seconds': 1.5, 'model': "deepgram-nova-2", 'transcription_text': f"{i} {text}"}
+        for i in range(10000)
+    )
+    snapshot = ParquetSnapshot(store, tmp_path / "history.parquet")
+    snapshot.refresh()
+
+    start = time.perf_counter()
+    frame = pd.read_csv(store.path)
+    by_model = frame.groupby('model')['duration_seconds'].agg(['count', 'sum'])
+    csv_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summary = snapshot.summary()
+    snapshot_seconds = time.perf_counter() - start
+
+    assert summary['by_model']['deepgram-nova-2']['count'] == by_model.loc['deepgram-nova-2', 'count'] == 10000
+    assert snapshot_seconds * 3 < csv_seconds
@@ -0,0 +1,126 @@
+"""
+Tests for live transcription over WebSocket (src/streaming.py and /stream)
+
+The streaming stub (tests/deepgram_stream_stub.py) transcribes "audio"
+that is really UTF-8 text, so results can be compared with what was sent.
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from src import api_server
+from src.deepgram_client import DeepgramError
+from src.streaming import DeepgramStream
+
+
+def _latest():
+    return api_server.history_store.latest(1)[0]
+
+
+def test_stream_pushes_interim_and_final_results_and_saves(deepgram_stream_stub):
+    received = []
+    with TestClient(api_server.app) as client:
+        with client.websocket_connect("/stream?language=es&filename=llamada_42") as ws:
+            assert ws.receive_json() == {"type": "ready"}
+            # Every chunk is answered before the next one is sent
+            for chunk in ("hola ", "qué ", "tal. ", "vamos ", "allá."):
+                ws.send_bytes(chunk.encode())
+                received.append(ws.receive_json())
+            ws.send_json({"type": "stop"})
+            received.append(ws.receive_json())
+            completed = ws.receive_json()
+
+    assert [(m["type"], m["text"]) for m in received] == [
+        ("interim", "hola"),
+        ("interim", "hola qué"),
+        ("final", "hola qué tal."),
+        ("interim", "vamos"),
+        ("interim", "vamos allá."),
+        ("final", "vamos allá.")
+    ]
+    assert received[3]["start"] == received[2]["duration"]
+    assert completed["type"] == "completed"
+    assert completed["transcription"] == "hola qué tal. vamos allá."
+    assert completed["audio_seconds"] > 0
+
+    saved = _latest()
+    assert str(saved["id"]) == completed["id"]
+    assert (saved["filename"], saved["model"]) == ("llamada_42", "deepgram-nova-2")
+    assert saved["transcription_text"] == "hola qué tal. vamos allá."
+
+    [connection] = deepgram_stream_stub.connections
+    assert connection["params"]["interim_results"] == "true"
+    assert connection["params"]["language"] == "es"
+    assert connection["headers"]["Authorization"] == "Token test-deepgram-key"
+
+
+def test_stream_saves_the_transcript_when_the_client_disconnects(deepgram_stream_stub):
+    """Driven at the ASGI level: TestClient cancels the endpoint on disconnect,
+    servers like uvicorn let it finish."""
+    scope = {
+        "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "http_version": "1.1",
+        "path": "/stream", "raw_path": b"/stream", "root_path": "", "query_string": b"filename=cortada",
+        "headers": [], "client": ("test", 1), "server": ("test", 80), "subprotocols": []
+    }
+
+    async def run():
+        incoming, outgoing = asyncio.Queue(), asyncio.Queue()
+        await incoming.put({"type": "websocket.connect"})
+        session = asyncio.create_task(api_server.app(scope, incoming.get, outgoing.put))
+        assert (await outgoing.get())["type"] == "websocket.accept"
+        assert json.loads((await outgoing.get())["text"]) == {"type": "ready"}
+        await incoming.put({"type": "websocket.receive", "bytes": "se corta la llamada".encode()})
+        assert json.loads((await outgoing.get())["text"])["type"] == "interim"
+        await incoming.put({"type": "websocket.disconnect", "code": 1001})
+        await asyncio.wait_for(session, 5)
+
+    asyncio.run(run())
+
+    saved = _latest()
+    assert (saved["filename"], saved["transcription_text"]) == ("cortada", "se corta la llamada")
+
+
+def test_stream_reports_backend_errors(deepgram_stream_stub):
+    with TestClient(api_server.app) as client:
+        deepgram_stream_stub.reject_with = 401
+        with client.websocket_connect("/stream") as ws:
+            error = ws.receive_json()
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_json()
+        assert error["type"] == "error" and "401" in error["detail"]
+        assert closed.value.code == 1011
+
+        deepgram_stream_stub.reject_with = None
+        deepgram_stream_stub.close_with = 1011
+        with client.websocket_connect("/stream") as ws:
+            assert ws.receive_json()["type"] == "ready"
+            ws.send_bytes(b"audio")
+            error = ws.receive_json()
+        assert error["type"] == "error" and "1011" in error["detail"]
+
+
+def test_stream_client_sends_keepalives_during_pauses(deepgram_stream_stub):
+    async def run():
+        async with DeepgramStream(language="es", keepalive=0.05) as stream:
+            await stream.send("uno dos".encode())
+            await asyncio.sleep(0.3)
+            await stream.finish()
+            results = [result async for result in stream]
+        with pytest.raises(DeepgramError):
+            await stream.send(b"tarde")
+        return stream, results
+
+    stream, results = asyncio.run(run())
+
+    assert deepgram_stream_stub.keepalives >= 3
+    assert [(r.is_final, r.text) for r in results] == [(False, "uno dos"), (True, "uno dos")]
+    assert stream.transcript == "uno dos"
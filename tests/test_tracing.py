@@ -0,0 +1,110 @@
+"""
+Tests for request tracing (src/tracing.py) and the debug timings
+"""
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+from src import api_server, tracing
+from src.concurrency import run_blocking
+from src.tracing import SpanExporter, span, trace
+
+DEBUG = {"X-Debug-Timings": "1"}
+
+
+def test_spans_nest_across_threads_and_tasks():
+    async def stage(name, seconds):
+        with span(name):
+            await asyncio.sleep(seconds)
+
+    def blocking():
+        with span("blocking"):
+            time.sleep(0.02)
+
+    async def run():
+        with trace("request", debug=True) as current:
+            with span("outer"):
+                await asyncio.gather(stage("a", 0.05), stage("b", 0.05))
+                await run_blocking(blocking)
+            return current
+
+    current = asyncio.run(run())
+    timings = current.timings()
+    by_name = {s["name"]: s for s in timings["spans"]}
+
+    assert list(by_name) == ["outer", "a", "b", "blocking"]
+    assert by_name["outer"]["parent_id"] == current.root.span_id
+    assert {by_name[n]["parent_id"] for n in ("a", "b", "blocking")} == {by_name["outer"]["span_id"]}
+    assert len({s["span_id"] for s in timings["spans"]}) == 4
+    # Parallel stages overlap: the outer span is shorter than their sum
+    assert by_name["outer"]["duration_ms"] < by_name["a"]["duration_ms"] + by_name["b"]["duration_ms"]
+    assert timings["total_ms"] >= by_name["outer"]["duration_ms"]
+    # Outside a trace, span() does nothing
+    with span("ignored") as ignored:
+        assert ignored is None
+
+
+def test_upload_returns_timings_only_with_debug_header(deepgram_stub):
+    deepgram_stub.delay = 0.1
+    deepgram_stub.transcript = lambda body, params: "texto trazado"
+
+    with TestClient(api_server.app) as client:
+        plain = client.post("/upload", files={"file": ("plano.mp3", b"audio")})
+        debug = client.post("/upload", files={"file": ("traza.mp3", b"audio")}, headers=DEBUG)
+
+    assert plain.json()["timings"] is None
+    assert "server-timing" not in plain.headers
+
+    timings = debug.json()["timings"]
+    assert {"upload_write", "transcribe_audio", "save_to_csv", "history.append"} <= set(timings["stages"])
+    assert timings["stages"]["transcribe_audio"] >= 100
+    # `duration` is measured with the monotonic clock around the same call
+    assert debug.json()["duration"] * 1000 >= timings["stages"]["transcribe_audio"]
+    assert debug.headers["x-trace-id"] == timings["trace_id"]
+    assert debug.headers["server-timing"].startswith("total;dur=")
+    assert "transcribe_audio;dur=" in debug.headers["server-timing"]
+
+
+def test_agent_details_include_tool_and_store_spans(monkeypatch):
+    from src.agent import IntelligentAgent
+    from src.intent import IntentClassifier
+    from src.tools.history import QueryHistoryTool
+    from tests.test_agent import FakeLLM
+
+    tool = QueryHistoryTool(store=api_server.history_store)
+    monkeypatch.setattr(api_server, "agent", IntelligentAgent(FakeLLM(), [tool], IntentClassifier()))
+
+    with TestClient(api_server.app) as client:
+        response = client.post(
+            "/agent", data={"message": "dame el historial", "details": "true"}, headers=DEBUG
+        )
+
+    stages = response.json()["timings"]["stages"]
+    assert {"agent.classify", "tool:query_history", "history.latest"} <= set(stages)
+    spans = {s["name"]: s for s in response.json()["timings"]["spans"]}
+    assert spans["history.latest"]["parent_id"] == spans["tool:query_history"]["span_id"]
+
+
+def test_traces_are_exported_as_otlp_json_lines(tmp_path, monkeypatch):
+    exporter = SpanExporter(f"file:{tmp_path / 'traces.jsonl'}")
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    monkeypatch.setenv("TRACE_EXPORT", f"file:{tmp_path / 'traces.jsonl'}")
+
+    with TestClient(api_server.app) as client:
+        assert client.get("/history", params={"limit": 1}).status_code == 200
+    exporter.flush()
+
+    lines = (tmp_path / "traces.jsonl").read_text().splitlines()
+    spans = [s for line in lines for s in json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+    root = next(s for s in spans if "parentSpanId" not in s)
+    assert root["name"] == "GET /history" and root["kind"] == 2
+    assert any(s["name"] == "history.page" and s["parentSpanId"] == root["spanId"] for s in spans)
+    assert all(len(s["traceId"]) == 32 and s["traceId"] == root["traceId"] for s in spans)
+    assert int(root["endTimeUnixNano"]) > int(root["startTimeUnixNano"])
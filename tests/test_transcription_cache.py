@@ -0,0 +1,91 @@
+"""
+Tests for the content-hash transcription cache
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path to import from src
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import transcription_cache
+from src.transcription_cache import TranscriptionCache, hash_file, transcribe_cached, transcribe_cached_sync
+
+
+def test_cache_hits_by_content_model_and_language(tmp_path):
+    """Same bytes + model + language hit; any difference misses."""
+    audio = tmp_path / "a.mp3"
+    copy = tmp_path / "copy_of_a.mp3"
+    audio.write_bytes(b"fake audio" * 1000)
+    copy.write_bytes(audio.read_bytes())
+    assert hash_file(audio) == hash_file(copy)
+
+    cache = TranscriptionCache(tmp_path / "cache.db")
+    cache.put(hash_file(audio), "nova-2", "es", "hola mundo")
+
+    assert cache.get(hash_file(copy), "nova-2", "es") == "hola mundo"
+    assert cache.get(hash_file(copy), "nova-2", "en") is None
+    assert cache.get(hash_file(copy), "base", "es") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+    # The cache survives a restart
+    cache.close()
+    reopened = TranscriptionCache(tmp_path / "cache.db")
+    assert reopened.get(hash_file(audio), "nova-2", "es") == "hola mundo"
+    reopened.close()
+
+
+def test_cache_expires_and_evicts_least_recently_used(tmp_path):
+    """Entries past the TTL miss, and the LRU entry goes first when full."""
+    cache = TranscriptionCache(tmp_path / "cache.db", ttl_seconds=60, max_entries=2)
+    cache.put("h1", "nova-2", "es", "uno")
+    cache.put("h2", "nova-2", "es", "dos")
+    time.sleep(0.01)
+    assert cache.get("h1", "nova-2", "es") == "uno"  # h2 is now least recently used
+    cache.put("h3", "nova-2", "es", "tres")
+
+    assert cache.get("h2", "nova-2", "es") is None
+    assert cache.get("h1", "nova-2", "es") == "uno"
+    assert cache.stats()["entries"] == 2
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.get("h3", "nova-2", "es") is None
+    cache.close()
+
+
+def test_transcribe_cached_calls_deepgram_once_per_audio(tmp_path, monkeypatch):
+    """The shared helper used by the API server and the batch CLI."""
+    audio = tmp_path / "a.mp3"
+    audio.write_bytes(b"fake audio" * 1000)
+    cache = TranscriptionCache(tmp_path / "cache.db")
+    monkeypatch.setattr(transcription_cache, "get_transcription_cache", lambda: cache)
+    calls = []
+
+    async def transcribe(path):
+        calls.append(path)
+        await asyncio.sleep(0.05)
+        return "hola mundo"
+
+    first = asyncio.run(transcribe_cached(audio, "es", transcribe))
+    second = asyncio.run(transcribe_cached(audio, "es", transcribe, hash_file(audio)))
+    other_language = asyncio.run(transcribe_cached(audio, "en", transcribe))
+
+    assert (first[0], first[2]) == ("hola mundo", False) and first[1] >= 0.05
+    assert (second[0], second[2]) == ("hola mundo", True) and second[1] < 0.05
+    assert other_language[2] is False
+    assert calls == [audio, audio]
+
+    # The blocking counterpart (used by the transcription tool) shares the entries
+    assert transcribe_cached_sync(audio, "es", lambda path: calls.append(path)) == (
+        "hola mundo", pytest.approx(0, abs=0.05), True
+    )
+    assert transcribe_cached_sync(audio, "fr", lambda path: "bonjour")[::2] == ("bonjour", False)
+    assert cache.get(hash_file(audio), "nova-2", "fr") == "bonjour"
+    assert len(calls) == 2
+    cache.close()
@@ -0,0 +1,102 @@
+"""
+Tests for the streaming upload path
+"""
+
+import asyncio
+import hashlib
+import io
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+# Add parent directory to path to import from src
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.uploads import UploadSizeLimitMiddleware, save_upload, upload_destination
+
+
+class RecordingUpload(UploadFile):
+    """UploadFile that remembers the size of every read."""
+
+    def __init__(self, data: bytes):
+        super().__init__(file=io.BytesIO(data), filename="audio.mp3")
+        self.read_sizes = []
+
+    async def read(self, size: int = -1) -> bytes:
+        self.read_sizes.append(size)
+        return await super().read(size)
+
+
+def test_save_upload_streams_in_chunks_and_hashes(tmp_path):
+    """The file is copied chunk by chunk and hashed on the way."""
+    data = b"0123456789" * 10_000
+    upload = RecordingUpload(data)
+    destination = upload_destination(tmp_path, "../../etc/audio.mp3")
+
+    size, digest = asyncio.run(save_upload(upload, destination, chunk_size=4096))
+
+    assert destination.parent == tmp_path and destination.name.endswith("_audio.mp3")
+    assert upload_destination(tmp_path, "audio.mp3") != destination
+    assert (size, digest) == (len(data), hashlib.sha256(data).hexdigest())
+    assert destination.read_bytes() == data
+    assert set(upload.read_sizes) == {4096}
+
+
+def test_save_upload_rejects_oversized_files_without_leftovers(tmp_path):
+    """Going past the limit raises 413 and removes the partial file."""
+    upload = RecordingUpload(b"x" * 10_000)
+    destination = tmp_path / "big.mp3"
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(save_upload(upload, destination, max_bytes=5_000, chunk_size=1024))
+
+    assert error.value.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+    # Reading stopped right after the limit was crossed
+    assert len(upload.read_sizes) == 5
+
+
+def test_concurrent_uploads_to_one_destination_do_not_collide(tmp_path):
+    """Each upload writes its own temporary file."""
+    destination = tmp_path / "same.mp3"
+
+    async def upload_both():
+        return await asyncio.gather(
+            save_upload(RecordingUpload(b"a" * 10_000), destination, chunk_size=1024),
+            save_upload(RecordingUpload(b"b" * 10_000), destination, chunk_size=1024)
+        )
+
+    first, second = asyncio.run(upload_both())
+
+    assert first[1] == hashlib.sha256(b"a" * 10_000).hexdigest()
+    assert second[1] == hashlib.sha256(b"b" * 10_000).hexdigest()
+    assert list(tmp_path.iterdir()) == [destination]
+
+
+def test_middleware_rejects_large_bodies_as_they_arrive():
+    """Bodies over the limit get a 413, with or without Content-Length."""
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    app.add_middleware(UploadSizeLimitMiddleware, max_body_bytes=2_000)
+    client = TestClient(app)
+
+    assert client.post("/upload", files={"file": ("a.mp3", b"x" * 500)}).json() == {"size": 500}
+    assert client.post("/upload", files={"file": ("a.mp3", b"x" * 5_000)}).status_code == 413
+
+    def chunked_body():
+        for _ in range(10):
+            yield b"x" * 500
+
+    response = client.post(
+        "/upload",
+        content=chunked_body(),
+        headers={"content-type": "multipart/form-data; boundary=abc"}
+    )
+    assert response.status_code == 413